@@ -9,13 +9,16 @@ from fab.build_config import BuildConfig
 from fab.steps.archive_objects import archive_objects
 from fab.steps.cleanup_prebuilds import cleanup_prebuilds
 from fab.tools import ToolBox
+from fab.util import common_arg_parser
 from gcom_build_steps import common_build_steps
 
 
 if __name__ == '__main__':
 
+    parsed_args = common_arg_parser().parse_args()
+
     with BuildConfig(project_label='gcom object archive $compiler',
-                     tool_box=ToolBox()) as state:
+                     tool_box=ToolBox(), cpu_affinity=parsed_args.cpus, nice=parsed_args.nice) as state:
         common_build_steps(state)
-        archive_objects(state, output_fpath='$output/libgcom.a')
+        archive_objects(state, output_fpath='$output/libgcom.a', thin=True)
         cleanup_prebuilds(state, all_unused=True)
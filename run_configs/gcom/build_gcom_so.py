@@ -20,7 +20,7 @@ if __name__ == '__main__':
     parsed_args = arg_parser.parse_args()
 
     with BuildConfig(project_label='gcom shared library $compiler',
-                     tool_box=ToolBox()) as state:
+                     tool_box=ToolBox(), cpu_affinity=parsed_args.cpus, nice=parsed_args.nice) as state:
         common_build_steps(state, fpic=True)
         link_shared_object(state, output_fpath='$output/libgcom.so'),
         cleanup_prebuilds(state, all_unused=True)
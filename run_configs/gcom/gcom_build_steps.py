@@ -12,24 +12,25 @@ from fab.steps.preprocess import preprocess_c, preprocess_fortran
 
 from grab_gcom import grab_config
 
+# Shared by the archive and shared object builds, so only built once.
+FPP_FLAGS = (
+    '-P',
+    '-I$source/gcom/include',
+    '-DGC_VERSION="7.6"',
+    '-DGC_BUILD_DATE="20220111"',
+    '-DGC_DESCRIP="dummy desrip"',
+    '-DPREC_64B', '-DMPILIB_32B',
+)
 
-def common_build_steps(config, fpic=False):
 
-    fpp_flags = [
-        '-P',
-        '-I$source/gcom/include',
-        '-DGC_VERSION="7.6"',
-        '-DGC_BUILD_DATE="20220111"',
-        '-DGC_DESCRIP="dummy desrip"',
-        '-DPREC_64B', '-DMPILIB_32B',
-    ]
+def common_build_steps(config, fpic=False):
 
     fpic = ['-fPIC'] if fpic else []
 
     grab_folder(config, src=grab_config.source_root),
     find_source_files(config),
     preprocess_c(config),  # todo: there's no c! :)
-    preprocess_fortran(config, common_flags=fpp_flags),
+    preprocess_fortran(config, common_flags=list(FPP_FLAGS)),
     analyse(config),
     compile_c(config, common_flags=['-c', '-std=c99'] + fpic),
     compile_fortran(config, common_flags=fpic),
@@ -5,6 +5,8 @@
 # which you should have received as part of this distribution
 ##############################################################################
 import logging
+import os
+from functools import partial
 
 from fab.build_config import BuildConfig
 from fab.steps.analyse import analyse
@@ -12,12 +14,15 @@ from fab.steps.archive_objects import archive_objects
 from fab.steps.cleanup_prebuilds import cleanup_prebuilds
 from fab.steps.compile_fortran import compile_fortran
 from fab.steps.find_source_files import find_source_files, Exclude
+from fab.steps.grab import grab_parallel
 from fab.steps.grab.fcm import fcm_export
 from fab.steps.grab.prebuild import grab_pre_build
 from fab.steps.link import link_exe
+from fab.steps.ninja import emit_ninja
 from fab.steps.preprocess import preprocess_fortran
 from fab.steps.root_inc_files import root_inc_files
-from fab.tools import Ifort, Linker, ToolBox
+from fab.tools import Ifort, Linker, PcppFortran, ToolBox
+from fab.util import common_arg_parser
 
 logger = logging.getLogger('fab')
 
@@ -30,45 +35,100 @@ class MpiIfort(Ifort):
         super().__init__(name="mpif90", exec_name="mpif90")
 
 
+# These don't depend on the revision or compiler, so they are built once at
+# import rather than every time a config is constructed.
+PATH_FILTERS = (
+    Exclude('src/control/um/'),
+    Exclude('src/initialisation/um/'),
+    Exclude('src/control/rivers-standalone/'),
+    Exclude('src/initialisation/rivers-standalone/'),
+    Exclude('src/params/shared/cable_maths_constants_mod.F90'),
+)
+
+UNREFERENCED_DEPS = ('imogen_update_carb',)
+
+# Linker selection flags. Incremental linking with gold only re-links what
+# changed, which makes rebuilds much quicker. Set FAB_LINKER=bfd to get the
+# default, non-incremental linker, e.g. for reproducible release builds.
+LINKER_FLAGS = {
+    'gold': ['-fuse-ld=gold', '-Wl,--incremental'],
+    'lld': ['-fuse-ld=lld'],
+    'bfd': [],
+}
+
+# Object archives per subsystem, named jules_<group>.a.
+ARCHIVE_GROUPS = {
+    'utils': '$output/utils/*',
+    'control': '$output/src/control/*',
+    'science': '$output/src/science/*',
+    'params': '$output/src/params/*',
+}
+
+
+def linker_flags():
+    '''Returns the linker selection flags for the FAB_LINKER environment
+    variable, defaulting to incremental gold.'''
+    linker = os.getenv('FAB_LINKER', 'gold')
+    try:
+        return LINKER_FLAGS[linker]
+    except KeyError:
+        raise ValueError(f"Unknown FAB_LINKER '{linker}', expected one of "
+                         f"{', '.join(LINKER_FLAGS)}") from None
+
+
 if __name__ == '__main__':
 
     revision = 'vn6.3'
 
+    arg_parser = common_arg_parser()
+    arg_parser.add_argument('--emit-ninja', action='store_true',
+                            help="Write a ninja file for 'ninja -C <build_output>' instead of compiling and linking.")
+    args = arg_parser.parse_args()
+
     tool_box = ToolBox()
     # Create a new Fortran compiler MpiIfort
     fc = MpiIfort()
     tool_box.add_tool(fc)
     # Use the compiler as linker:
     tool_box.add_tool(Linker(compiler=fc))
+    # Preprocess in-process with pcpp if it's installed, rather than
+    # running cpp for every file.
+    pcpp = PcppFortran()
+    if pcpp.is_available:
+        tool_box.add_tool(pcpp)
 
+    # --cpus and --nice keep the build from starving a shared login node
     with BuildConfig(project_label=f'jules {revision} $compiler',
-                     tool_box=tool_box) as state:
+                     tool_box=tool_box, cpu_affinity=args.cpus, nice=args.nice) as state:
         # grab the source. todo: use some checkouts instead of exports in these configs.
-        fcm_export(state, src='fcm:jules.xm_tr/src', revision=revision, dst_label='src')
-        fcm_export(state, src='fcm:jules.xm_tr/utils', revision=revision, dst_label='utils')
+        # the two exports are latency bound, so run them at the same time
+        grab_parallel(state, [
+            partial(fcm_export, src='fcm:jules.xm_tr/src', revision=revision, dst_label='src'),
+            partial(fcm_export, src='fcm:jules.xm_tr/utils', revision=revision, dst_label='utils'),
+        ])
 
         grab_pre_build(state, path='/not/a/real/folder', allow_fail=True),
 
         # find the source files
-        find_source_files(state, path_filters=[
-            Exclude('src/control/um/'),
-            Exclude('src/initialisation/um/'),
-            Exclude('src/control/rivers-standalone/'),
-            Exclude('src/initialisation/rivers-standalone/'),
-            Exclude('src/params/shared/cable_maths_constants_mod.F90'),
-        ])
+        find_source_files(state, path_filters=PATH_FILTERS)
 
         # move inc files to the root for easy tool use
         root_inc_files(state)
 
         preprocess_fortran(state, common_flags=['-P', '-DMPI_DUMMY', '-DNCDF_DUMMY', '-I$output'])
 
-        analyse(state, root_symbol='jules', unreferenced_deps=['imogen_update_carb'])
+        analyse(state, root_symbol='jules', unreferenced_deps=UNREFERENCED_DEPS)
 
-        compile_fortran(state)
+        link_flags = [*linker_flags(), '-lm', '-lnetcdff', '-lnetcdf']
+        if args.emit_ninja:
+            # leave compiling and linking to 'ninja -C <build_output>'
+            emit_ninja(state, link_flags=link_flags)
+        else:
+            compile_fortran(state)
 
-        archive_objects(state)
+            # an archive per subsystem, so a change only rewrites its own archive
+            archive_objects(state, thin=True, groups=ARCHIVE_GROUPS)
 
-        link_exe(state, flags=['-lm', '-lnetcdff', '-lnetcdf'])
+            link_exe(state, flags=link_flags)
 
         cleanup_prebuilds(state, n_versions=1)
@@ -3,7 +3,10 @@
 '''Example LFRic_atm build script.
 '''
 
+import copy
 import logging
+import os
+from functools import partial
 
 from fab.build_config import BuildConfig, AddFlags
 from fab.steps.analyse import analyse
@@ -11,13 +14,14 @@ from fab.steps.archive_objects import archive_objects
 from fab.steps.c_pragma_injector import c_pragma_injector
 from fab.steps.compile_c import compile_c
 from fab.steps.compile_fortran import compile_fortran
+from fab.steps.grab import grab_parallel
 from fab.steps.grab.fcm import fcm_export
 from fab.steps.grab.folder import grab_folder
 from fab.steps.link import link_exe
 from fab.steps.preprocess import preprocess_fortran, preprocess_c
 from fab.steps.psyclone import psyclone, preprocess_x90
 from fab.steps.find_source_files import find_source_files, Exclude, Include
-from fab.tools import ToolBox
+from fab.tools import Category, Ccache, ToolBox
 
 from grab_lfric import lfric_source_config, gpl_utils_source_config
 from lfric_common import (API, configurator, fparser_workaround_stop_concatenation,
@@ -26,145 +30,185 @@ from lfric_common import (API, configurator, fparser_workaround_stop_concatenati
 logger = logging.getLogger('fab')
 
 
+# The parts of each science subsystem we want, relative to that subsystem's folder. These are
+# module level constants so they're built once, rather than as hundreds of Path objects per call.
+UM_INCLUDES = (
+    'atmosphere/AC_assimilation/iau_mod.F90',
+    'atmosphere/aerosols',
+    'atmosphere/atmosphere_service',
+    'atmosphere/boundary_layer',
+    'atmosphere/carbon/carbon_options_mod.F90',
+    'atmosphere/convection',
+    'atmosphere/convection/comorph/control/comorph_constants_mod.F90',
+    'atmosphere/diffusion_and_filtering/leonard_incs_mod.F90',
+    'atmosphere/diffusion_and_filtering/turb_diff_ctl_mod.F90',
+    'atmosphere/diffusion_and_filtering/turb_diff_mod.F90',
+    'atmosphere/dynamics',
+    'atmosphere/dynamics_advection',
+    'atmosphere/electric',
+    'atmosphere/energy_correction/eng_corr_inputs_mod.F90',
+    'atmosphere/energy_correction/flux_diag-fldiag1a.F90',
+    'atmosphere/free_tracers/free_tracers_inputs_mod.F90',
+    'atmosphere/free_tracers/water_tracers_mod.F90',
+    'atmosphere/free_tracers/wtrac_all_phase_chg.F90',
+    'atmosphere/free_tracers/wtrac_calc_ratio.F90',
+    'atmosphere/free_tracers/wtrac_move_phase.F90',
+    'atmosphere/idealised',
+    'atmosphere/large_scale_cloud',
+    'atmosphere/large_scale_precipitation',
+    'atmosphere/PWS_diagnostics/pws_diags_mod.F90',
+    'atmosphere/radiation_control/def_easyaerosol.F90',
+    'atmosphere/radiation_control/easyaerosol_mod.F90',
+    'atmosphere/radiation_control/easyaerosol_option_mod.F90',
+    'atmosphere/radiation_control/easyaerosol_read_input_mod.F90',
+    'atmosphere/radiation_control/fsd_parameters_mod.F90',
+    'atmosphere/radiation_control/max_calls.F90',
+    'atmosphere/radiation_control/r2_calc_total_cloud_cover.F90',
+    'atmosphere/radiation_control/rad_input_mod.F90',
+    'atmosphere/radiation_control/solinc_data.F90',
+    'atmosphere/radiation_control/spec_sw_lw.F90',
+    'atmosphere/stochastic_physics/stochastic_physics_run_mod.F90',
+    'atmosphere/tracer_advection/trsrce-trsrce2a.F90',
+    'control/dummy_libs/drhook/parkind1.F90',
+    'control/dummy_libs/drhook/yomhook.F90',
+    'control/glomap_clim_interface/glomap_clim_option_mod.F90',
+    'control/grids',
+    'control/misc',
+    'control/mpp/decomp_params.F90',
+    'control/mpp/um_parcore.F90',
+    'control/mpp/um_parparams.F90',
+    'control/mpp/um_parvars.F90',
+    'control/stash/copydiag_3d_mod.F90',
+    'control/stash/copydiag_mod.F90',
+    'control/stash/cstash_mod.F90',
+    'control/stash/profilename_length_mod.F90',
+    'control/stash/set_levels_list.F90',
+    'control/stash/set_pseudo_list.F90',
+    'control/stash/stash_array_mod.F90',
+    'control/stash/stparam_mod.F90',
+    'control/stash/um_stashcode_mod.F90',
+    'control/top_level',
+    'control/ukca_interface/atmos_ukca_callback_mod.F90',
+    'control/ukca_interface/atmos_ukca_humidity_mod.F90',
+    'control/ukca_interface/get_emdiag_stash_mod.F90',
+    'control/ukca_interface/ukca_d1_defs.F90',
+    'control/ukca_interface/ukca_dissoc.F90',
+    'control/ukca_interface/ukca_eg_tracers_total_mass_mod.F90',
+    'control/ukca_interface/ukca_nmspec_mod.F90',
+    'control/ukca_interface/ukca_option_mod.F90',
+    'control/ukca_interface/ukca_photo_scheme_mod.F90',
+    'control/ukca_interface/ukca_radaer_lut_in.F90',
+    'control/ukca_interface/ukca_radaer_read_precalc.F90',
+    'control/ukca_interface/ukca_radaer_read_presc_mod.F90',
+    'control/ukca_interface/ukca_radaer_struct_mod.F90',
+    'control/ukca_interface/ukca_scavenging_diags_mod.F90',
+    'control/ukca_interface/ukca_scavenging_mod.F90',
+    'control/ukca_interface/ukca_tracer_stash.F90',
+    'control/ukca_interface/ukca_um_legacy_mod.F90',
+    'control/ukca_interface/ukca_volcanic_so2.F90',
+    'scm/modules/scmoptype_defn.F90',
+    'scm/modules/s_scmop_mod.F90',
+    'scm/modules/scm_convss_dg_mod.F90',
+    'scm/stub/dgnstcs_glue_conv.F90',
+    'scm/stub/scmoutput_stub.F90',
+    'atmosphere/COSP/cosp_input_mod.F90',
+    'control/coupling',
+    'atmosphere/gravity_wave_drag/g_wave_input_mod.F90',
+    'atmosphere/gravity_wave_drag/gw_ussp_prec_mod.F90',
+    'atmosphere/gravity_wave_drag/gw_ussp_params_mod.F90',
+    'atmosphere/gravity_wave_drag/gw_ussp_core_mod.F90',
+    'atmosphere/gravity_wave_drag/gw_ussp_mod.F90',
+    'atmosphere/gravity_wave_drag/gw_block.F90',
+    'atmosphere/gravity_wave_drag/gw_wave.F90',
+    'atmosphere/gravity_wave_drag/gw_setup.F90',
+    'atmosphere/gravity_wave_drag/c_gwave_mod.F90',
+    'utility/qxreconf/calc_fit_fsat.F',
+)
+
+JULES_INCLUDES = (
+    'control/shared',
+    'control/lfric',
+    'control/cable/shared',
+    'control/cable/cable_land',
+    'control/cable/interface',
+    'control/cable/util',
+    'params/cable',
+    'science_cable',
+    'util/cable',
+    'initialisation/cable',
+    'control/standalone/jules_fields_mod.F90',
+    'util/shared/gridbox_mean_mod.F90',
+    'util/shared/metstats/metstats_mod.F90',
+    'initialisation/shared/allocate_jules_arrays.F90',
+    'initialisation/shared/freeze_soil.F90',
+    'initialisation/shared/calc_urban_aero_fields_mod.F90',
+    'initialisation/shared/check_compatible_options_mod.F90',
+    'science/deposition',
+    'science/params',
+    'science/radiation',
+    'science/snow',
+    'science/soil',
+    'science/surface',
+    'science/vegetation',
+)
+
+SOCRATES_INCLUDES = (
+    'radiance_core',
+    'interface_core',
+    'illumination',
+)
+
+UKCA_INCLUDES = (
+    'science',
+    'control/core',
+    'control/glomap_clim/interface',
+)
+
+
 def file_filtering(config):
     """Based on lfric_atm/fcm-make/extract.cfg"""
 
-    science_root = config.source_root / 'science'
+    science_root = str(config.source_root / 'science')
+
+    def subsystem(name, includes):
+        # exclude the subsystem, apart from the given parts
+        root = os.path.join(science_root, name)
+        return [Exclude(root), Include(*(os.path.join(root, i) for i in includes))]
 
     return [
         Exclude('unit-test', '/test/'),
+        *subsystem('um', UM_INCLUDES),
+        *subsystem('jules', JULES_INCLUDES),
+        *subsystem('socrates', SOCRATES_INCLUDES),
+        *subsystem('ukca', UKCA_INCLUDES),
+        Exclude(os.path.join(science_root, 'shumlib')),
+    ]
 
-        Exclude(science_root / 'um'),
-        Include(science_root / 'um/atmosphere/AC_assimilation/iau_mod.F90'),
-        Include(science_root / 'um/atmosphere/aerosols'),
-        Include(science_root / 'um/atmosphere/atmosphere_service'),
-        Include(science_root / 'um/atmosphere/boundary_layer'),
-        Include(science_root / 'um/atmosphere/carbon/carbon_options_mod.F90'),
-        Include(science_root / 'um/atmosphere/convection'),
-        Include(science_root / 'um/atmosphere/convection/comorph/control/comorph_constants_mod.F90'),
-        Include(science_root / 'um/atmosphere/diffusion_and_filtering/leonard_incs_mod.F90'),
-        Include(science_root / 'um/atmosphere/diffusion_and_filtering/turb_diff_ctl_mod.F90'),
-        Include(science_root / 'um/atmosphere/diffusion_and_filtering/turb_diff_mod.F90'),
-        Include(science_root / 'um/atmosphere/dynamics'),
-        Include(science_root / 'um/atmosphere/dynamics_advection'),
-        Include(science_root / 'um/atmosphere/electric'),
-        Include(science_root / 'um/atmosphere/energy_correction/eng_corr_inputs_mod.F90'),
-        Include(science_root / 'um/atmosphere/energy_correction/flux_diag-fldiag1a.F90'),
-        Include(science_root / 'um/atmosphere/free_tracers/free_tracers_inputs_mod.F90'),
-        Include(science_root / 'um/atmosphere/free_tracers/water_tracers_mod.F90'),
-        Include(science_root / 'um/atmosphere/free_tracers/wtrac_all_phase_chg.F90'),
-        Include(science_root / 'um/atmosphere/free_tracers/wtrac_calc_ratio.F90'),
-        Include(science_root / 'um/atmosphere/free_tracers/wtrac_move_phase.F90'),
-        Include(science_root / 'um/atmosphere/idealised'),
-        Include(science_root / 'um/atmosphere/large_scale_cloud'),
-        Include(science_root / 'um/atmosphere/large_scale_precipitation'),
-        Include(science_root / 'um/atmosphere/PWS_diagnostics/pws_diags_mod.F90'),
-        Include(science_root / 'um/atmosphere/radiation_control/def_easyaerosol.F90'),
-        Include(science_root / 'um/atmosphere/radiation_control/easyaerosol_mod.F90'),
-        Include(science_root / 'um/atmosphere/radiation_control/easyaerosol_option_mod.F90'),
-        Include(science_root / 'um/atmosphere/radiation_control/easyaerosol_read_input_mod.F90'),
-        Include(science_root / 'um/atmosphere/radiation_control/fsd_parameters_mod.F90'),
-        Include(science_root / 'um/atmosphere/radiation_control/max_calls.F90'),
-        Include(science_root / 'um/atmosphere/radiation_control/r2_calc_total_cloud_cover.F90'),
-        Include(science_root / 'um/atmosphere/radiation_control/rad_input_mod.F90'),
-        Include(science_root / 'um/atmosphere/radiation_control/solinc_data.F90'),
-        Include(science_root / 'um/atmosphere/radiation_control/spec_sw_lw.F90'),
-        Include(science_root / 'um/atmosphere/stochastic_physics/stochastic_physics_run_mod.F90'),
-        Include(science_root / 'um/atmosphere/tracer_advection/trsrce-trsrce2a.F90'),
-        Include(science_root / 'um/control/dummy_libs/drhook/parkind1.F90'),
-        Include(science_root / 'um/control/dummy_libs/drhook/yomhook.F90'),
-        Include(science_root / 'um/control/glomap_clim_interface/glomap_clim_option_mod.F90'),
-        Include(science_root / 'um/control/grids'),
-        Include(science_root / 'um/control/misc'),
-        Include(science_root / 'um/control/mpp/decomp_params.F90'),
-        Include(science_root / 'um/control/mpp/um_parcore.F90'),
-        Include(science_root / 'um/control/mpp/um_parparams.F90'),
-        Include(science_root / 'um/control/mpp/um_parvars.F90'),
-        Include(science_root / 'um/control/stash/copydiag_3d_mod.F90'),
-        Include(science_root / 'um/control/stash/copydiag_mod.F90'),
-        Include(science_root / 'um/control/stash/cstash_mod.F90'),
-        Include(science_root / 'um/control/stash/profilename_length_mod.F90'),
-        Include(science_root / 'um/control/stash/set_levels_list.F90'),
-        Include(science_root / 'um/control/stash/set_pseudo_list.F90'),
-        Include(science_root / 'um/control/stash/stash_array_mod.F90'),
-        Include(science_root / 'um/control/stash/stparam_mod.F90'),
-        Include(science_root / 'um/control/stash/um_stashcode_mod.F90'),
-        Include(science_root / 'um/control/top_level'),
-        Include(science_root / 'um/control/ukca_interface/atmos_ukca_callback_mod.F90'),
-        Include(science_root / 'um/control/ukca_interface/atmos_ukca_humidity_mod.F90'),
-        Include(science_root / 'um/control/ukca_interface/get_emdiag_stash_mod.F90'),
-        Include(science_root / 'um/control/ukca_interface/ukca_d1_defs.F90'),
-        Include(science_root / 'um/control/ukca_interface/ukca_dissoc.F90'),
-        Include(science_root / 'um/control/ukca_interface/ukca_eg_tracers_total_mass_mod.F90'),
-        Include(science_root / 'um/control/ukca_interface/ukca_nmspec_mod.F90'),
-        Include(science_root / 'um/control/ukca_interface/ukca_option_mod.F90'),
-        Include(science_root / 'um/control/ukca_interface/ukca_photo_scheme_mod.F90'),
-        Include(science_root / 'um/control/ukca_interface/ukca_radaer_lut_in.F90'),
-        Include(science_root / 'um/control/ukca_interface/ukca_radaer_read_precalc.F90'),
-        Include(science_root / 'um/control/ukca_interface/ukca_radaer_read_presc_mod.F90'),
-        Include(science_root / 'um/control/ukca_interface/ukca_radaer_struct_mod.F90'),
-        Include(science_root / 'um/control/ukca_interface/ukca_scavenging_diags_mod.F90'),
-        Include(science_root / 'um/control/ukca_interface/ukca_scavenging_mod.F90'),
-        Include(science_root / 'um/control/ukca_interface/ukca_tracer_stash.F90'),
-        Include(science_root / 'um/control/ukca_interface/ukca_um_legacy_mod.F90'),
-        Include(science_root / 'um/control/ukca_interface/ukca_volcanic_so2.F90'),
-        Include(science_root / 'um/scm/modules/scmoptype_defn.F90'),
-        Include(science_root / 'um/scm/modules/s_scmop_mod.F90'),
-        Include(science_root / 'um/scm/modules/scm_convss_dg_mod.F90'),
-        Include(science_root / 'um/scm/stub/dgnstcs_glue_conv.F90'),
-        Include(science_root / 'um/scm/stub/scmoutput_stub.F90'),
-        Include(science_root / 'um/atmosphere/COSP/cosp_input_mod.F90'),
-        Include(science_root / 'um/control/coupling'),
-        Include(science_root / 'um/atmosphere/gravity_wave_drag/g_wave_input_mod.F90'),
-        Include(science_root / 'um/atmosphere/gravity_wave_drag/gw_ussp_prec_mod.F90'),
-        Include(science_root / 'um/atmosphere/gravity_wave_drag/gw_ussp_params_mod.F90'),
-        Include(science_root / 'um/atmosphere/gravity_wave_drag/gw_ussp_core_mod.F90'),
-        Include(science_root / 'um/atmosphere/gravity_wave_drag/gw_ussp_mod.F90'),
-        Include(science_root / 'um/atmosphere/gravity_wave_drag/gw_block.F90'),
-        Include(science_root / 'um/atmosphere/gravity_wave_drag/gw_wave.F90'),
-        Include(science_root / 'um/atmosphere/gravity_wave_drag/gw_setup.F90'),
-        Include(science_root / 'um/atmosphere/gravity_wave_drag/c_gwave_mod.F90'),
-        Include(science_root / 'um/utility/qxreconf/calc_fit_fsat.F'),
-
-        Exclude(science_root / 'jules'),
-        Include(science_root / 'jules/control/shared'),
-        Include(science_root / 'jules/control/lfric'),
-        Include(science_root / 'jules/control/cable/shared'),
-        Include(science_root / 'jules/control/cable/cable_land'),
-        Include(science_root / 'jules/control/cable/interface'),
-        Include(science_root / 'jules/control/cable/util'),
-        Include(science_root / 'jules/params/cable'),
-        Include(science_root / 'jules/science_cable'),
-        Include(science_root / 'jules/util/cable'),
-        Include(science_root / 'jules/initialisation/cable'),
-        Include(science_root / 'jules/control/standalone/jules_fields_mod.F90'),
-        Include(science_root / 'jules/util/shared/gridbox_mean_mod.F90'),
-        Include(science_root / 'jules/util/shared/metstats/metstats_mod.F90'),
-        Include(science_root / 'jules/initialisation/shared/allocate_jules_arrays.F90'),
-        Include(science_root / 'jules/initialisation/shared/freeze_soil.F90'),
-        Include(science_root / 'jules/initialisation/shared/calc_urban_aero_fields_mod.F90'),
-        Include(science_root / 'jules/initialisation/shared/check_compatible_options_mod.F90'),
-        Include(science_root / 'jules/science/deposition'),
-        Include(science_root / 'jules/science/params'),
-        Include(science_root / 'jules/science/radiation'),
-        Include(science_root / 'jules/science/snow'),
-        Include(science_root / 'jules/science/soil'),
-        Include(science_root / 'jules/science/surface'),
-        Include(science_root / 'jules/science/vegetation'),
-
-        Exclude(science_root / 'socrates'),
-        Include(science_root / 'socrates/radiance_core'),
-        Include(science_root / 'socrates/interface_core'),
-        Include(science_root / 'socrates/illumination'),
-
-        Exclude(science_root / 'ukca'),
-        Include(science_root / 'ukca/science'),
-        Include(science_root / 'ukca/control/core'),
-        Include(science_root / 'ukca/control/glomap_clim/interface'),
-
-        Exclude(science_root / 'shumlib')
 
-    ]
+def use_ccache(config):
+    """
+    Launch the C compiler through ccache, if it's available.
+
+    ccache doesn't support Fortran, so the Fortran compiler is left alone.
+    The compiler is copied into this config's tool box, so we don't change the
+    default compiler used by other configs in this process. The ccache settings
+    are only used for the compile commands, and override any in the environment.
+
+    """
+    ccache = Ccache()
+    if not ccache.is_available:
+        return
+    compiler = copy.copy(config.tool_box[Category.C_COMPILER])
+    # Hit the cache regardless of where the source was checked out,
+    # and when a file was touched without changing. Keep the cache with the
+    # project, and notice a changed compiler even if its mtime doesn't change.
+    compiler.set_launcher(ccache, env={
+        'CCACHE_DIR': str(config.project_workspace / '.ccache'),
+        'CCACHE_BASEDIR': str(config.source_root),
+        'CCACHE_SLOPPINESS': 'time_macros,include_file_mtime',
+        'CCACHE_COMPILERCHECK': 'content',
+    })
+    config.tool_box.add_tool(compiler, silent_replace=True)
 
 
 if __name__ == '__main__':
@@ -176,34 +220,37 @@ if __name__ == '__main__':
 
         # todo: use different dst_labels because they all go into the same folder,
         #       making it hard to see what came from where?
-        # internal dependencies
-        grab_folder(state, src=lfric_source / 'infrastructure/source/', dst_label='lfric')
-        grab_folder(state, src=lfric_source / 'components/driver/source/', dst_label='lfric')
+        # These all go into the same folder, so copy them with a single rsync.
+        grab_folder(state, dst_label='lfric', src=[
+            # internal dependencies
+            lfric_source / 'infrastructure/source/',
+            lfric_source / 'components/driver/source/',
+            lfric_source / 'components/science/source/',
+            lfric_source / 'components/lfric-xios/source/',
+            # coupler - oasis component
+            lfric_source / 'components/coupler-oasis/source/',
+            # gungho dynamical core
+            lfric_source / 'gungho/source/',
+            lfric_source / 'um_physics/source/',
+            lfric_source / 'socrates/source/',
+            lfric_source / 'jules/source/',
+            # lfric_atm
+            lfric_source / 'lfric_atm/source/',
+        ])
         grab_folder(state, src=lfric_source / 'components' / 'inventory' / 'source', dst_label='')
-        grab_folder(state, src=lfric_source / 'components/science/source/', dst_label='lfric')
-        grab_folder(state, src=lfric_source / 'components/lfric-xios/source/', dst_label='lfric', )
-
-        # coupler - oasis component
-        grab_folder(state, src=lfric_source / 'components/coupler-oasis/source/', dst_label='lfric')
-
-        # gungho dynamical core
-        grab_folder(state, src=lfric_source / 'gungho/source/', dst_label='lfric')
-
-        grab_folder(state, src=lfric_source / 'um_physics/source/', dst_label='lfric')
-        grab_folder(state, src=lfric_source / 'socrates/source/', dst_label='lfric')
-        grab_folder(state, src=lfric_source / 'jules/source/', dst_label='lfric')
 
         # UM physics - versions as required by the LFRIC_REVISION in grab_lfric.py
 
-        fcm_export(state, src='fcm:um.xm_tr/src', dst_label='science/um', revision=116568)
-        fcm_export(state, src='fcm:jules.xm_tr/src', dst_label='science/jules', revision=25146)
-        fcm_export(state, src='fcm:socrates.xm_tr/src', dst_label='science/socrates', revision='1331')
-        fcm_export(state, src='fcm:shumlib.xm_tr/', dst_label='science/shumlib', revision='um13.1')
-        fcm_export(state, src='fcm:casim.xm_tr/src', dst_label='science/casim', revision='10024')
-        fcm_export(state, src='fcm:ukca.xm_tr/src', dst_label='science/ukca', revision='1179')
+        # These are network bound and go to separate folders, so fetch them at the same time.
+        grab_parallel(state, [
+            partial(fcm_export, src='fcm:um.xm_tr/src', dst_label='science/um', revision=116568),
+            partial(fcm_export, src='fcm:jules.xm_tr/src', dst_label='science/jules', revision=25146),
+            partial(fcm_export, src='fcm:socrates.xm_tr/src', dst_label='science/socrates', revision='1331'),
+            partial(fcm_export, src='fcm:shumlib.xm_tr/', dst_label='science/shumlib', revision='um13.1'),
+            partial(fcm_export, src='fcm:casim.xm_tr/src', dst_label='science/casim', revision='10024'),
+            partial(fcm_export, src='fcm:ukca.xm_tr/src', dst_label='science/ukca', revision='1179'),
+        ])
 
-        # lfric_atm
-        grab_folder(state, src=lfric_source / 'lfric_atm/source/', dst_label='lfric')
         grab_folder(state, src=lfric_source / 'lfric_atm' / 'optimisation',
                     dst_label='optimisation')
         # generate more source files in source and source/configuration
@@ -259,6 +306,7 @@ if __name__ == '__main__':
             ignore_mod_deps=['netcdf', 'MPI', 'yaxt', 'pfunit_mod', 'xios', 'mod_wait'],
         )
 
+        use_ccache(state)
         compile_c(state, common_flags=['-c', '-std=c99'])
 
         compile_fortran(
@@ -1,7 +1,7 @@
 import logging
 import os
 import shutil
-from typing import Optional
+from typing import List, Optional
 from pathlib import Path
 
 from fab.artefacts import ArtefactSet
@@ -9,6 +9,7 @@ from fab.build_config import BuildConfig
 from fab.steps import step
 from fab.steps.find_source_files import find_source_files
 from fab.tools import Category, Tool
+from fab.util import file_checksum, string_checksum
 
 logger = logging.getLogger('fab')
 
@@ -38,6 +39,21 @@ def configurator(config, lfric_source: Path, gpl_utils_source: Path, rose_meta_c
     config_dir = config_dir or config.source_root / 'configuration'
     config_dir.mkdir(parents=True, exist_ok=True)
 
+    # The generated source only depends on the metadata and the generator scripts,
+    # so we can skip the generation if none of them changed since the last run.
+    stamp_fpath = config_dir / '.configurator.stamp'
+    inputs_hash = _configurator_hash(
+        rose_meta_conf, [rose_picker_tool, gen_namelist_tool, gen_loader_tool, gen_feigns_tool])
+    outputs = [config_dir / name for name in
+               ['rose-meta.json', 'config_namelists.txt', 'configuration_mod.f90', 'feign_config_mod.f90']]
+    if (stamp_fpath.exists() and stamp_fpath.read_text() == str(inputs_hash)
+            and all(fpath.exists() for fpath in outputs)):
+        logger.info('configurator inputs unchanged, reusing generated source')
+        find_source_files(config, source_root=config_dir)
+        return
+    if stamp_fpath.exists():
+        stamp_fpath.unlink()
+
     env = os.environ.copy()
     rose_lfric_path = gpl_utils_source / 'lib/python'
     env['PYTHONPATH'] += f':{rose_lfric_path}'
@@ -81,9 +97,21 @@ def configurator(config, lfric_source: Path, gpl_utils_source: Path, rose_meta_c
     gft.run(additional_parameters=[rose_meta,
                                    '-output', feign_config_mod_fpath])
 
+    # write then rename, so an interrupted run never leaves a valid stamp
+    tmp_stamp_fpath = stamp_fpath.with_suffix('.tmp')
+    tmp_stamp_fpath.write_text(str(inputs_hash))
+    tmp_stamp_fpath.replace(stamp_fpath)
+
     find_source_files(config, source_root=config_dir)
 
 
+def _configurator_hash(rose_meta_conf: Path, tools: List[Path]) -> int:
+    # A hash of the metadata and the scripts which generate source from it.
+    return (file_checksum(rose_meta_conf).file_hash +
+            sum(file_checksum(tool).file_hash for tool in tools) +
+            string_checksum(str([rose_meta_conf, *tools])))
+
+
 # ============================================================================
 @step
 def fparser_workaround_stop_concatenation(config):
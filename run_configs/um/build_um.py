@@ -12,6 +12,7 @@ import logging
 import os
 import re
 import warnings
+from functools import partial
 
 from fab.artefacts import ArtefactSet, CollectionGetter
 from fab.build_config import AddFlags, BuildConfig
@@ -21,6 +22,7 @@ from fab.steps.archive_objects import archive_objects
 from fab.steps.c_pragma_injector import c_pragma_injector
 from fab.steps.compile_c import compile_c
 from fab.steps.compile_fortran import compile_fortran
+from fab.steps.grab import grab_parallel
 from fab.steps.grab.fcm import fcm_export
 from fab.steps.link import link_exe
 from fab.steps.preprocess import preprocess_c, preprocess_fortran
@@ -151,20 +153,23 @@ if __name__ == '__main__':
 
         # todo: these repo defs could make a good set of reusable variables
 
-        # UM 12.1, 16th November 2021
-        fcm_export(state, src='fcm:um.xm_tr/src', dst_label='um', revision=revision)
+        # The exports are network bound and go to separate folders, so fetch them at the same time.
+        grab_parallel(state, [
+            # UM 12.1, 16th November 2021
+            partial(fcm_export, src='fcm:um.xm_tr/src', dst_label='um', revision=revision),
 
-        # JULES 6.2, for UM 12.1
-        fcm_export(state, src='fcm:jules.xm_tr/src', dst_label='jules', revision=um_revision)
+            # JULES 6.2, for UM 12.1
+            partial(fcm_export, src='fcm:jules.xm_tr/src', dst_label='jules', revision=um_revision),
 
-        # SOCRATES 21.11, for UM 12.1
-        fcm_export(state, src='fcm:socrates.xm_tr/src', dst_label='socrates', revision=um_revision)
+            # SOCRATES 21.11, for UM 12.1
+            partial(fcm_export, src='fcm:socrates.xm_tr/src', dst_label='socrates', revision=um_revision),
 
-        # SHUMLIB, for UM 12.1
-        fcm_export(state, src='fcm:shumlib.xm_tr/', dst_label='shumlib', revision=um_revision)
+            # SHUMLIB, for UM 12.1
+            partial(fcm_export, src='fcm:shumlib.xm_tr/', dst_label='shumlib', revision=um_revision),
 
-        # CASIM, for UM 12.1
-        fcm_export(state, src='fcm:casim.xm_tr/src', dst_label='casim', revision=um_revision)
+            # CASIM, for UM 12.1
+            partial(fcm_export, src='fcm:casim.xm_tr/src', dst_label='casim', revision=um_revision),
+        ])
 
         my_custom_code_fixes(state)
 
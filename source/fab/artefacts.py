@@ -37,6 +37,7 @@ class ArtefactSet(Enum):
     PRAGMAD_C = auto()
     BUILD_TREES = auto()
     OBJECT_FILES = auto()
+    OBJECT_SOURCES = auto()
     OBJECT_ARCHIVES = auto()
     EXECUTABLES = auto()
 
@@ -62,6 +63,10 @@ class ArtefactStore(dict):
                 # ObjectFiles store a default dictionary (i.e. a non-existing
                 # key will automatically add an empty `set`)
                 self[artefact] = defaultdict(set)
+            elif artefact == ArtefactSet.OBJECT_SOURCES:
+                # The source file each object file was compiled from,
+                # as the object file names don't say.
+                self[artefact] = {}
             else:
                 self[artefact] = set()
 
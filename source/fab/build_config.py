@@ -10,27 +10,41 @@ Contains the :class:`~fab.build_config.BuildConfig` and helper classes.
 import getpass
 import logging
 import os
+import re
 import sys
 import warnings
 from datetime import datetime
-from fnmatch import fnmatch
+from fnmatch import fnmatch, translate
 from logging.handlers import RotatingFileHandler
 from multiprocessing import cpu_count
 from pathlib import Path
 from string import Template
-from typing import List, Optional, Iterable
+from typing import List, Optional, Iterable, Pattern, Tuple
 
 from fab.artefacts import ArtefactSet, ArtefactStore
 from fab.constants import BUILD_OUTPUT, SOURCE_ROOT, PREBUILD
 from fab.metrics import send_metric, init_metrics, stop_metrics, metrics_summary
 from fab.tools.category import Category
 from fab.tools.tool_box import ToolBox
+from fab.steps import close_thread_pools
 from fab.steps.cleanup_prebuilds import CLEANUP_COUNT, cleanup_prebuilds
 from fab.util import TimerLogger, by_type, get_fab_workspace
 
 logger = logging.getLogger(__name__)
 
 
+def _env_jobs() -> Optional[int]:
+    # the number of jobs requested by the environment, if any
+    for name in ['FAB_JOBS', 'CMAKE_BUILD_PARALLEL_LEVEL']:
+        value = os.getenv(name)
+        if value:
+            try:
+                return max(1, int(value))
+            except ValueError:
+                logger.warning(f"ignoring non-integer {name}='{value}'")
+    return None
+
+
 class BuildConfig():
     """
     Contains and runs a list of build steps.
@@ -44,7 +58,8 @@ class BuildConfig():
                  multiprocessing: bool = True, n_procs: Optional[int] = None,
                  reuse_artefacts: bool = False,
                  fab_workspace: Optional[Path] = None, two_stage=False,
-                 verbose=False):
+                 verbose=False, cpu_affinity: Optional[Iterable[int]] = None,
+                 nice: int = 0):
         """
         :param project_label:
             Name of the build project. The project workspace folder is created from this name, with spaces replaced
@@ -53,7 +68,8 @@ class BuildConfig():
         :param multiprocessing:
             An option to disable multiprocessing to aid debugging.
         :param n_procs:
-            The number of cores to use for multiprocessing operations. Defaults to the number of available cores.
+            The number of cores to use for multiprocessing operations. Defaults to the FAB_JOBS or
+            CMAKE_BUILD_PARALLEL_LEVEL environment variable, otherwise the number of available cores.
         :param reuse_artefacts:
             A flag to avoid reprocessing certain files on subsequent runs.
             WARNING: Currently unsophisticated, this flag should only be used by Fab developers.
@@ -65,6 +81,11 @@ class BuildConfig():
             Compile .mod files first in a separate pass. Theoretically faster in some projects..
         :param verbose:
             DEBUG level logging.
+        :param cpu_affinity:
+            Optionally confine the worker processes, and the compilers they run, to these cores.
+            Useful on shared machines such as login nodes.
+        :param nice:
+            Niceness increment for the worker processes, to lower their priority on shared machines.
 
         """
         self._tool_box = tool_box
@@ -98,10 +119,19 @@ class BuildConfig():
             logger.info('debugger detected, running without multiprocessing')
             self.multiprocessing = False
 
-        self.n_procs = n_procs
+        self.cpu_affinity: Optional[List[int]] = None
+        if cpu_affinity:
+            self.cpu_affinity = sorted(set(cpu_affinity))
+            if not all(isinstance(cpu, int) and cpu >= 0 for cpu in self.cpu_affinity):
+                raise ValueError(f"cpu_affinity must be a list of core numbers, not {cpu_affinity}")
+        if not isinstance(nice, int):
+            raise ValueError(f"nice must be an integer, not {nice!r}")
+        self.nice = nice
+
+        self.n_procs = n_procs or _env_jobs()
         if self.multiprocessing and not self.n_procs:
             try:
-                self.n_procs = max(1, len(os.sched_getaffinity(0)))
+                self.n_procs = max(1, len(self.cpu_affinity or os.sched_getaffinity(0)))
             except AttributeError:
                 logger.error('could not enable multiprocessing')
                 self.multiprocessing = False
@@ -144,6 +174,7 @@ class BuildConfig():
         logger.info(f"Building '{self.project_label}' took {datetime.now() - self._start_time}")
 
         # always
+        close_thread_pools()
         self._finalise_metrics(self._start_time, self._build_timer)
         self._finalise_logging()
 
@@ -256,6 +287,10 @@ class AddFlags():
         self.match: str = match
         self.flags: List[str] = flags
 
+        # The match pattern and flags with $source and $output filled in, for the folders they were rendered for.
+        # Either is None if it uses $relative, which we have to fill in for each file.
+        self._rendered: Optional[Tuple[Tuple[Path, Path], Optional[Pattern], Optional[List[str]]]] = None
+
     # todo: we don't need the project_workspace, we could just pass in the output folder
     def run(self, fpath: Path, input_flags: List[str], config):
         """
@@ -269,16 +304,49 @@ class AddFlags():
             Contains the folders for templating `$source` and `$output`.
 
         """
+        folders = (config.source_root, config.build_output)
+        rendered = self._rendered
+        if rendered is None or rendered[0] != folders:
+            rendered = self._render(*folders)
+        _, match_pattern, flags = rendered
+
         params = {'relative': fpath.parent, 'source': config.source_root, 'output': config.build_output}
 
         # does the file path match our filter?
-        if not self.match or fnmatch(str(fpath), Template(self.match).substitute(params)):
+        if not self.match:
+            matches = True
+        elif match_pattern:
+            matches = bool(match_pattern.match(str(fpath)))
+        else:
+            matches = fnmatch(str(fpath), Template(self.match).substitute(params))
+
+        if matches:
             # use templating to render any relative paths in our flags
-            add_flags = [Template(flag).substitute(params) for flag in self.flags]
+            add_flags = flags or [Template(flag).substitute(params) for flag in self.flags]
 
             # add our flags
             input_flags += add_flags
 
+    def _render(self, source_root: Path, build_output: Path):
+        # Fill in $source and $output once, rather than for every file. This is called from multiple threads,
+        # but they all render the same thing, so we just replace the whole result in one assignment.
+        params = {'source': source_root, 'output': build_output}
+
+        match_pattern = None
+        try:
+            match_pattern = re.compile(translate(Template(self.match).substitute(params)))
+        except KeyError:
+            pass
+
+        flags = None
+        try:
+            flags = [Template(flag).substitute(params) for flag in self.flags]
+        except KeyError:
+            pass
+
+        self._rendered = ((source_root, build_output), match_pattern, flags)
+        return self._rendered
+
 
 class FlagsConfig():
     """
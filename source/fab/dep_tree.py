@@ -11,6 +11,7 @@ Classes and helper functions related to the dependency tree, as created by the a
 # todo: we've since adopted the term "source tree", so we should probably rename this module to match.
 from abc import ABC
 import logging
+import sys
 from pathlib import Path
 from typing import Set, Dict, Iterable, List, Union, Optional, Any
 
@@ -30,6 +31,8 @@ class AnalysedDependent(AnalysedFile, ABC):
     During dependency analysis, symbol dependencies are turned into file dependencies.
 
     """
+    __slots__ = ('symbol_defs', 'symbol_deps', 'file_deps')
+
     def __init__(self, fpath: Union[str, Path], file_hash: Optional[int] = None,
                  symbol_defs: Optional[Iterable[str]] = None, symbol_deps: Optional[Iterable[str]] = None,
                  file_deps: Optional[Iterable[Path]] = None):
@@ -50,20 +53,21 @@ class AnalysedDependent(AnalysedFile, ABC):
         """
         super().__init__(fpath=fpath, file_hash=file_hash)
 
-        self.symbol_defs: Set[str] = set(symbol_defs or {})
-        self.symbol_deps: Set[str] = set(symbol_deps or {})
+        # Symbol names are interned, as the same names appear in many files.
+        self.symbol_defs: Set[str] = set(map(sys.intern, symbol_defs or {}))
+        self.symbol_deps: Set[str] = set(map(sys.intern, symbol_deps or {}))
         self.file_deps: Set[Path] = set(file_deps or [])
 
-        assert all([d and len(d) for d in self.symbol_defs]), "bad symbol definitions"
-        assert all([d and len(d) for d in self.symbol_deps]), "bad symbol dependencies"
+        assert all(self.symbol_defs), "bad symbol definitions"
+        assert all(self.symbol_deps), "bad symbol dependencies"
 
     def add_symbol_def(self, name):
-        assert name and len(name)
-        self.symbol_defs.add(name.lower())
+        assert name
+        self.symbol_defs.add(sys.intern(name.lower()))
 
     def add_symbol_dep(self, name):
-        assert name and len(name)
-        self.symbol_deps.add(name.lower())
+        assert name
+        self.symbol_deps.add(sys.intern(name.lower()))
 
     def add_file_dep(self, name):
         self.file_deps.add(Path(name))
@@ -98,8 +102,8 @@ class AnalysedDependent(AnalysedFile, ABC):
         return result
 
 
-def extract_sub_tree(source_tree: Dict[Path, AnalysedDependent], root: Path, verbose=False)\
-        -> Dict[Path, AnalysedDependent]:
+def extract_sub_tree(source_tree: Dict[Path, AnalysedDependent], root: Path, verbose=False,
+                     into: Optional[Dict[Path, AnalysedDependent]] = None) -> Dict[Path, AnalysedDependent]:
     """
     Extract the subtree required to build the target, from the full source tree of all analysed source files.
 
@@ -109,46 +113,45 @@ def extract_sub_tree(source_tree: Dict[Path, AnalysedDependent], root: Path, ver
         The root of the dependency tree, this is the filename containing the Fortran program.
     :param verbose:
         Log missing dependencies.
+    :param into:
+        Optional tree to add the subtree to, which is then returned.
+        Files already in it are not followed again.
 
     """
-    result: Dict[Path, AnalysedDependent] = dict()
+    result: Dict[Path, AnalysedDependent] = dict() if into is None else into
     missing: Set[Path] = set()
 
-    _extract_sub_tree(src_tree=source_tree, key=root, dst_tree=result, missing=missing, verbose=verbose)
-
-    if missing:
-        logger.warning(f"{root} has missing deps: {missing}")
-
-    return result
+    # Walk the tree with our own stack rather than recursion, which is slower and limited in depth.
+    # The root must exist, but its deps may be missing.
+    stack = [(root, source_tree[root], 0)]
+    while stack:
+        key, node, indent = stack.pop()
 
+        # is this node already in the sub tree?
+        if key in result:
+            continue
 
-def _extract_sub_tree(src_tree: Dict[Path, AnalysedDependent], key: Path,
-                      dst_tree: Dict[Path, AnalysedDependent], missing: Set[Path], verbose: bool, indent: int = 0):
-    # is this node already in the sub tree?
-    if key in dst_tree:
-        return
+        if verbose:
+            logger.debug("----" * indent + str(key))
 
-    if verbose:
-        logger.debug("----" * indent + str(key))
+        # add it to the output tree, and its child deps to the stack
+        result[key] = node
+        for file_dep in node.file_deps:
+            dep_node = source_tree.get(file_dep)
 
-    # add it to the output tree
-    node = src_tree[key]
-    assert node.fpath == key, "tree corrupted"
-    dst_tree[key] = node
+            # one of its deps is missing!
+            if not dep_node:
+                if verbose:
+                    logger.debug("----" * (indent + 1) + " !!MISSING!! " + str(file_dep))
+                missing.add(file_dep)
+                continue
 
-    # add its child deps
-    for file_dep in node.file_deps:
+            stack.append((file_dep, dep_node, indent + 1))
 
-        # one of its deps is missing!
-        if not src_tree.get(file_dep):
-            if logger and verbose:
-                logger.debug("----" * indent + " !!MISSING!! " + str(file_dep))
-            missing.add(file_dep)
-            continue
+    if missing:
+        logger.warning(f"{root} has missing deps: {missing}")
 
-        # add this child dep
-        _extract_sub_tree(
-            src_tree=src_tree, key=file_dep, dst_tree=dst_tree, missing=missing, verbose=verbose, indent=indent + 1)
+    return result
 
 
 def filter_source_tree(source_tree: Dict[Path, AnalysedDependent], suffixes: Iterable[str]) -> List[AnalysedDependent]:
@@ -175,9 +178,8 @@ def validate_dependencies(source_tree):
         The source tree of analysed files.
 
     """
-    missing = set()
-    for f in source_tree.values():
-        missing.update([str(file_dep) for file_dep in f.file_deps if file_dep not in source_tree])
+    all_deps: Set[Path] = set().union(*(f.file_deps for f in source_tree.values()))
+    missing = {str(file_dep) for file_dep in all_deps - source_tree.keys()}
 
     if missing:
         logger.error(f"Unknown dependencies, expecting build to fail: {', '.join(sorted(missing))}")
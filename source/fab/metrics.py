@@ -29,6 +29,7 @@ stop
 import datetime
 import json
 import logging
+import threading
 import warnings
 from collections import defaultdict
 from multiprocessing import Process, Pipe
@@ -43,6 +44,8 @@ logger = logging.getLogger(__name__)
 # the pipe for individual metrics
 _metric_recv_conn: Optional[Connection] = None
 _metric_send_conn: Optional[Connection] = None
+# metrics can be sent from a pool of threads, which mustn't write to the pipe at the same time
+_metric_send_lock = threading.Lock()
 
 # the process which receives individual metrics
 _metric_recv_process: Optional[Process] = None
@@ -139,7 +142,8 @@ def send_metric(group: str, name: str, value):
     if not _metric_send_conn:
         warnings.warn('_metric_send_conn not set, cannot send metrics')
         return
-    _metric_send_conn.send([group, name, value])  # type: ignore
+    with _metric_send_lock:
+        _metric_send_conn.send([group, name, value])  # type: ignore
 
 
 def stop_metrics():
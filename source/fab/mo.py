@@ -9,7 +9,7 @@ A temporary place for some Met Office specific logic which, for now, needs to be
 """
 
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Set
 
 from fab.dep_tree import AnalysedDependent, filter_source_tree, logger
 from fab.parse.c import AnalysedC
@@ -29,10 +29,15 @@ def add_mo_commented_file_deps(source_tree: Dict[Path, AnalysedDependent]):
     analysed_fortran: List[AnalysedFortran] = filter_source_tree(source_tree, '.f90')  # type: ignore
     analysed_c: List[AnalysedC] = filter_source_tree(source_tree, '.c')  # type: ignore
 
-    lookup = {c.fpath.name: c for c in analysed_c}
+    lookup = {c.fpath.name: c.fpath for c in analysed_c}
     num_found = 0
+    not_found: Set[str] = set()
     for f in analysed_fortran:
+        if not f.mo_commented_file_deps:
+            continue
         num_found += len(f.mo_commented_file_deps)
-        for dep in f.mo_commented_file_deps:
-            f.file_deps.add(lookup[dep].fpath)
+        f.file_deps.update(lookup[dep] for dep in f.mo_commented_file_deps if dep in lookup)
+        not_found.update(f.mo_commented_file_deps - lookup.keys())
     logger.info(f"processed {num_found} DEPENDS ON file dependencies")
+    if not_found:
+        logger.warning(f"DEPENDS ON files not found: {', '.join(sorted(not_found))}")
@@ -24,6 +24,10 @@ class AnalysedFile(ABC):
     Analysis results for a single file. Abstract base class.
 
     """
+    # There can be many thousands of these, so they have no instance dict.
+    # Subclasses must list any attributes they add.
+    __slots__ = ('fpath', '_file_hash')
+
     def __init__(self, fpath: Union[str, Path], file_hash: Optional[int] = None):
         """
         :param fpath:
@@ -46,9 +50,17 @@ class AnalysedFile(ABC):
             self._file_hash = file_checksum(self.fpath).file_hash
         return self._file_hash
 
+    def _attributes(self) -> Dict[str, Any]:
+        # All our slotted attributes, as vars() would give with an instance dict.
+        return {name: getattr(self, name)
+                for cls in type(self).__mro__ for name in getattr(cls, '__slots__', ())
+                if hasattr(self, name)}
+
     def __eq__(self, other):
-        # todo: better to use self.field_names() instead of vars(self) in order to evaluate any lazy attributes?
-        return vars(self) == vars(other)
+        # todo: better to use self.field_names() in order to evaluate any lazy attributes?
+        if not isinstance(other, AnalysedFile):
+            return NotImplemented
+        return self._attributes() == other._attributes()
 
     # persistence
     def to_dict(self) -> Dict[str, Any]:
@@ -72,12 +84,14 @@ class AnalysedFile(ABC):
         # subclasses don't need to override this method
         d = self.to_dict()
         d["cls"] = self.__class__.__name__
-        json.dump(d, open(fpath, 'wt'), indent=4)
+        with open(fpath, 'wt') as outfile:
+            json.dump(d, outfile, indent=4)
 
     @classmethod
     def load(cls, fpath: Union[str, Path]):
         # subclasses don't need to override this method
-        d = json.load(open(fpath))
+        with open(fpath) as infile:
+            d = json.load(infile)
         found_class = d["cls"]
         if found_class != cls.__name__:
             raise ValueError(f"Expected class name '{cls.__name__}', found '{found_class}'")
@@ -107,41 +121,44 @@ class AnalysedFile(ABC):
     # We need to be hashable before we can go into a set, which is useful for our subclasses.
     # Note, the numerical result will change with each Python invocation.
     def __hash__(self):
-        # Build up a list of things to hash, from our attributes.
+        # Build up a tuple of things to hash, from our attributes.
         # We use self.field_names() rather than vars(self) because we want to evaluate any lazy attributes.
-        # We turn dicts and sets into sorted tuples for hashing.
+        # We turn dicts and sets into frozensets for hashing, which takes linear time, unlike sorting them.
+        # The hash isn't cached because the analysis fills in some of these sets after construction.
         # todo: There's a good reason dicts and sets aren't supposed to be hashable.
         #       Please see https://github.com/metomi/fab/issues/229
-        things = set()
+        things = []
         for field_name in self.field_names():
             thing = getattr(self, field_name)
             if isinstance(thing, Dict):
-                things.add(tuple(sorted(thing.items())))
+                things.append(frozenset(thing.items()))
             elif isinstance(thing, Set):
-                things.add(tuple(sorted(thing)))
+                things.append(frozenset(thing))
             else:
-                things.add(thing)
+                things.append(thing)
 
         return hash(tuple(things))
 
 
-# todo: There's a design weakness relating to this class:
-#       we don't save empty results, which means we'll keep reanalysing them.
-#       We should save empty files and allow the loading to detect this, as it already reads the class name.
 class EmptySourceFile(AnalysedFile):
     """
     An analysis result for a file which resulted in an empty parse tree.
 
+    These are saved like any other result, so that we don't keep reanalysing empty files.
+
     """
-    def __init__(self, fpath: Union[str, Path]):
+    __slots__ = ()
+
+    def __init__(self, fpath: Union[str, Path], file_hash: Optional[int] = None):
         """
         :param fpath:
             The path of the file which was analysed.
+        :param file_hash:
+            The checksum of the file which was analysed.
 
         """
-        super().__init__(fpath=fpath)
+        super().__init__(fpath=fpath, file_hash=file_hash)
 
     @classmethod
     def from_dict(cls, d):
-        # todo: load & save should be implemented here and used by the calling code, to save reanalysis.
-        raise NotImplementedError
+        return cls(fpath=Path(d["fpath"]), file_hash=d["file_hash"])
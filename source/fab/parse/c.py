@@ -36,7 +36,7 @@ class AnalysedC(AnalysedDependent):
     # Note: This subclass adds nothing to it's parent, which provides everything it needs.
     #       We'd normally remove an irrelevant class like this but we want to keep the door open
     #       for filtering analysis results by type, rather than suffix.
-    pass
+    __slots__ = ()
 
 
 class CAnalyser(object):
@@ -8,8 +8,9 @@ Fortran language handling classes.
 
 """
 import logging
+import sys
 from pathlib import Path
-from typing import Union, Optional, Iterable, Dict, Any, Set
+from typing import Union, Optional, Iterable, Dict, Any, Set, FrozenSet
 
 from fparser.common.readfortran import FortranStringReader   # type: ignore
 from fparser.two.Fortran2003 import (  # type: ignore
@@ -37,6 +38,8 @@ class AnalysedFortran(AnalysedDependent):
     :class:`~fab.steps.analyse.Analyse` step, which will be converted at runtime into an instance of this class.
 
     """
+    __slots__ = ('program_defs', 'module_defs', 'module_deps', 'mo_commented_file_deps', 'psyclone_kernels')
+
     def __init__(self, fpath: Union[str, Path], file_hash: Optional[int] = None,
                  program_defs: Optional[Iterable[str]] = None,
                  module_defs: Optional[Iterable[str]] = None, symbol_defs: Optional[Iterable[str]] = None,
@@ -73,9 +76,9 @@ class AnalysedFortran(AnalysedDependent):
         super().__init__(fpath=fpath, file_hash=file_hash,
                          symbol_defs=symbol_defs, symbol_deps=symbol_deps, file_deps=file_deps)
 
-        self.program_defs: Set[str] = set(program_defs or [])
-        self.module_defs: Set[str] = set(module_defs or [])
-        self.module_deps: Set[str] = set(module_deps or [])
+        self.program_defs: Set[str] = set(map(sys.intern, program_defs or []))
+        self.module_defs: Set[str] = set(map(sys.intern, module_defs or []))
+        self.module_deps: Set[str] = set(map(sys.intern, module_deps or []))
         self.mo_commented_file_deps: Set[str] = set(mo_commented_file_deps or [])
 
         # Todo: Ideally Psyclone stuff would not be part of this general fortran analysis code.
@@ -85,15 +88,15 @@ class AnalysedFortran(AnalysedDependent):
         self.validate()
 
     def add_program_def(self, name):
-        self.program_defs.add(name.lower())
+        self.program_defs.add(sys.intern(name.lower()))
         self.add_symbol_def(name)
 
     def add_module_def(self, name):
-        self.module_defs.add(name.lower())
+        self.module_defs.add(sys.intern(name.lower()))
         self.add_symbol_def(name)
 
     def add_module_dep(self, name):
-        self.module_deps.add(name.lower())
+        self.module_deps.add(sys.intern(name.lower()))
         self.add_symbol_dep(name)
 
     @property
@@ -149,11 +152,10 @@ class AnalysedFortran(AnalysedDependent):
     def validate(self):
         assert self.file_hash is not None
 
-        assert all([d and len(d) for d in self.program_defs]), "bad program definitions"
-        assert all([d and len(d) for d in self.module_defs]), "bad module definitions"
-        assert all([d and len(d) for d in self.symbol_defs]), "bad symbol definitions"
-        assert all([d and len(d) for d in self.module_deps]), "bad module dependencies"
-        assert all([d and len(d) for d in self.symbol_deps]), "bad symbol dependencies"
+        # the symbols were checked by AnalysedDependent
+        assert all(self.program_defs), "bad program definitions"
+        assert all(self.module_defs), "bad module definitions"
+        assert all(self.module_deps), "bad module dependencies"
 
         # todo: this feels a little clanky.
         assert self.program_defs <= self.symbol_defs, "programs definitions must also be symbol definitions"
@@ -172,11 +174,12 @@ class FortranAnalyser(FortranAnalyserBase):
         :param std:
             The Fortran standard.
         :param ignore_mod_deps:
-            Module names to ignore in use statements.
+            Module names to ignore in use statements. Like Fortran, these are not case sensitive.
 
         """
         super().__init__(result_class=AnalysedFortran, std=std)
-        self.ignore_mod_deps: Iterable[str] = list(ignore_mod_deps or [])
+        # a set, as we check every use statement against these
+        self.ignore_mod_deps: FrozenSet[str] = frozenset(m.lower() for m in ignore_mod_deps or [])
         self.depends_on_comment_found = False
 
     def walk_nodes(self, fpath, file_hash, node_tree) -> AnalysedFortran:
@@ -253,10 +256,11 @@ class FortranAnalyser(FortranAnalyserBase):
     def _process_use_statement(self, analysed_file, obj):
         use_name = _typed_child(obj, Name, must_exist=True)
         use_name = use_name.string
+        use_name_lower = use_name.lower()
 
-        if use_name in self.ignore_mod_deps:
+        if use_name_lower in self.ignore_mod_deps:
             logger.debug(f"ignoring use of {use_name}")
-        elif use_name.lower() not in self._intrinsic_modules:
+        elif use_name_lower not in self._intrinsic_modules:
             # found a dependency on fortran
             analysed_file.add_module_dep(use_name)
 
@@ -316,10 +320,11 @@ class FortranAnalyser(FortranAnalyserBase):
                 return
 
             # Register the module name
-            if module_name in self.ignore_mod_deps:
+            module_name_lower = module_name.lower()
+            if module_name_lower in self.ignore_mod_deps:
                 logger.debug(f"ignoring use of {module_name}")
                 return
-            if module_name.lower() not in self._intrinsic_modules:
+            if module_name_lower not in self._intrinsic_modules:
                 # found a dependency on fortran
                 analysed_file.add_module_dep(module_name)
 
@@ -24,6 +24,21 @@ from fab.util import log_or_dot, file_checksum
 
 logger = logging.getLogger(__name__)
 
+# The most recently created parser and its standard. See _get_parser().
+_parser = None
+_parser_std = None
+
+
+def _get_parser(std: str):
+    # Creating a parser is slow, so reuse it when the standard is unchanged.
+    # The parser classes are set up in place for a standard,
+    # so we can only reuse the most recent one.
+    global _parser, _parser_std
+    if _parser is None or std != _parser_std:
+        _parser = ParserFactory().create(std=std)
+        _parser_std = std
+    return _parser
+
 
 def iter_content(obj):
     """
@@ -75,7 +90,7 @@ class FortranAnalyserBase(ABC):
     Base class for Fortran parse-tree analysers, e.g FortranAnalyser and X90Analyser.
 
     """
-    _intrinsic_modules = ['iso_fortran_env', 'iso_c_binding']
+    _intrinsic_modules = frozenset(['iso_fortran_env', 'iso_c_binding'])
 
     def __init__(self, result_class, std=None):
         """
@@ -86,7 +101,7 @@ class FortranAnalyserBase(ABC):
 
         """
         self.result_class = result_class
-        self.f2008_parser = ParserFactory().create(std=std or "f2008")
+        self.f2008_parser = _get_parser(std or "f2008")
 
         # todo: this, and perhaps other runtime variables like it, might be better set at construction
         #       if we construct these objects at runtime instead...
@@ -94,7 +109,7 @@ class FortranAnalyserBase(ABC):
         self._config = None
 
     def run(self, fpath: Path) \
-            -> Union[Tuple[AnalysedDependent, Path], Tuple[EmptySourceFile, None], Tuple[Exception, None]]:
+            -> Union[Tuple[Union[AnalysedDependent, EmptySourceFile], Path], Tuple[Exception, None]]:
         """
         Parse the source file and record what we're interested in (subclass specific).
 
@@ -112,7 +127,7 @@ class FortranAnalyserBase(ABC):
             log_or_dot(logger, f"found analysis prebuild for {fpath}")
 
             # Load the result file into whatever result class we use.
-            loaded_result = self.result_class.load(analysis_fpath)
+            loaded_result = self._load_analysis(analysis_fpath)
             if loaded_result:
                 # This result might have been created by another user; their prebuild folder copied to ours.
                 # If so, the fpath in the result will *not* point to the file we eventually want to compile,
@@ -126,10 +141,12 @@ class FortranAnalyserBase(ABC):
         node_tree = self._parse_file(fpath=fpath)
         if isinstance(node_tree, Exception):
             return Exception(f"error parsing file '{fpath}':\n{node_tree}"), None
-        if node_tree.content[0] is None:
+        if not node_tree.content or node_tree.content[0] is None:
             logger.debug(f"  empty tree found when parsing {fpath}")
-            # todo: If we don't save the empty result we'll keep analysing it every time!
-            return EmptySourceFile(fpath), None
+            # Save the empty result too, so we don't keep analysing it every time.
+            empty_file = EmptySourceFile(fpath, file_hash=file_hash)
+            empty_file.save(analysis_fpath)
+            return empty_file, analysis_fpath
 
         # find things in the node tree
         analysed_file = self.walk_nodes(fpath=fpath, file_hash=file_hash, node_tree=node_tree)
@@ -137,6 +154,13 @@ class FortranAnalyserBase(ABC):
 
         return analysed_file, analysis_fpath
 
+    def _load_analysis(self, analysis_fpath) -> Union[AnalysedDependent, EmptySourceFile]:
+        # The result file might be an analysed file or an empty file.
+        try:
+            return self.result_class.load(analysis_fpath)
+        except ValueError:
+            return EmptySourceFile.load(analysis_fpath)
+
     def _get_analysis_fpath(self, fpath, file_hash) -> Path:
         return Path(self._config.prebuild_folder / f'{fpath.stem}.{file_hash}.an')
 
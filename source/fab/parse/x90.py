@@ -18,6 +18,8 @@ class AnalysedX90(AnalysedFile):
     Analysis results for an x90 file.
 
     """
+    __slots__ = ('kernel_deps',)
+
     def __init__(self, fpath: Union[str, Path], file_hash: int,
                  # todo: the fortran version doesn't include the remaining args - update this too, for simplicity.
                  kernel_deps: Optional[Iterable[str]] = None):
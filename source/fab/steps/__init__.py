@@ -7,12 +7,26 @@
 Predefined build steps with sensible defaults.
 
 """
+import logging
 import multiprocessing
+import os
+import heapq
+import threading
+from itertools import count
+from multiprocessing.pool import ThreadPool
+from queue import Queue
+from typing import Dict, List, Tuple
 
 from fab.metrics import send_metric
 from fab.util import by_type, TimerLogger
 from functools import wraps
 
+logger = logging.getLogger(__name__)
+
+# Thread pools are kept for the whole build rather than started for every call, keyed by their settings.
+_thread_pools: Dict[Tuple, ThreadPool] = {}
+_thread_pools_lock = threading.Lock()
+
 
 def step(func):
     """Function decorator for steps."""
@@ -30,7 +44,7 @@ def step(func):
     return wrapper
 
 
-def run_mp(config, items, func, no_multiprocessing: bool = False):
+def run_mp(config, items, func, no_multiprocessing: bool = False, use_threads: bool = False):
     """
     Called from Step.run() to process multiple items in parallel.
 
@@ -44,11 +58,21 @@ def run_mp(config, items, func, no_multiprocessing: bool = False):
         A function to process a single item. Must accept a single argument.
     :param no_multiprocessing:
         Overrides the config's multiprocessing flag, disabling multiprocessing for this call.
+    :param use_threads:
+        Use a pool of threads instead of processes. This suits items which spend most of their time
+        waiting for a subprocess, such as a compiler, as it avoids pickling the arguments and results.
+        The function must be thread safe. The threads are kept for later calls, until the build ends.
 
     """
     if config.multiprocessing and not no_multiprocessing:
-        with multiprocessing.Pool(config.n_procs) as p:
-            results = p.map(func, items)
+        if use_threads:
+            # Threads take one item at a time. There's no pickling to save with chunks, and compile
+            # times vary a lot, so chunks would leave some threads idle while others work through theirs.
+            results = _get_thread_pool(config).map(func, items, chunksize=1)
+        else:
+            # Processes are forked for each call, so they start with everything the parent has set up so far.
+            with multiprocessing.Pool(config.n_procs, **_pool_init_args(config)) as p:
+                results = p.map(func, items)
     else:
         results = [func(f) for f in items]
 
@@ -71,14 +95,123 @@ def run_mp_imap(config, items, func, result_handler):
 
     """
     if config.multiprocessing:
-        with multiprocessing.Pool(config.n_procs) as p:
-            analysis_results = p.imap_unordered(func, items)
+        with multiprocessing.Pool(config.n_procs, **_pool_init_args(config)) as p:
+            analysis_results = p.imap_unordered(func, items, chunksize=_imap_chunksize(config, items))
             result_handler(analysis_results)
     else:
         analysis_results = (func(a) for a in items)  # generator
         result_handler(analysis_results)
 
 
+def run_mp_dataflow(config, items, func, result_handler, priority=None):
+    """
+    Like run_mp_imap, but each result can release more items to process, which start as soon as a worker is free.
+
+    Dependent work doesn't have to wait for a whole batch to finish, as it would with a call to run_mp per batch.
+    Uses the thread pool kept by run_mp, so the function must be thread safe.
+    The result handler is called in the calling thread, one result at a time.
+
+    :param items:
+        An iterable of items which can be processed straight away.
+    :param func:
+        A function to process a single item. Must accept a single argument.
+        An exception it raises is passed to the result handler in place of a result.
+    :param result_handler:
+        A function to handle a single result. Must accept a single argument,
+        and return an iterable of any items which can now be processed.
+    :param priority:
+        Optional function giving a number for an item. When there are more items than free workers,
+        the items with the highest numbers start first. Otherwise, items start in the order they're released.
+
+    """
+    # Items wait here until a worker is free, so that a later item with a higher priority can overtake them.
+    # The counter keeps items of equal priority in order, without ever comparing the items themselves.
+    waiting: List = []
+    counter = count()
+
+    def release(new_items):
+        for item in new_items:
+            heapq.heappush(waiting, (-priority(item) if priority else 0, next(counter), item))
+
+    release(items)
+
+    if not config.multiprocessing:
+        while waiting:
+            item = heapq.heappop(waiting)[-1]
+            try:
+                result = func(item)
+            except Exception as err:
+                result = err
+            release(result_handler(result))
+        return
+
+    pool = _get_thread_pool(config)
+    results = Queue()
+    n_running = 0
+    while waiting or n_running:
+        while waiting and n_running < config.n_procs:
+            item = heapq.heappop(waiting)[-1]
+            pool.apply_async(func, (item,), callback=results.put, error_callback=results.put)
+            n_running += 1
+
+        result = results.get()
+        n_running -= 1
+        release(result_handler(result))
+
+
+def _imap_chunksize(config, items) -> int:
+    # Send items to the workers in chunks, as map does, rather than one pickle and pipe round trip per item.
+    # Smaller chunks than map's keep the results arriving steadily, and we can't size a generator.
+    try:
+        n_items = len(items)
+    except TypeError:
+        return 1
+    return max(1, n_items // (config.n_procs * 16))
+
+
+def _get_thread_pool(config) -> ThreadPool:
+    # A thread pool for the config's settings, started on first use.
+    key = (config.n_procs, tuple(config.cpu_affinity or ()), config.nice)
+    with _thread_pools_lock:
+        pool = _thread_pools.get(key)
+        if pool is None:
+            pool = _thread_pools[key] = ThreadPool(config.n_procs, **_pool_init_args(config))
+    return pool
+
+
+def close_thread_pools():
+    """
+    Stop the worker threads kept by :func:`run_mp`. Called at the end of a build.
+
+    """
+    with _thread_pools_lock:
+        pools = list(_thread_pools.values())
+        _thread_pools.clear()
+    for pool in pools:
+        pool.close()
+        pool.join()
+
+
+def _pool_init_args(config):
+    # keyword arguments for a pool which applies the config's cpu affinity and niceness to each worker
+    if not config.cpu_affinity and not config.nice:
+        return {}
+    return {'initializer': _init_worker, 'initargs': (config.cpu_affinity, config.nice)}
+
+
+def _init_worker(cpu_affinity, nice):
+    # Runs at the start of each pool worker. On Linux, affinity and niceness apply to the calling thread,
+    # so this also works for thread pools, and is inherited by any subprocess the worker runs.
+    try:
+        if cpu_affinity:
+            os.sched_setaffinity(0, set(cpu_affinity))
+        if nice:
+            os.nice(nice)
+    except Exception as err:
+        # an exception here would kill the worker, and the pool would keep replacing it
+        logger.warning(f"could not set worker cpu affinity or niceness: {err}")
+
+
 def check_for_errors(results, caller_label=None):
     """
     Check an iterable of results for any exceptions and handle them gracefully.
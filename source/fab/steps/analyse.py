@@ -127,7 +127,8 @@ def analyse(
     source_getter = source or DEFAULT_SOURCE_GETTER
     root_symbols: Optional[List[str]] = [root_symbol] if isinstance(root_symbol, str) else root_symbol
     special_measure_analysis_results = list(special_measure_analysis_results or [])
-    unreferenced_deps = list(unreferenced_deps or [])
+    # drop any duplicates, but keep the order for reproducible logging
+    unreferenced_deps = list(dict.fromkeys(unreferenced_deps or []))
 
     # todo: these seem more like functions
     fortran_analyser = FortranAnalyser(std=std, ignore_mod_deps=ignore_mod_deps)
@@ -299,17 +300,18 @@ def _gen_symbol_table(analysed_files: Iterable[AnalysedDependent]) -> Dict[str,
     Create a dictionary mapping symbol names to the files in which they appear.
 
     """
-    symbols: Dict[str, Path] = {}
+    pairs = [(symbol_def, analysed_file.fpath)
+             for analysed_file in analysed_files for symbol_def in analysed_file.symbol_defs]
+
+    # Build the table in one go, reversed so the first file defining a symbol is the one we keep.
+    symbols: Dict[str, Path] = dict(reversed(pairs))
+
+    # check for duplicates
     duplicates = []
-    for analysed_file in analysed_files:
-        for symbol_def in analysed_file.symbol_defs:
-            # check for duplicates
-            if symbol_def in symbols:
-                duplicates.append(ValueError(
-                    f"duplicate symbol '{symbol_def}' defined in {analysed_file.fpath} "
-                    f"already found in {symbols[symbol_def]}"))
-                continue
-            symbols[symbol_def] = analysed_file.fpath
+    if len(symbols) < len(pairs):
+        duplicates = [
+            ValueError(f"duplicate symbol '{symbol_def}' defined in {fpath} already found in {symbols[symbol_def]}")
+            for symbol_def, fpath in pairs if symbols[symbol_def] != fpath]
 
     if duplicates:
         # we don't break the build because these symbols might not be
@@ -326,20 +328,21 @@ def _gen_file_deps(analysed_files: Iterable[AnalysedDependent], symbols: Dict[st
     Use the symbol table to convert symbol dependencies into file dependencies.
 
     """
-    deps_not_found = set()
+    deps_not_found: Set[str] = set()
+    symbol_names = symbols.keys()
     with TimerLogger("converting symbol to file deps"):
         for analysed_file in analysed_files:
-            for symbol_dep in analysed_file.symbol_deps:
-                file_dep = symbols.get(symbol_dep)
-                # don't depend on oneself!
-                if file_dep == analysed_file.fpath:
-                    continue
-                # warn of missing file
-                if not file_dep:
-                    deps_not_found.add(symbol_dep)
-                    logger.debug(f"not found {symbol_dep} for {analysed_file.fpath}")
-                    continue
-                analysed_file.file_deps.add(file_dep)
+            # set operations, rather than looking up each symbol in turn
+            file_deps = {symbols[symbol_dep] for symbol_dep in symbol_names & analysed_file.symbol_deps}
+            # don't depend on oneself!
+            file_deps.discard(analysed_file.fpath)
+            analysed_file.file_deps.update(file_deps)
+
+            # warn of missing file
+            not_found = analysed_file.symbol_deps - symbol_names
+            if not_found:
+                deps_not_found.update(not_found)
+                logger.debug(f"not found {', '.join(sorted(not_found))} for {analysed_file.fpath}")
     if deps_not_found:
         logger.info(f"{len(deps_not_found)} deps not found")
 
@@ -377,6 +380,5 @@ def _add_unreferenced_deps(unreferenced_deps, symbol_table: Dict[str, Path],
                         f"is already in the build tree")
             continue
 
-        # add the file and it's file deps
-        sub_tree = extract_sub_tree(source_tree=all_analysed_files, root=analysed_fpath)
-        build_tree.update(sub_tree)
+        # add the file and it's file deps, without following files already in the build tree
+        extract_sub_tree(source_tree=all_analysed_files, root=analysed_fpath, into=build_tree)
@@ -9,8 +9,10 @@ Object archive creation from a list of object files for use in static linking.
 """
 
 import logging
+from fnmatch import fnmatch
+from pathlib import Path
 from string import Template
-from typing import Optional
+from typing import Dict, List, Optional
 
 from fab.artefacts import ArtefactSet
 from fab.build_config import BuildConfig
@@ -35,7 +37,9 @@ DEFAULT_SOURCE_GETTER = CollectionGetter(ArtefactSet.OBJECT_FILES)
 def archive_objects(config: BuildConfig,
                     source: Optional[ArtefactsGetter] = None,
                     output_fpath=None,
-                    output_collection=ArtefactSet.OBJECT_ARCHIVES):
+                    output_collection=ArtefactSet.OBJECT_ARCHIVES,
+                    thin: bool = False,
+                    groups: Optional[Dict[str, str]] = None):
     """
     Create an object archive for every build target, from their object files.
 
@@ -97,6 +101,18 @@ def archive_objects(config: BuildConfig,
     :param output_collection:
         The name of the artefact collection to create. Defaults to the name in
         :const:`fab.artefacts.ArtefactSet.OBJECT_ARCHIVES`.
+    :param thin:
+        Create thin archives, which reference the object files instead of
+        copying them. This is much faster for large projects, but the
+        archives are only usable while the object files still exist.
+        Falls back to a normal archive if the archiver doesn't support it.
+    :param groups:
+        Optionally split each archive into one archive per group of object files, e.g. per subsystem,
+        so that a change in one group only rewrites that group's archive. A dict of group name to a
+        pattern matching the paths of the source files the objects were compiled from, which can include
+        "$output", e.g. `{'utils': '$output/utils/*'}`. The group name is appended to the archive name,
+        e.g. *jules_utils.a*. Objects matching no group stay in the usual archive. The linker resolves
+        references between the archives of a build target, see :meth:`~fab.tools.linker.Linker.link`.
 
     """
     # todo: the output path should not be an abs fpath, it should be relative
@@ -128,12 +144,57 @@ def archive_objects(config: BuildConfig,
             output_fpath = Template(str(output_fpath)).substitute(
                 output=config.build_output)
 
-        log_or_dot(logger, f"CreateObjectArchive running archiver for "
-                           f"'{output_fpath}'.")
+        for archive_fpath, members in _group_objects(config, output_fpath, objects, groups).items():
+            log_or_dot(logger, f"CreateObjectArchive running archiver for "
+                               f"'{archive_fpath}'.")
+            try:
+                # don't keep retrying thin archives once we know they don't work
+                thin = _create_archive(ar, archive_fpath, sorted(members), thin)
+            except RuntimeError as err:
+                raise RuntimeError(f"error creating object archive:\n{err}") from err
+
+            config.artefact_store.update_dict(output_collection, root,
+                                              archive_fpath)
+
+
+def _group_objects(config, output_fpath: str, objects,
+                   groups: Optional[Dict[str, str]]) -> Dict[str, List]:
+    """
+    Split the objects into an archive per group, named after the main archive. Returns a dict of archive
+    path to objects, leaving out empty archives.
+
+    """
+    if not groups:
+        return {output_fpath: list(objects)}
+
+    patterns = {name: Template(pattern).substitute(output=config.build_output)
+                for name, pattern in groups.items()}
+    # Object files are named after their hash in the prebuild folder, so we match on their source files.
+    # Objects we didn't compile are matched on their own path.
+    sources = config.artefact_store[ArtefactSet.OBJECT_SOURCES]
+    path = Path(output_fpath)
+    archives: Dict[str, List] = {}
+    for obj in objects:
+        source = str(sources.get(Path(obj), obj))
+        group = next((name for name, pattern in patterns.items() if fnmatch(source, pattern)), None)
+        archive_fpath = str(path.with_name(f'{path.stem}_{group}{path.suffix}')) if group else output_fpath
+        archives.setdefault(archive_fpath, []).append(obj)
+    return archives
+
+
+def _create_archive(ar: Ar, output_fpath: str, objects, thin: bool) -> bool:
+    """
+    Create an archive, falling back to a normal archive if a thin archive
+    can't be created (e.g. a non-GNU ar). Returns whether the archive is thin.
+
+    """
+    if thin:
         try:
-            ar.create(output_fpath, sorted(objects))
+            ar.create(output_fpath, objects, thin=True)
+            return True
         except RuntimeError as err:
-            raise RuntimeError(f"error creating object archive:\n{err}") from err
+            logger.warning(f"could not create thin archive, falling back to "
+                           f"a normal archive:\n{err}")
 
-        config.artefact_store.update_dict(output_collection, root,
-                                          output_fpath)
+    ar.create(output_fpath, objects)
+    return False
@@ -78,7 +78,7 @@ def compile_c(config, common_flags: Optional[List[str]] = None,
     mp_items = [(fpath, mp_payload) for fpath in to_compile]
 
     # compile everything in one go
-    compilation_results = run_mp(config, items=mp_items, func=_compile_file)
+    compilation_results = run_mp(config, items=mp_items, func=_compile_file, use_threads=True)
     check_for_errors(compilation_results, caller_label='compile c')
     compiled_c = list(by_type(compilation_results, CompiledFile))
     logger.info(f"compiled {len(compiled_c)} c files")
@@ -102,6 +102,7 @@ def store_artefacts(compiled_files: List[CompiledFile], build_lists: Dict[str, L
     for root, source_files in build_lists.items():
         new_objects = [lookup[af.fpath].output_fpath for af in source_files]
         artefact_store.update_dict(ArtefactSet.OBJECT_FILES, root, new_objects)
+    artefact_store[ArtefactSet.OBJECT_SOURCES].update({c.output_fpath: c.input_fpath for c in compiled_files})
 
 
 def _compile_file(arg: Tuple[AnalysedC, MpCommonArgs]):
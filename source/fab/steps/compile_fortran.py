@@ -12,19 +12,19 @@ import logging
 import os
 import shutil
 from dataclasses import dataclass
-from itertools import chain
+from collections import defaultdict
 from pathlib import Path
-from typing import List, Set, Dict, Tuple, Optional, Union
+from typing import Iterable, List, Set, Dict, Tuple, Optional, Union
 
 from fab.artefacts import (ArtefactsGetter, ArtefactSet, ArtefactStore,
                            FilterBuildTrees)
 from fab.build_config import BuildConfig, FlagsConfig
 from fab.metrics import send_metric
 from fab.parse.fortran import AnalysedFortran
-from fab.steps import check_for_errors, run_mp, step
+from fab.steps import check_for_errors, run_mp, run_mp_dataflow, step
 from fab.tools import Category, Compiler, Flags, FortranCompiler
 from fab.util import (CompiledFile, log_or_dot_finish, log_or_dot, Timer,
-                      by_type, file_checksum)
+                      file_checksum)
 
 logger = logging.getLogger(__name__)
 
@@ -80,20 +80,19 @@ def compile_fortran(config: BuildConfig, common_flags: Optional[List[str]] = Non
         config=config, flags=flags_config,
         mod_hashes=mod_hashes, syntax_only=syntax_only)
 
-    # compile everything in multiple passes
+    # compile everything, each file as soon as its dependencies are compiled
     compiled: Dict[Path, CompiledFile] = {}
     uncompiled: Set[AnalysedFortran] = set(sum(build_lists.values(), []))
     logger.info(f"compiling {len(uncompiled)} fortran files")
 
     if syntax_only:
-        logger.info("Starting two-stage compile: mod files, multiple passes")
+        logger.info("Starting two-stage compile: mod files, in dependency order")
     elif config.two_stage:
         logger.info(f"Compiler {compiler.name} does not support syntax-only, "
                     f"disabling two-stage compile.")
 
-    while uncompiled:
-        uncompiled = compile_pass(config=config, compiled=compiled, uncompiled=uncompiled,
-                                  mp_common_args=mp_common_args, mod_hashes=mod_hashes)
+    compile_as_ready(config=config, compiled=compiled, schedule=CompileSchedule(uncompiled),
+                     mp_common_args=mp_common_args, mod_hashes=mod_hashes)
     log_or_dot_finish(logger)
 
     if syntax_only:
@@ -101,13 +100,22 @@ def compile_fortran(config: BuildConfig, common_flags: Optional[List[str]] = Non
         mp_common_args.syntax_only = False
 
         # a single pass should now compile all the object files in one go
-        uncompiled = set(sum(build_lists.values(), []))  # todo: order by last compile duration
-        mp_args = [(fpath, mp_common_args) for fpath in uncompiled]
-        results_this_pass = run_mp(config, items=mp_args, func=process_file)
+        uncompiled = set(sum(build_lists.values(), []))
+        mp_args = [(fpath, mp_common_args) for fpath in longest_first(uncompiled)]
+        results_this_pass = run_mp(config, items=mp_args, func=process_file, use_threads=True)
         log_or_dot_finish(logger)
-        check_for_errors(results_this_pass, caller_label="compile_fortran")
-        compiled_this_pass = list(by_type(results_this_pass, CompiledFile))
-        logger.info(f"stage 2 compiled {len(compiled_this_pass)} files")
+
+        # there's a compilation result, or an error, and a list of prebuild files for each file
+        errors: List[Exception] = []
+        prebuild_files: List[Path] = []
+        for compiled_file, prebuilds in results_this_pass:
+            if isinstance(compiled_file, Exception):
+                errors.append(compiled_file)
+            else:
+                prebuild_files.extend(prebuilds)
+        check_for_errors(errors, caller_label="compile_fortran")
+        config.add_current_prebuilds(prebuild_files)
+        logger.info(f"stage 2 compiled {len(results_this_pass)} files")
 
     # record the compilation results for the next step
     store_artefacts(compiled, build_lists, config.artefact_store)
@@ -131,63 +139,203 @@ def handle_compiler_args(config: BuildConfig, common_flags=None,
     return compiler, flags_config
 
 
-def compile_pass(config, compiled: Dict[Path, CompiledFile], uncompiled: Set[AnalysedFortran],
-                 mp_common_args: MpCommonArgs, mod_hashes: Dict[str, int]):
+def compile_as_ready(config, compiled: Dict[Path, CompiledFile], schedule: 'CompileSchedule',
+                     mp_common_args: MpCommonArgs, mod_hashes: Dict[str, int]):
+    """
+    Compile each file as soon as the files it depends on have been compiled.
 
-    # what can we compile next?
-    compile_next = get_compile_next(compiled, uncompiled)
+    Rather than compiling in passes, where a pass can't start until the slowest file of the last pass is done,
+    a finished file immediately releases any files which were only waiting for it.
+    After an error, no new files are started, and the errors are raised once the running compiles finish.
 
-    # compile
-    logger.info(f"\ncompiling {len(compile_next)} of {len(uncompiled)} remaining files")
-    mp_args = [(fpath, mp_common_args) for fpath in compile_next]
-    results_this_pass = run_mp(config, items=mp_args, func=process_file)
+    """
+    errors: List[Exception] = []
+    prebuild_files: List[Path] = []
+
+    def compile_and_hash(arg: Tuple[AnalysedFortran, MpCommonArgs]):
+        # Hash the new modules in the worker thread, so the calling thread is free to start more files.
+        result = process_file(arg)
+        if isinstance(result[0], Exception):
+            return result, {}
+        return result, get_mod_hashes([arg[0]], config)
+
+    def handle_result(result) -> List[Tuple[AnalysedFortran, MpCommonArgs]]:
+        # an error raised by the worker, rather than returned
+        if isinstance(result, Exception):
+            errors.append(result)
+            return []
+
+        # there's a compilation result and a list of prebuild files for each compiled file, and its module hashes
+        (compiled_file, prebuilds), new_mod_hashes = result
+        if isinstance(compiled_file, Exception):
+            errors.append(compiled_file)
+            return []
+
+        # record the prebuild files as being current, so the cleanup knows not to delete them
+        prebuild_files.extend(prebuilds)
+        compiled[compiled_file.input_fpath] = compiled_file
+
+        # record the hashes of the modules we just created, before any file which uses them is compiled
+        mod_hashes.update(new_mod_hashes)
+
+        ready = schedule.done([compiled_file.input_fpath])
+        if errors:
+            return []
+        return [(af, mp_common_args) for af in ready]
+
+    # start the files on the most costly chains of dependents first, so those chains finish sooner
+    mp_args = [(af, mp_common_args) for af in schedule.take_ready()]
+    run_mp_dataflow(config, items=mp_args, func=compile_and_hash, result_handler=handle_result,
+                    priority=lambda arg: schedule.priority[arg[0].fpath])
+
+    check_for_errors(errors, caller_label="compile_fortran")
+    logger.debug(f"compiled {len(compiled)} files")
+    config.add_current_prebuilds(prebuild_files)
+
+    # anything left is waiting for a file which isn't being compiled
+    schedule.check_done()
+
+    # the files which most limited how soon we could finish, to show where splitting a file would help most
+    critical_path = schedule.critical_path()
+    if critical_path:
+        logger.info(f"critical path is {len(critical_path)} files, {schedule.priority[critical_path[0]]} bytes "
+                    f"of source: {' -> '.join(fpath.name for fpath in critical_path)}")
+
+
+class CompileSchedule:
+    """
+    Tracks which files can be compiled, as their dependencies are compiled.
 
-    # there's a compilation result and a list of prebuild files for each compiled file
-    compilation_results, prebuild_files = zip(*results_this_pass) if results_this_pass else (tuple(), tuple())
-    check_for_errors(compilation_results, caller_label="compile_pass")
-    compiled_this_pass = list(by_type(compilation_results, CompiledFile))
-    logger.debug(f"compiled {len(compiled_this_pass)} files")
+    Each file counts its uncompiled Fortran dependencies, and a compiled file only updates the files which
+    depend on it, so there's no need to rescan every file still waiting to compile.
 
-    # record the prebuild files as being current, so the cleanup knows not to delete them
-    config.add_current_prebuilds(chain(*prebuild_files))
+    Each file's priority is the cost of compiling it and the most costly chain of files which depend on it,
+    so that files which hold up the most work can be compiled first.
 
-    # hash the modules we just created
-    new_mod_hashes = get_mod_hashes(compile_next, config)
-    mod_hashes.update(new_mod_hashes)
+    The length of a schedule is the number of files waiting for their dependencies.
 
-    # add compiled files to all compiled files
-    compiled.update({cf.input_fpath: cf for cf in compiled_this_pass})
+    """
+    def __init__(self, uncompiled: Iterable[AnalysedFortran]):
+        self.analysed_files: Dict[Path, AnalysedFortran] = {af.fpath: af for af in uncompiled}
+        self._waiting: Dict[Path, AnalysedFortran] = dict(self.analysed_files)
+        self._ready: Set[AnalysedFortran] = set()
+        self._n_deps: Dict[Path, int] = {}
+        self._dependents: Dict[Path, List[AnalysedFortran]] = defaultdict(list)
+
+        for af in self._waiting.values():
+            f90_deps = [dep for dep in af.file_deps if dep.suffix == '.f90']
+            for dep in f90_deps:
+                self._dependents[dep].append(af)
+            self._n_deps[af.fpath] = len(f90_deps)
+            if not f90_deps:
+                self._ready.add(af)
+
+        for af in self._ready:
+            del self._waiting[af.fpath]
+
+        self.priority = self._downstream_costs()
+
+    def __len__(self):
+        return len(self._waiting)
+
+    def take_ready(self) -> Set[AnalysedFortran]:
+        """
+        Return the files which have no dependencies left to compile, and haven't been returned before.
+
+        """
+        ready, self._ready = self._ready, set()
+        return ready
+
+    def done(self, compiled_fpaths: Iterable[Path]) -> List[AnalysedFortran]:
+        """
+        Mark files as compiled, returning any files which were only waiting for them.
+
+        """
+        ready = []
+        for fpath in compiled_fpaths:
+            for af in self._dependents.get(fpath, []):
+                self._n_deps[af.fpath] -= 1
+                if not self._n_deps[af.fpath]:
+                    ready.append(self._waiting.pop(af.fpath))
+        return ready
+
+    def critical_path(self) -> List[Path]:
+        """
+        The chain of dependent files with the highest total cost, which bounds how soon compilation can finish.
+
+        """
+        path: List[Path] = []
+        candidates = list(self.analysed_files)
+        while candidates:
+            fpath = max(candidates, key=self.priority.__getitem__)
+            path.append(fpath)
+            candidates = [af.fpath for af in self._dependents.get(fpath, []) if af.fpath not in path]
+        return path
+
+    def _downstream_costs(self) -> Dict[Path, int]:
+        # Work back from the files nothing depends on, without recursion, as the chains can be long.
+        costs: Dict[Path, int] = {}
+        for root in self.analysed_files:
+            stack = [root]
+            visiting = set()
+            while stack:
+                fpath = stack[-1]
+                if fpath in costs:
+                    stack.pop()
+                    continue
+
+                # a dependency cycle can't be compiled anyway, so it just mustn't loop forever here
+                visiting.add(fpath)
+                dependents = [af.fpath for af in self._dependents.get(fpath, [])]
+                todo = [dep for dep in dependents if dep not in costs and dep not in visiting]
+                if todo:
+                    stack.extend(todo)
+                    continue
+
+                stack.pop()
+                visiting.discard(fpath)
+                costs[fpath] = compile_cost(self.analysed_files[fpath]) + \
+                    max((costs.get(dep, 0) for dep in dependents), default=0)
+
+        return costs
+
+    def check_done(self):
+        """
+        Raise an error if any files are still waiting for dependencies.
+
+        """
+        if not self._waiting:
+            return
 
-    # remove compiled files from remaining files
-    uncompiled = set(filter(lambda af: af.fpath not in compiled, uncompiled))
-    return uncompiled
+        msg = 'Nothing more can be compiled due to unfulfilled dependencies:\n'
+        for af in self._waiting.values():
+            msg += f'\n\n{af.fpath}'
+            for dep in af.file_deps:
+                if dep.suffix == '.f90' and (dep in self._waiting or dep not in self.analysed_files):
+                    msg += f'\n    {str(dep)}'
 
+        raise ValueError(msg)
 
-def get_compile_next(compiled: Dict[Path, CompiledFile], uncompiled: Set[AnalysedFortran]) \
-        -> Set[AnalysedFortran]:
 
-    # find what to compile next
-    compile_next = set()
-    not_ready: Dict[Path, List[Path]] = {}
-    for af in uncompiled:
-        # all deps ready?
-        unfulfilled = [dep for dep in af.file_deps if dep not in compiled and dep.suffix == '.f90']
-        if unfulfilled:
-            not_ready[af.fpath] = unfulfilled
-        else:
-            compile_next.add(af)
+def compile_cost(analysed_file: AnalysedFortran) -> int:
+    """
+    An estimate of how long a file takes to compile.
 
-    # unable to compile anything?
-    if len(uncompiled) and not compile_next:
-        msg = 'Nothing more can be compiled due to unfulfilled dependencies:\n'
-        for f, unf in not_ready.items():
-            msg += f'\n\n{f}'
-            for u in unf:
-                msg += f'\n    {str(u)}'
+    We don't record compile times, so this is the source file size.
 
-        raise ValueError(msg)
+    """
+    try:
+        return analysed_file.fpath.stat().st_size
+    except OSError:
+        return 0
 
-    return compile_next
+
+def longest_first(analysed_files: Iterable[AnalysedFortran]) -> List[AnalysedFortran]:
+    """
+    Order files to start the longest compiles first, so a long compile isn't left running alone at the end of a pass.
+
+    """
+    return sorted(analysed_files, key=compile_cost, reverse=True)
 
 
 def store_artefacts(compiled_files: Dict[Path, CompiledFile],
@@ -202,6 +350,7 @@ def store_artefacts(compiled_files: Dict[Path, CompiledFile],
     for root, source_files in build_lists.items():
         new_objects = {lookup[af.fpath].output_fpath for af in source_files}
         artefact_store.update_dict(ArtefactSet.OBJECT_FILES, root, new_objects)
+    artefact_store[ArtefactSet.OBJECT_SOURCES].update({c.output_fpath: c.input_fpath for c in compiled_files.values()})
 
 
 def process_file(arg: Tuple[AnalysedFortran, MpCommonArgs]) \
@@ -343,7 +492,7 @@ def compile_file(analysed_file, flags, output_fpath, mp_common_args):
                           syntax_only=mp_common_args.syntax_only)
 
 
-def get_mod_hashes(analysed_files: Set[AnalysedFortran], config) -> Dict[str, int]:
+def get_mod_hashes(analysed_files: Iterable[AnalysedFortran], config) -> Dict[str, int]:
     """
     Get the hash of every module file defined in the list of analysed files.
 
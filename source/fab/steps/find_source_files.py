@@ -8,19 +8,35 @@ Gather files from a source folder.
 
 """
 import logging
-from typing import Optional, Iterable
+import os
+import re
+from bisect import bisect_right
+from pathlib import Path
+from functools import partial
+from queue import Queue
+from typing import Callable, Dict, Iterator, List, Optional, Iterable, Set, Union
 
 from fab.artefacts import ArtefactSet
-from fab.steps import step
+from fab.steps import _get_thread_pool, step
 from fab.util import file_walk
 
 logger = logging.getLogger(__name__)
 
+# The build files collection for each source file suffix.
+_SUFFIX_SETS = {
+    **dict.fromkeys([".f", ".F", ".f90", ".F90"], ArtefactSet.FORTRAN_BUILD_FILES),
+    ".c": ArtefactSet.C_BUILD_FILES,
+    **dict.fromkeys([".x90", ".X90"], ArtefactSet.X90_BUILD_FILES),
+}
+
 
 class _PathFilter(object):
     # Simple pattern matching using string containment check.
     # Deems an incoming path as included or excluded.
 
+    # These are checked against every file found, so keep them small and quick to access.
+    __slots__ = ('filter_strings', 'include', '_pattern')
+
     def __init__(self, *filter_strings: str, include: bool):
         """
         :param filter_strings:
@@ -32,11 +48,25 @@ class _PathFilter(object):
         self.filter_strings: Iterable[str] = filter_strings
         self.include = include
 
+        # Combine the filter strings into a single regex, so a path is checked
+        # against all of them in one scan rather than a Python loop.
+        self._pattern = None
+        if filter_strings:
+            self._pattern = re.compile('|'.join(re.escape(str(i)) for i in filter_strings))
+
     def check(self, path):
-        if any(str(i) in str(path) for i in self.filter_strings):
+        if self._pattern and self._pattern.search(str(path)):
             return self.include
         return None
 
+    def matches_all_in(self, folder: str) -> bool:
+        # Whether every path in the folder matches. A string in the folder path is in all their paths.
+        return self.check(folder + os.sep) is not None
+
+    def may_match_in(self, folder: str) -> bool:
+        # Whether any path in the folder might match. A string could be in any file name.
+        return self._pattern is not None
+
 
 class Include(_PathFilter):
     """
@@ -44,6 +74,8 @@ class Include(_PathFilter):
     improves config readability.
 
     """
+    __slots__ = ()
+
     def __init__(self, *filter_strings):
         """
         :param filter_strings:
@@ -62,6 +94,7 @@ class Exclude(_PathFilter):
     improves config readability.
 
     """
+    __slots__ = ()
 
     def __init__(self, *filter_strings):
         """
@@ -75,6 +108,88 @@ class Exclude(_PathFilter):
         return f'Exclude({", ".join(self.filter_strings)})'
 
 
+class _PathSetFilter(_PathFilter):
+    # Matches whole files and folders, rather than any part of the path.
+    # A path matches if it is one of the given paths, or is inside one of them.
+    __slots__ = ('_paths', '_sorted_paths', '_folders')
+
+    def __init__(self, *paths: Union[str, Path], include: bool):
+        """
+        :param paths:
+            One or more file or folder paths.
+        :param include:
+            Set to True or False to include or exclude matching paths.
+
+        """
+        super().__init__(include=include)
+        self.filter_strings = tuple(str(p).rstrip(os.sep) for p in paths)
+        self._paths = frozenset(self.filter_strings)
+        self._sorted_paths = tuple(sorted(self._paths))
+
+        # Folders nested in another folder would never be the only match, so drop them. Then any folder
+        # containing a path is the greatest folder which sorts before it, which we can find with a bisect.
+        folders: List[str] = []
+        for folder in sorted(p + os.sep for p in self._paths):
+            if not folders or not folder.startswith(folders[-1]):
+                folders.append(folder)
+        self._folders = tuple(folders)
+
+    def check(self, path):
+        path = str(path)
+        if path in self._paths:
+            return self.include
+        i = bisect_right(self._folders, path)
+        if i and path.startswith(self._folders[i - 1]):
+            return self.include
+        return None
+
+    def may_match_in(self, folder: str) -> bool:
+        # Whether the folder is inside one of our paths, or one of our paths is inside it.
+        folder += os.sep
+        i = bisect_right(self._sorted_paths, folder)
+        return (self.check(folder) is not None or
+                (i < len(self._sorted_paths) and self._sorted_paths[i].startswith(folder)))
+
+
+class FastInclude(_PathSetFilter):
+    """
+    A path filter which includes the given files and folders. Unlike :class:`Include`, which matches
+    any part of a path, this needs whole paths, but checking a path costs the same for any number of them.
+
+    """
+    __slots__ = ()
+
+    def __init__(self, *paths):
+        """
+        :param paths:
+            One or more file or folder paths.
+
+        """
+        super().__init__(*paths, include=True)
+
+    def __str__(self):
+        return f'FastInclude({", ".join(self.filter_strings)})'
+
+
+class FastExclude(_PathSetFilter):
+    """
+    A path filter which excludes the given files and folders, like :class:`FastInclude`.
+
+    """
+    __slots__ = ()
+
+    def __init__(self, *paths):
+        """
+        :param paths:
+            One or more file or folder paths.
+
+        """
+        super().__init__(*paths, include=False)
+
+    def __str__(self):
+        return f'FastExclude({", ".join(self.filter_strings)})'
+
+
 @step
 def find_source_files(config, source_root=None,
                       output_collection=ArtefactSet.INITIAL_SOURCE,
@@ -100,6 +215,9 @@ def find_source_files(config, source_root=None,
     In the above example, swapping the order would stop the file being
     included in the build.
 
+    Folders whose contents are all excluded by the filters are not walked at all,
+    so excluding a large folder up front saves listing it.
+
     A path matches a filter string simply if it *contains* it,
     so the path *my_folder/my_file.F90* would match filters
     "my_folder", "my_file" and "er/my".
@@ -118,28 +236,35 @@ def find_source_files(config, source_root=None,
         Human friendly name for logger output, with sensible default.
 
     """
-    path_filters = path_filters or []
+    path_filters = list(path_filters or [])
 
     # Recursively get all files in the given folder, with filtering.
 
     source_root = source_root or config.source_root
 
-    # file filtering
+    # file filtering, also splitting the files into the main groups as we go
     filtered_fpaths = set()
+    fpaths_by_type: Dict[ArtefactSet, Set[Path]] = {artefact_set: set() for artefact_set in _SUFFIX_SETS.values()}
     # todo: we shouldn't need to ignore the prebuild folder here, it's not
     # underneath the source root.
-    for fpath in file_walk(source_root,
-                           ignore_folders=[config.prebuild_folder]):
+    for fpath in _parallel_file_walk(config, source_root,
+                                     ignore_folders=[config.prebuild_folder],
+                                     prune=partial(_excludes_folder, path_filters)):
 
+        # the filters match on strings, so only convert the path once
+        fpath_str = str(fpath)
         wanted = True
         for path_filter in path_filters:
             # did this filter have anything to say about this file?
-            res = path_filter.check(fpath)
+            res = path_filter.check(fpath_str)
             if res is not None:
                 wanted = res
 
         if wanted:
             filtered_fpaths.add(fpath)
+            artefact_set = _SUFFIX_SETS.get(fpath.suffix)
+            if artefact_set:
+                fpaths_by_type[artefact_set].add(fpath)
         else:
             logger.debug(f"excluding {fpath}")
 
@@ -148,16 +273,66 @@ def find_source_files(config, source_root=None,
 
     config.artefact_store.add(output_collection, filtered_fpaths)
 
-    # Now split the files into the various main groups:
-    # Fortran, C, and PSyclone
-    config.artefact_store.copy_artefacts(output_collection,
-                                         ArtefactSet.FORTRAN_BUILD_FILES,
-                                         suffixes=[".f", ".F", ".f90", ".F90"])
-
-    config.artefact_store.copy_artefacts(output_collection,
-                                         ArtefactSet.C_BUILD_FILES,
-                                         suffixes=[".c"])
-
-    config.artefact_store.copy_artefacts(output_collection,
-                                         ArtefactSet.X90_BUILD_FILES,
-                                         suffixes=[".x90", ".X90"])
+    # The main groups: Fortran, C, and PSyclone
+    for artefact_set, fpaths in fpaths_by_type.items():
+        config.artefact_store.add(artefact_set, fpaths)
+
+
+def _excludes_folder(path_filters: List[_PathFilter], folder: Path) -> bool:
+    # Whether the filters exclude everything in a folder, so we needn't walk it.
+    # This must never be wrong, so anything which could include a path in the folder keeps it.
+    folder_str = str(folder)
+    excluded = False
+    for path_filter in path_filters:
+        if path_filter.matches_all_in(folder_str):
+            excluded = not path_filter.include
+        elif path_filter.include and path_filter.may_match_in(folder_str):
+            excluded = False
+    return excluded
+
+
+def _parallel_file_walk(config, path: Path, ignore_folders: List[Path],
+                        prune: Optional[Callable[[Path], bool]] = None) -> Iterator[Path]:
+    # Walk each top level folder in a separate thread. Listing folders is I/O bound
+    # and releases the GIL, so this overlaps the latency of slow (e.g. network)
+    # file systems. The files are passed back as they're found, so they can be filtered while the walk goes on.
+    if not config.multiprocessing:
+        yield from file_walk(path, ignore_folders, prune)
+        return
+
+    path = Path(path)
+    assert path.is_dir(), f"not dir: '{path}'"
+    folders = []
+    for i in path.iterdir():
+        if not i.is_dir():
+            yield i
+        elif i in ignore_folders or (prune and prune(i)):
+            logger.debug(f'file_walk ignoring {i}')
+        else:
+            folders.append(i)
+
+    pool = _get_thread_pool(config)
+    found: Queue = Queue()
+    for folder in folders:
+        pool.apply_async(_walk_into, (found, folder, ignore_folders, prune))
+
+    n_walking = len(folders)
+    while n_walking:
+        fpath = found.get()
+        if fpath is None:
+            n_walking -= 1
+        elif isinstance(fpath, Exception):
+            raise fpath
+        else:
+            yield fpath
+
+
+def _walk_into(found: Queue, folder: Path, ignore_folders: List[Path], prune: Optional[Callable[[Path], bool]]):
+    # Put each file in the folder onto the queue, or the error if the walk fails, then None when done.
+    try:
+        for fpath in file_walk(folder, ignore_folders, prune):
+            found.put(fpath)
+    except Exception as err:
+        found.put(err)
+    finally:
+        found.put(None)
@@ -8,5 +8,47 @@ Build steps for pulling source code from remote repos and local folders.
 
 """
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+
+from fab.steps import step
 
 logger = logging.getLogger(__name__)
+
+
+@step
+def grab_parallel(config, grabs: List[Callable]):
+    """
+    Run several grabs at the same time, to overlap their network latency.
+
+    Each grab is called with the config, so grabs needing other arguments can be given with
+    :func:`functools.partial`, e.g.::
+
+        grab_parallel(state, [
+            partial(fcm_export, src='fcm:jules.xm_tr/src', dst_label='src'),
+            partial(fcm_export, src='fcm:jules.xm_tr/utils', dst_label='utils'),
+        ])
+
+    The grabs must write to different folders. All grabs are allowed to finish,
+    then the first failure, if any, is raised.
+
+    :param config:
+        The :class:`fab.build_config.BuildConfig` object where we can read settings
+        such as the project workspace folder.
+    :param grabs:
+        The grabs to run, each accepting a single config argument.
+
+    """
+    if not grabs:
+        return
+
+    first_error: Optional[BaseException] = None
+    with ThreadPoolExecutor(max_workers=len(grabs)) as executor:
+        futures = [executor.submit(grab, config) for grab in grabs]
+        for future in as_completed(futures):
+            error = future.exception()
+            if error and not first_error:
+                first_error = error
+
+    if first_error:
+        raise first_error
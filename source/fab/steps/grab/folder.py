@@ -4,22 +4,25 @@
 #  which you should have received as part of this distribution
 # ##############################################################################
 from pathlib import Path
-from typing import Union
+from typing import Sequence, Union
 
 from fab.steps import step
 from fab.tools import Category
 
 
 @step
-def grab_folder(config, src: Union[Path, str], dst_label: str = ''):
+def grab_folder(config, src: Union[Path, str, Sequence[Union[Path, str]]], dst_label: str = ''):
     """
     Copy a source folder to the project workspace.
 
+    Several source folders can be given, to merge their contents into one destination
+    folder with a single rsync.
+
     :param config:
         The :class:`fab.build_config.BuildConfig` object where we can read settings
         such as the project workspace folder or the multiprocessing flag.
     :param src:
-        The source location to grab. The nature of this parameter is depends on the subclass.
+        The source location to grab, or a list of them.
     :param dst_label:
         The name of a sub folder, in the project workspace, in which to put the source.
         If not specified, the code is copied into the root of the source folder.
@@ -0,0 +1,161 @@
+##############################################################################
+# (c) Crown copyright Met Office. All rights reserved.
+# For further details please refer to the file COPYRIGHT
+# which you should have received as part of this distribution
+##############################################################################
+"""
+Write a Ninja build file for compiling and linking the analysed Fortran.
+
+"""
+import logging
+import os
+import shlex
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from fab.artefacts import ArtefactSet, ArtefactsGetter
+from fab.build_config import BuildConfig
+from fab.parse.fortran import AnalysedFortran
+from fab.steps import step
+from fab.steps.compile_fortran import DEFAULT_SOURCE_GETTER, handle_compiler_args
+from fab.tools import Category, Linker
+
+logger = logging.getLogger(__name__)
+
+
+@step
+def emit_ninja(config: BuildConfig, common_flags: Optional[List[str]] = None,
+               path_flags: Optional[List] = None, link_flags: Optional[List[str]] = None,
+               source: Optional[ArtefactsGetter] = None,
+               output_fpath: Optional[Path] = None):
+    """
+    Write a `build.ninja` file which compiles and links every build target,
+    instead of compiling in-process with :func:`~fab.steps.compile_fortran.compile_fortran`
+    and :func:`~fab.steps.link.link_exe`.
+
+    This is expected to run after the analysis step. Ninja then schedules the
+    compilation itself, and only recompiles what has changed, e.g.::
+
+        ninja -C <build_output>
+
+    Module dependencies come from our analysis, so no compiler depfiles are
+    needed. The compile rule uses `restat`, so dependents are not recompiled
+    when a module file is unchanged. Only Fortran is supported, so build trees
+    containing any other source, such as C, are rejected.
+
+    :param config:
+        The :class:`fab.build_config.BuildConfig` object where we can read settings
+        such as the project workspace folder.
+    :param common_flags:
+        A list of strings to be included in the compile command, for all files.
+    :param path_flags:
+        A list of :class:`~fab.build_config.AddFlags`, defining flags to be included in the
+        compile command for selected files.
+    :param link_flags:
+        A list of flags to pass to the linker.
+    :param source:
+        An :class:`~fab.artefacts.ArtefactsGetter` which gives us our Fortran files to process.
+        Defaults to the same source as :func:`~fab.steps.compile_fortran.compile_fortran`.
+    :param output_fpath:
+        Where to write the Ninja file. Defaults to `build.ninja` in the build output folder.
+
+    """
+    compiler, flags_config = handle_compiler_args(config, common_flags, path_flags)
+    linker = config.tool_box[Category.LINKER]
+    if not isinstance(linker, Linker):
+        raise RuntimeError(f"Unexpected tool '{linker.name}' of type "
+                           f"'{type(linker)}' instead of Linker")
+
+    source_getter = source or DEFAULT_SOURCE_GETTER
+    build_lists: Dict[str, List[AnalysedFortran]] = source_getter(config.artefact_store)
+    output_fpath = Path(output_fpath or config.build_output / 'build.ninja')
+
+    # everything in a build tree must be linked, so we can't leave anything out
+    for root, tree in config.artefact_store[ArtefactSet.BUILD_TREES].items():
+        unsupported = set(tree) - {af.fpath for af in build_lists.get(root, [])}
+        if unsupported:
+            raise RuntimeError(f"cannot emit ninja for build tree '{root}', which has files other than the "
+                               f"Fortran source: {', '.join(sorted(map(str, unsupported)))}")
+
+    # which module files are made by which source file
+    all_files = set(sum(build_lists.values(), []))
+    mod_fpaths: Dict[str, Path] = {}
+    mod_sources: Dict[str, Path] = {}
+    for af in sorted(all_files, key=lambda af: af.fpath):
+        for mod_def in af.module_defs:
+            if mod_def in mod_sources:
+                raise RuntimeError(f"module '{mod_def}' is defined in both "
+                                   f"'{mod_sources[mod_def]}' and '{af.fpath}'")
+            mod_sources[mod_def] = af.fpath
+            mod_fpaths[mod_def] = config.build_output / f'{mod_def}.mod'
+
+    module_args = []
+    if compiler.module_folder_flag:
+        module_args = [compiler.module_folder_flag, str(config.build_output)]
+
+    launcher = [compiler.launcher.exec_name] if compiler.launcher else []
+
+    lines = [
+        '# Generated by fab, do not edit.',
+        'ninja_required_version = 1.3',
+        '',
+        'rule fc',
+        f'  command = {_command([*launcher, compiler.exec_name, *compiler.flags])} $flags '
+        f'{_command([*module_args, compiler.compile_flag])} '
+        f'$in {_command([compiler.output_flag])} $out',
+        '  description = FC $out',
+        '  restat = 1',
+        '',
+        'rule link',
+        f'  command = {_command([linker.exec_name, *linker.flags])} $in $flags '
+        f'{_command([linker.output_flag])} $out',
+        '  description = LINK $out',
+        '',
+    ]
+
+    for af in sorted(all_files, key=lambda af: af.fpath):
+        outputs = [_escape(af.fpath.with_suffix('.o'))]
+        mod_outputs = [_escape(mod_fpaths[mod_def]) for mod_def in sorted(af.module_defs)]
+        # modules not made by any of our files are assumed to be external
+        mod_inputs = [_escape(mod_fpaths[mod_dep]) for mod_dep in sorted(af.module_deps)
+                      if mod_dep in mod_fpaths and mod_dep not in af.module_defs]
+        flags = flags_config.flags_for_path(path=af.fpath, config=config)
+        lines.append(f'build {" ".join(outputs + _implicit(mod_outputs))}: '
+                     f'fc {" ".join([_escape(af.fpath)] + _implicit(mod_inputs))}')
+        lines.append(f'  flags = {_command(flags)}')
+
+    targets = []
+    for root, source_files in sorted(build_lists.items()):
+        exe_path = _escape(config.project_workspace / root)
+        objects = sorted(_escape(af.fpath.with_suffix('.o')) for af in source_files)
+        lines.append(f'build {exe_path}: link {" ".join(objects)}')
+        lines.append(f'  flags = {_command(link_flags or [])}')
+        targets.append(exe_path)
+
+    if targets:
+        lines.append(f'default {" ".join(targets)}')
+
+    output_fpath.parent.mkdir(parents=True, exist_ok=True)
+    output_fpath.write_text('\n'.join(lines) + '\n')
+    logger.info(f"wrote ninja file for {len(all_files)} files and {len(targets)} targets: "
+                f"run 'ninja -C {output_fpath.parent}' to build")
+
+
+def _command(args: Iterable[str]) -> str:
+    # shell quote and escape the arguments for a ninja command line
+    return _variable(' '.join(shlex.quote(str(arg)) for arg in args if arg))
+
+
+def _variable(value: str) -> str:
+    # ninja's only special character in a variable value is $
+    return value.replace('$', '$$')
+
+
+def _escape(path: os.PathLike) -> str:
+    # paths in build statements must also escape spaces and colons
+    return str(path).replace('$', '$$').replace(' ', '$ ').replace(':', '$:')
+
+
+def _implicit(paths: List[str]) -> List[str]:
+    # implicit inputs and outputs follow a '|'
+    return ['|', *paths] if paths else []
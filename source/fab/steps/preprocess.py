@@ -8,19 +8,19 @@ Fortran and C Preprocessing.
 
 """
 import logging
-import shutil
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Collection, List, Optional, Tuple, Union
+from typing import Collection, List, Optional, Set, Tuple, Union
 
 from fab.artefacts import (ArtefactSet, ArtefactsGetter, SuffixFilter,
                            CollectionGetter)
 from fab.build_config import BuildConfig, FlagsConfig
 from fab.metrics import send_metric
 from fab.steps import check_for_errors, run_mp, step
-from fab.tools import Category, Cpp, CppFortran, Preprocessor
+from fab.tools import Category, Cpp, CppFortran, PcppFortran, Preprocessor
 from fab.util import (log_or_dot_finish, input_to_output_fpath, log_or_dot,
-                      suffix_filter, Timer, by_type)
+                      suffix_filter, Timer, file_checksum,
+                      string_checksum, fast_copy)
 
 logger = logging.getLogger(__name__)
 
@@ -70,6 +70,9 @@ def pre_processor(config: BuildConfig, preprocessor: Preprocessor,
     flags = FlagsConfig(common_flags=common_flags, path_flags=path_flags)
 
     logger.info(f"preprocessor is '{preprocessor.name}'.")
+    if preprocessor.supports_dependency_file:
+        # the version is part of the prebuild hash, get it once before we send the preprocessor to the workers
+        logger.info(f"preprocessor version is '{preprocessor.get_version()}'")
 
     logger.info(f'preprocessing {len(files)} files')
 
@@ -85,20 +88,42 @@ def pre_processor(config: BuildConfig, preprocessor: Preprocessor,
     # bundle files with common args
     mp_args = [(file, mp_common_args) for file in files]
 
-    results = run_mp(config, items=mp_args, func=process_artefact)
-    check_for_errors(results, caller_label=name)
+    # Each file is a separate preprocessor process, so the workers mostly wait. Threads save us starting
+    # and feeding a pool of Python processes. pcpp preprocesses in-process, so it still needs processes.
+    use_threads = not isinstance(preprocessor, PcppFortran)
+    results = run_mp(config, items=mp_args, func=process_artefact, use_threads=use_threads)
+
+    # there's an output file, or an error, and a list of prebuild files for each input file
+    output_fpaths: Set[Path] = set()
+    prebuild_files: List[Path] = []
+    errors: List[Exception] = []
+    for output_fpath, prebuilds in results:
+        if isinstance(output_fpath, Exception):
+            errors.append(output_fpath)
+        else:
+            output_fpaths.add(output_fpath)
+            prebuild_files.extend(prebuilds)
+    check_for_errors(errors, caller_label=name)
 
     log_or_dot_finish(logger)
-    config.artefact_store.add(output_collection, set(by_type(results, Path)))
+    config.add_current_prebuilds(prebuild_files)
+    config.artefact_store.add(output_collection, output_fpaths)
 
 
-def process_artefact(arg: Tuple[Path, MpCommonArgs]):
+def process_artefact(arg: Tuple[Path, MpCommonArgs]) -> Tuple[Union[Path, Exception], List[Path]]:
     """
     Expects an input file in the source folder.
     Writes the output file to the output folder, with a lower case extension.
 
+    If the preprocessor can list the files included by the input, the output is also stored in
+    the prebuild folder, and reused from there if the input, flags and included files are unchanged.
+
+    Returns the output file and any prebuild files used.
+    Errors are returned rather than raised, so that they can all be reported together.
+
     """
     input_fpath, args = arg
+    prebuild_files: List[Path] = []
 
     with Timer() as timer:
         output_fpath = (input_to_output_fpath(config=args.config,
@@ -117,13 +142,97 @@ def process_artefact(arg: Tuple[Path, MpCommonArgs]):
             log_or_dot(logger, f"PreProcessor running with parameters: "
                                f"'{' '.join(params)}'.'")
             try:
-                args.preprocessor.preprocess(input_fpath, output_fpath, params)
+                if args.preprocessor.supports_dependency_file:
+                    prebuild_files = _preprocess_with_prebuild(input_fpath, output_fpath, params, args)
+                else:
+                    args.preprocessor.preprocess(input_fpath, output_fpath, params)
             except Exception as err:
-                raise Exception(f"error preprocessing {input_fpath}:\n"
-                                f"{err}") from err
+                return Exception(f"error preprocessing {input_fpath}:\n{err}"), []
 
     send_metric(args.name, str(input_fpath), {'time_taken': timer.taken, 'start': timer.start})
-    return output_fpath
+    return output_fpath, prebuild_files
+
+
+def _preprocess_with_prebuild(input_fpath: Path, output_fpath: Path, params: List[Union[Path, str]],
+                              args: MpCommonArgs) -> List[Path]:
+    # Reuse a prebuilt output if nothing which affects it has changed, otherwise preprocess and store the
+    # output as a prebuild. We can only know the included files by preprocessing, so the dependency file
+    # from the last run with the same input and flags tells us which files to check.
+    prebuild_folder = args.config.prebuild_folder
+    stem = input_fpath.stem
+
+    # A hash of everything except the included files. This includes the path because relative
+    # includes are found next to the input file, and the preprocessor version.
+    deps_hash = (file_checksum(input_fpath).file_hash +
+                 string_checksum(str(input_fpath)) +
+                 args.preprocessor.get_hash() +
+                 string_checksum(str(args.preprocessor.flags + params)))
+    deps_fpath = prebuild_folder / f'{stem}.{deps_hash:x}.d'
+
+    if deps_fpath.exists():
+        combo_hash = _get_combo_hash(deps_hash, deps_fpath)
+        if combo_hash is not None:
+            prebuild_fpath = prebuild_folder / f'{stem}.{combo_hash:x}{output_fpath.suffix}'
+            if prebuild_fpath.exists():
+                log_or_dot(logger, f'Preprocessor using prebuild: {input_fpath}')
+                fast_copy(prebuild_fpath, output_fpath)
+                return [deps_fpath, prebuild_fpath]
+
+    prebuild_folder.mkdir(parents=True, exist_ok=True)
+    args.preprocessor.preprocess(input_fpath, output_fpath, params, dependency_file=deps_fpath)
+
+    combo_hash = _get_combo_hash(deps_hash, deps_fpath)
+    if combo_hash is None:
+        # the output is fine, we just can't tell when to reuse it
+        logger.info(f"not storing a prebuild for {input_fpath}: an included file listed in '{deps_fpath}' "
+                    f"wasn't found")
+        return []
+    prebuild_fpath = prebuild_folder / f'{stem}.{combo_hash:x}{output_fpath.suffix}'
+    fast_copy(output_fpath, prebuild_fpath)
+    return [deps_fpath, prebuild_fpath]
+
+
+def _get_combo_hash(deps_hash: int, deps_fpath: Path) -> Optional[int]:
+    # Add the checksums of all the files listed in a make-style dependency file,
+    # or return None if any of them no longer exist.
+    combo_hash = deps_hash
+    for fpath in _read_prerequisites(deps_fpath.read_text()):
+        try:
+            combo_hash += file_checksum(fpath).file_hash
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+    return combo_hash
+
+
+def _read_prerequisites(text: str) -> List[str]:
+    # The prerequisites of the rules in a make-style dependency file, as written by the preprocessor's -MD.
+    # Paths are make-escaped: "\ " is a space, "\#" a hash and "$$" a dollar. A target ends at a colon
+    # followed by whitespace, so a colon inside a path, e.g. a Windows drive, doesn't end it.
+    prerequisites = []
+    for rule in text.replace('\\\n', ' ').splitlines():
+        in_prerequisites = False
+        word: List[str] = []
+        i = 0
+        while i <= len(rule):
+            char = rule[i] if i < len(rule) else ' '
+            following = rule[i + 1] if i + 1 < len(rule) else ' '
+            if char == '\\' and following in ' #':
+                word.append(following)
+                i += 1
+            elif char == '$' and following == '$':
+                word.append('$')
+                i += 1
+            elif char == ':' and following.isspace() and not in_prerequisites:
+                in_prerequisites = True
+                word = []
+            elif char.isspace():
+                if word and in_prerequisites:
+                    prerequisites.append(''.join(word))
+                word = []
+            else:
+                word.append(char)
+            i += 1
+    return prerequisites
 
 
 # todo: rename preprocess_fortran
@@ -151,9 +260,9 @@ def preprocess_fortran(config: BuildConfig, source: Optional[ArtefactsGetter] =
     f90s = suffix_filter(source_files, '.f90')
 
     fpp = config.tool_box[Category.FORTRAN_PREPROCESSOR]
-    if not isinstance(fpp, CppFortran):
+    if not isinstance(fpp, (CppFortran, PcppFortran)):
         raise RuntimeError(f"Unexpected tool '{fpp.name}' of type "
-                           f"'{type(fpp)}' instead of CppFortran")
+                           f"'{type(fpp)}' instead of CppFortran or PcppFortran")
 
     # make sure any flags from FPP are included in any common flags specified by the config
     try:
@@ -188,7 +297,7 @@ def preprocess_fortran(config: BuildConfig, source: Optional[ArtefactsGetter] =
             if not output_path.parent.exists():
                 output_path.parent.mkdir(parents=True)
             log_or_dot(logger, f'copying {f90}')
-            shutil.copyfile(str(f90), str(output_path))
+            fast_copy(f90, output_path)
             # Only remove and add a file when it is actually copied.
             remove_files.append(f90)
             new_files.append(output_path)
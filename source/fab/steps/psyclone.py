@@ -74,6 +74,7 @@ class MpCommonArgs:
     all_kernel_hashes: Dict[str, int]
     overrides_folder: Optional[Path]
     override_files: List[str]  # filenames (not paths) of hand crafted overrides
+    tool_hash: int = 0  # the psyclone version, which decides the built-in kernels
 
 
 # any already preprocessed x90 we pulled in
@@ -171,6 +172,9 @@ def _generate_mp_payload(config, analysed_x90, all_kernel_hashes, overrides_fold
     if overrides_folder:
         override_files = [f.name for f in file_walk(overrides_folder)]
 
+    psyclone_tool = config.tool_box[Category.PSYCLONE]
+    tool_hash = psyclone_tool.get_hash() if isinstance(psyclone_tool, Psyclone) else 0
+
     return MpCommonArgs(
         config=config,
         kernel_roots=kernel_roots,
@@ -181,6 +185,7 @@ def _generate_mp_payload(config, analysed_x90, all_kernel_hashes, overrides_fold
         api=api,
         overrides_folder=overrides_folder,
         override_files=override_files,
+        tool_hash=tool_hash,
     )
 
 
@@ -356,6 +361,7 @@ def _gen_prebuild_hash(x90_file: Path, mp_payload: MpCommonArgs):
      - kernel metadata used by the x90
      - transformation script
      - cli args
+     - psyclone version
 
     """
     # We've analysed (a parsable version of) this x90.
@@ -375,9 +381,11 @@ def _gen_prebuild_hash(x90_file: Path, mp_payload: MpCommonArgs):
         warnings.warn('no transformation script specified')
 
     # hash everything which should trigger re-processing
-    # todo: hash the psyclone version in case the built-in kernels change?
     prebuild_hash = sum([
 
+        # the psyclone version, in case the built-in kernels change
+        mp_payload.tool_hash,
+
         # the hash of the x90 (not of the parsable version, so includes invoke names)
         analysis_result.file_hash,
 
@@ -462,7 +470,8 @@ def make_parsable_x90(x90_path: Path) -> Path:
     # Before we remove the name keywords to invoke, we must remove any comment lines.
     # This is the simplest way to avoid producing bad fortran when the name keyword is followed by a comment line.
     # I.e. The comment line doesn't have an "&", so we get "call invoke(!" with no "&", which is a syntax error.
-    src_lines = open(x90_path, 'rt').readlines()
+    with open(x90_path, 'rt') as infile:
+        src_lines = infile.readlines()
     no_comment_lines = [line for line in src_lines if not line.lstrip().startswith('!')]
     src = ''.join(no_comment_lines)
 
@@ -478,7 +487,7 @@ def make_parsable_x90(x90_path: Path) -> Path:
     out = _x90_compliance_pattern.sub(repl=repl, string=src)
 
     out_path = x90_path.with_suffix('.parsable_x90')
-    open(out_path, 'wt').write(out)
+    out_path.write_text(out)
 
     logger.debug(f'names removed from {str(x90_path)}: {replaced}')
 
@@ -12,14 +12,13 @@ from dev practices, at which point this step should be deprecated.
 
 """
 import logging
-import shutil
 import warnings
 from pathlib import Path
 
 from fab.artefacts import ArtefactSet
 from fab.build_config import BuildConfig
 from fab.steps import step
-from fab.util import suffix_filter
+from fab.util import fast_copy, suffix_filter
 
 logger = logging.getLogger(__name__)
 
@@ -67,5 +66,6 @@ def root_inc_files(config: BuildConfig):
             raise FileExistsError(f"name clash for inc file: {fpath}")
 
         logger.debug(f"copying inc file {fpath}")
-        shutil.copy(fpath, build_output)
+        # nothing writes to these copies, so they can share the source file
+        fast_copy(fpath, build_output / fpath.name, link=True)
         inc_copied.add(fpath.name)
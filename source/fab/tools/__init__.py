@@ -9,13 +9,15 @@
 
 from fab.tools.ar import Ar
 from fab.tools.category import Category
+from fab.tools.ccache import Ccache
 from fab.tools.compiler import (CCompiler, Compiler, FortranCompiler, Gcc,
                                 Gfortran, Icc, Ifort)
 from fab.tools.flags import Flags
 from fab.tools.linker import Linker
 from fab.tools.psyclone import Psyclone
 from fab.tools.rsync import Rsync
-from fab.tools.preprocessor import Cpp, CppFortran, Fpp, Preprocessor
+from fab.tools.preprocessor import (Cpp, CppFortran, Fpp, PcppFortran,
+                                    Preprocessor)
 from fab.tools.tool import Tool, CompilerSuiteTool
 # Order here is important to avoid a circular import
 from fab.tools.tool_repository import ToolRepository
@@ -24,6 +26,7 @@ from fab.tools.versioning import Fcm, Git, Subversion, Versioning
 
 __all__ = ["Ar",
            "Category",
+           "Ccache",
            "CCompiler",
            "Compiler",
            "CompilerSuiteTool",
@@ -39,6 +42,7 @@ __all__ = ["Ar",
            "Icc",
            "Ifort",
            "Linker",
+           "PcppFortran",
            "Preprocessor",
            "Psyclone",
            "Rsync",
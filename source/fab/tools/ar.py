@@ -21,15 +21,27 @@ class Ar(Tool):
     def __init__(self):
         super().__init__("ar", "ar", Category.AR)
 
-    def create(self, output_fpath: Path,
-               members: List[Union[Path, str]]):
+    def create(self, output_fpath: Union[Path, str],
+               members: List[Union[Path, str]],
+               thin: bool = False):
         '''Create the archive with the specified name, containing the
         listed members.
 
         :param output_fpath: the output path.
         :param members: the list of objects to be added to the archive.
+        :param thin: create a thin archive, which only references the
+            members instead of copying them into the archive. The members
+            must not be moved or deleted while the archive is in use.
         '''
+        flags = "crT" if thin else "cr"
+        # Always start from scratch: ar refuses to convert between thin
+        # and normal archives, and would keep any stale members.
+        try:
+            Path(output_fpath).unlink()
+        except FileNotFoundError:
+            pass
+
         # Explicit type is required to avoid mypy errors :(
-        parameters: List[Union[Path, str]] = ["cr", output_fpath]
+        parameters: List[Union[Path, str]] = [flags, output_fpath]
         parameters.extend(map(str, members))
         return self.run(additional_parameters=parameters)
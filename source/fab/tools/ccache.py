@@ -0,0 +1,22 @@
+##############################################################################
+# (c) Crown copyright Met Office. All rights reserved.
+# For further details please refer to the file COPYRIGHT
+# which you should have received as part of this distribution
+##############################################################################
+
+"""This file contains the Ccache class, a compiler cache which can be used
+as a launcher for a compiler.
+"""
+
+from fab.tools.category import Category
+from fab.tools.tool import Tool
+
+
+class Ccache(Tool):
+    '''This is the class for `ccache`. It is not used on its own, but
+    as a launcher for a compiler, see
+    :meth:`~fab.tools.compiler.Compiler.set_launcher`.
+    '''
+
+    def __init__(self):
+        super().__init__("ccache", "ccache", Category.MISC)
@@ -10,12 +10,12 @@ classes for gcc, gfortran, icc, ifort
 
 import os
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 import zlib
 
 from fab.tools.category import Category
 from fab.tools.flags import Flags
-from fab.tools.tool import CompilerSuiteTool
+from fab.tools.tool import CompilerSuiteTool, Tool
 
 
 class Compiler(CompilerSuiteTool):
@@ -49,8 +49,41 @@ class Compiler(CompilerSuiteTool):
         self._compile_flag = compile_flag if compile_flag else "-c"
         self._output_flag = output_flag if output_flag else "-o"
         self._omp_flag = omp_flag
+        self._launcher: Optional[Tool] = None
+        self._launcher_env: Dict[str, str] = {}
         self.flags.extend(os.getenv("FFLAGS", "").split())
 
+    @property
+    def launcher(self) -> Optional[Tool]:
+        ''':returns: the tool used to launch the compiler, if any.'''
+        return self._launcher
+
+    def set_launcher(self, launcher: Optional[Tool],
+                     env: Optional[Dict[str, str]] = None):
+        '''Sets a tool which is used to launch the compiler when compiling
+        a file, e.g. a compiler cache like ccache. The launcher is called
+        with the compiler and all its parameters as parameters. Note that
+        ccache only caches C and C++, it just runs a Fortran compiler.
+
+        :param launcher: the launcher to use, or None to run the compiler
+            directly.
+        :param env: environment variables for the launcher, e.g. ccache
+            settings. They are only set for the compile commands, and take
+            precedence over the current session's environment.
+        '''
+        self._launcher = launcher
+        self._launcher_env = dict(env or {})
+
+    @property
+    def compile_flag(self) -> str:
+        ''':returns: the flag to request compilation only.'''
+        return self._compile_flag
+
+    @property
+    def output_flag(self) -> str:
+        ''':returns: the flag to specify the output file.'''
+        return self._output_flag
+
     def get_hash(self) -> int:
         ''':returns: a hash based on the compiler name and version.
         '''
@@ -78,6 +111,12 @@ class Compiler(CompilerSuiteTool):
         params.extend([input_file.name,
                       self._output_flag, str(output_file)])
 
+        if self._launcher:
+            env = ({**os.environ, **self._launcher_env}
+                   if self._launcher_env else None)
+            return self._launcher.run(
+                cwd=input_file.parent, env=env,
+                additional_parameters=[self.exec_name, *self.flags, *params])
         return self.run(cwd=input_file.parent,
                         additional_parameters=params)
 
@@ -209,6 +248,11 @@ class FortranCompiler(Compiler):
         self._module_output_path = ""
         self._syntax_only_flag = syntax_only_flag
 
+    @property
+    def module_folder_flag(self) -> str:
+        ''':returns: the flag to specify the module output folder.'''
+        return self._module_folder_flag
+
     @property
     def has_syntax_only(self) -> bool:
         ''':returns: whether this compiler supports a syntax-only feature.'''
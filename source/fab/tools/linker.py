@@ -51,6 +51,11 @@ class Linker(CompilerSuiteTool):
         self._compiler = compiler
         self.flags.extend(os.getenv("LDFLAGS", "").split())
 
+    @property
+    def output_flag(self) -> str:
+        ''':returns: the flag to specify the output file.'''
+        return self._output_flag
+
     def check_available(self) -> bool:
         '''
         :returns: whether the linker is available or not. We do this
@@ -64,7 +69,8 @@ class Linker(CompilerSuiteTool):
     def link(self, input_files: List[Path], output_file: Path,
              add_libs: Optional[List[str]] = None) -> str:
         '''Executes the linker with the specified input files,
-        creating `output_file`.
+        creating `output_file`. If there is more than one object archive,
+        they are linked as a group, since they may depend on each other.
 
         :param input_files: list of input files to link.
         :param output_file: output file.
@@ -78,7 +84,12 @@ class Linker(CompilerSuiteTool):
         else:
             params = []
         # TODO: why are the .o files sorted? That shouldn't matter
-        params.extend(sorted(map(str, input_files)))
+        inputs = sorted(map(str, input_files))
+        if self._compiler and sum(i.endswith(".a") for i in inputs) > 1:
+            # Archives are only searched once, in order, so let the linker
+            # resolve references between them in any order.
+            inputs = ["-Wl,--start-group", *inputs, "-Wl,--end-group"]
+        params.extend(inputs)
         if add_libs:
             params += add_libs
         params.extend([self._output_flag, str(output_file)])
@@ -4,14 +4,21 @@
 # which you should have received as part of this distribution
 ##############################################################################
 
-"""This file contains the base class for any preprocessor, and two derived
-classes for cpp and fpp.
+"""This file contains the base class for any preprocessor, and derived
+classes for cpp, fpp and the pure Python pcpp.
 
 """
 
+import io
+import zlib
 from pathlib import Path
 from typing import List, Optional, Union
 
+try:
+    import pcpp  # type: ignore
+except ImportError:
+    pcpp = None
+
 from fab.tools.category import Category
 from fab.tools.tool import Tool
 
@@ -26,23 +33,72 @@ class Preprocessor(Tool):
 
     def __init__(self, name: str, exec_name: Union[str, Path],
                  category: Category,
-                 availablility_option: Optional[str] = None):
+                 availablility_option: Optional[str] = None,
+                 dependency_flags: Optional[List[str]] = None):
         super().__init__(name, exec_name, category)
-        self._version = None
+        self._version: Optional[str] = None
+        self._dependency_flags = dependency_flags
+
+    @property
+    def supports_dependency_file(self) -> bool:
+        ''':returns: whether this preprocessor can write a make-style
+            dependency file, listing the files included by its input.'''
+        return self._dependency_flags is not None
+
+    def get_version(self) -> str:
+        '''Try to get the version of the preprocessor. This is the first
+        line of its --version output, which is enough to notice when the
+        preprocessor changes.
+
+        :returns: the version string, or an empty string if the version
+            could not be determined.
+
+        :raises RuntimeError: if the preprocessor was not found.
+        '''
+        if self._version is None:
+            try:
+                res = self.run("--version", capture_output=True)
+            except FileNotFoundError as err:
+                raise RuntimeError(f"Preprocessor not found: "
+                                   f"{self.name}") from err
+            except RuntimeError as err:
+                self.logger.warning(f"Error asking for version of "
+                                    f"preprocessor '{self.name}': {err}")
+                return ''
+            lines = res.strip().splitlines()
+            self._version = lines[0].strip() if lines else ''
+        return self._version
+
+    def get_hash(self) -> int:
+        ''':returns: a hash based on the preprocessor name and version.
+        '''
+        return (zlib.crc32(self.name.encode()) +
+                zlib.crc32(self.get_version().encode()))
 
     def preprocess(self, input_file: Path, output_file: Path,
-                   add_flags: Union[None, List[Union[Path, str]]] = None):
+                   add_flags: Union[None, List[Union[Path, str]]] = None,
+                   dependency_file: Optional[Path] = None):
         '''Calls the preprocessor to process the specified input file,
         creating the requested output file.
 
         :param input_file: input file.
         :param output_file: the output filename.
         :param add_flags: List with additional flags to be used.
+        :param dependency_file: if given, also write a make-style
+            dependency file to this path.
+
+        :raises RuntimeError: if a dependency file is requested, but not
+            supported by this preprocessor.
         '''
         params: List[Union[str, Path]] = []
         if add_flags:
             # Make a copy to avoid modifying the caller's list
             params = add_flags[:]
+        if dependency_file:
+            if self._dependency_flags is None:
+                raise RuntimeError(f"Preprocessor '{self.name}' does not "
+                                   f"support dependency files.")
+            params.extend(self._dependency_flags + [dependency_file])
         # Input and output files come as the last two parameters
         params.extend([input_file, output_file])
 
@@ -54,7 +110,8 @@ class Cpp(Preprocessor):
     '''Class for cpp.
     '''
     def __init__(self):
-        super().__init__("cpp", "cpp", Category.C_PREPROCESSOR)
+        super().__init__("cpp", "cpp", Category.C_PREPROCESSOR,
+                         dependency_flags=["-MD", "-MF"])
 
 
 # ============================================================================
@@ -62,7 +119,8 @@ class CppFortran(Preprocessor):
     '''Class for cpp when used as a Fortran preprocessor
     '''
     def __init__(self):
-        super().__init__("cpp", "cpp", Category.FORTRAN_PREPROCESSOR)
+        super().__init__("cpp", "cpp", Category.FORTRAN_PREPROCESSOR,
+                         dependency_flags=["-MD", "-MF"])
         self.flags.extend(["-traditional-cpp", "-P"])
 
 
@@ -75,3 +133,99 @@ class Fpp(Preprocessor):
         # from stdin), so use -what to see if it is available
         super().__init__("fpp", "fpp", Category.FORTRAN_PREPROCESSOR,
                          availablility_option="-what")
+
+
+# ============================================================================
+class PcppFortran(Preprocessor):
+    '''Class for the pure Python preprocessor pcpp, used as a Fortran
+    preprocessor. The files are preprocessed in the current process, which
+    avoids starting a separate cpp process for each file. Only the -D, -U,
+    -I and -P flags are supported, and C++ style comments are kept, since
+    `//` is the Fortran string concatenation operator. Like `cpp -P`, the
+    -P flag removes all blank lines from the output.
+    '''
+    # Flags accepted for compatibility with cpp, which pcpp doesn't need.
+    IGNORED_FLAGS = ("-traditional-cpp",)
+
+    def __init__(self):
+        super().__init__("pcpp", "pcpp", Category.FORTRAN_PREPROCESSOR)
+
+    def check_available(self) -> bool:
+        ''':returns: whether the pcpp module can be imported.'''
+        return pcpp is not None
+
+    def get_version(self) -> str:
+        ''':returns: the version of the pcpp module.'''
+        return getattr(pcpp, "__version__", "")
+
+    def preprocess(self, input_file: Path, output_file: Path,
+                   add_flags: Union[None, List[Union[Path, str]]] = None,
+                   dependency_file: Optional[Path] = None):
+        '''Preprocesses the specified input file in-process,
+        creating the requested output file.
+
+        :param input_file: input file.
+        :param output_file: the output filename.
+        :param add_flags: List with additional flags to be used.
+        :param dependency_file: not supported by pcpp.
+
+        :raises RuntimeError: if pcpp is not available.
+        :raises RuntimeError: if a dependency file is requested.
+        :raises RuntimeError: if pcpp reports any errors.
+        '''
+        if dependency_file:
+            raise RuntimeError(f"Preprocessor '{self.name}' does not "
+                               f"support dependency files.")
+        if not self.is_available:
+            raise RuntimeError(f"Tool '{self.name}' is not available to run "
+                               f"'{input_file}'.")
+
+        # A new preprocessor for each file, so that macros defined in one
+        # file don't leak into the next.
+        processor = pcpp.Preprocessor()
+        processor.line_directive = None
+        processor.on_comment = lambda tok: True
+        flags = [str(flag) for flag in self.flags + (add_flags or [])]
+        remove_blank_lines = "-P" in flags
+        self._apply_flags(processor, [flag for flag in flags if flag != "-P"])
+
+        with open(input_file, encoding="utf-8") as inp:
+            processor.parse(inp.read(), source=str(input_file))
+        output = io.StringIO()
+        processor.write(output)
+        text = output.getvalue()
+        if remove_blank_lines:
+            text = "".join(line for line in text.splitlines(keepends=True)
+                           if line.strip())
+        with open(output_file, "w", encoding="utf-8") as out:
+            out.write(text)
+
+        if processor.return_code:
+            raise RuntimeError(f"pcpp reported {processor.return_code} "
+                               f"error(s) in '{input_file}'")
+
+    def _apply_flags(self, processor, flags: List[str]):
+        '''Applies cpp-style command line flags to a pcpp preprocessor.
+
+        :param processor: the pcpp preprocessor.
+        :param flags: the flags to apply.
+
+        :raises ValueError: if an unsupported flag is found.
+        '''
+        flag_iter = iter(flags)
+        for flag in flag_iter:
+            if flag in self.IGNORED_FLAGS:
+                continue
+            option, value = flag[:2], flag[2:]
+            if option not in ("-D", "-U", "-I"):
+                raise ValueError(f"Unsupported pcpp flag '{flag}'")
+            if not value:
+                # Value given as a separate argument, e.g. '-I dir'
+                value = next(flag_iter, "")
+            if option == "-D":
+                name, _, definition = value.partition("=")
+                processor.define(f"{name} {definition or 1}")
+            elif option == "-U":
+                processor.undef(value)
+            else:
+                processor.add_path(value)
@@ -7,6 +7,7 @@
 """This file contains the tool class for PSyclone.
 """
 
+import zlib
 from pathlib import Path
 from typing import Callable, List, Optional, TYPE_CHECKING, Union
 
@@ -27,6 +28,27 @@ class Psyclone(Tool):
     def __init__(self, api: Optional[str] = None):
         super().__init__("psyclone", "psyclone", Category.PSYCLONE)
         self._api = api
+        self._version: Optional[str] = None
+
+    def get_version(self) -> str:
+        ''':returns: the first line of the PSyclone version output, or an
+            empty string if it could not be determined. This is enough to
+            notice when PSyclone, and so its built-in kernels, change.
+        '''
+        if self._version is None:
+            try:
+                res = self.run("--version", capture_output=True)
+            except (FileNotFoundError, RuntimeError) as err:
+                self.logger.warning(f"Error asking for version of "
+                                    f"'{self.name}': {err}")
+                return ''
+            lines = res.strip().splitlines()
+            self._version = lines[0].strip() if lines else ''
+        return self._version
+
+    def get_hash(self) -> int:
+        ''':returns: a hash based on the PSyclone version.'''
+        return zlib.crc32(self.get_version().encode())
 
     def process(self,
                 config: "BuildConfig",
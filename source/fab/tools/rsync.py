@@ -9,7 +9,7 @@
 
 import os
 from pathlib import Path
-from typing import List, Union
+from typing import List, Sequence, Union
 
 from fab.tools.category import Category
 from fab.tools.tool import Tool
@@ -22,19 +22,28 @@ class Rsync(Tool):
     def __init__(self):
         super().__init__("rsync", "rsync", Category.RSYNC)
 
-    def execute(self, src: Path,
+    def execute(self, src: Union[Path, str, Sequence[Union[Path, str]]],
                 dst: Path):
         '''Execute an rsync command from src to dst. It supports
         ~ expansion for src, and makes sure that `src` end with a `/`
         so that rsync does not create a sub-directory.
 
-        :param src: the input path.
+        Several source folders can be given, which merges their contents
+        into dst using a single rsync process.
+
+        :param src: the input path, or a list of input paths.
         :param dst: destination path.
         '''
-        src_str = os.path.expanduser(str(src))
-        if not src_str.endswith('/'):
-            src_str += '/'
+        if isinstance(src, (Path, str)):
+            src = [src]
+
+        src_strs: List[Union[str, Path]] = []
+        for i in src:
+            src_str = os.path.expanduser(str(i))
+            if not src_str.endswith('/'):
+                src_str += '/'
+            src_strs.append(src_str)
 
         parameters: List[Union[str, Path]] = [
-            '--times', '--links', '--stats', '-ru', src_str, dst]
+            '--times', '--links', '--stats', '-ru', *src_strs, dst]
         return self.run(additional_parameters=parameters)
@@ -59,9 +59,9 @@ class ToolRepository(dict):
         # We get circular dependencies if imported at top of the file:
         # pylint: disable=import-outside-toplevel
         from fab.tools import (Ar, Cpp, CppFortran, Gcc, Gfortran,
-                               Icc, Ifort, Psyclone, Rsync)
+                               Icc, Ifort, PcppFortran, Psyclone, Rsync)
 
-        for cls in [Gcc, Icc, Gfortran, Ifort, Cpp, CppFortran,
+        for cls in [Gcc, Icc, Gfortran, Ifort, Cpp, CppFortran, PcppFortran,
                     Fcm, Git, Subversion, Ar, Psyclone, Rsync]:
             self.add_tool(cls)
 
@@ -11,13 +11,14 @@ Various utility functions live here - until we give them a proper place to live!
 import datetime
 import logging
 import os
+import shutil
 import sys
 import zlib
 from argparse import ArgumentParser
 from collections import namedtuple, defaultdict
 from pathlib import Path
-from time import perf_counter
-from typing import Iterator, Iterable, Optional, Dict, Set, Union, List
+from time import perf_counter, time_ns
+from typing import Callable, Iterator, Iterable, Optional, Dict, Set, Tuple, Union, List
 
 import fab
 
@@ -48,6 +49,13 @@ def log_or_dot_finish(logger):
 
 HashedFile = namedtuple("HashedFile", ['fpath', 'file_hash'])
 
+# The last checksum of each file, with the status fingerprint it was calculated for. See file_checksum().
+_checksums: Dict[str, Tuple[Tuple[int, ...], int]] = {}
+
+# Files changed more recently than this many nanoseconds ago aren't remembered.
+# File times are only updated every few milliseconds, so such a file might change again with the same fingerprint.
+_CHECKSUM_SETTLE_NS = 1_000_000_000
+
 
 def file_checksum(fpath):
     """
@@ -58,9 +66,24 @@ def file_checksum(fpath):
     We use crc32 for now because it's deterministic, unlike out-the-box hash.
     We could seed hash with a non-random or look into hashlib, if/when we want to improve this.
 
+    Many files, such as include files, are checksummed repeatedly in a build. The checksum is remembered,
+    and the file is only read again if its inode, size, modification or status change time have changed.
+    Unlike the modification time, the status change time can't be set back, so it changes with the content.
+
     """
+    fpath_str = os.fspath(fpath)
+    st = os.stat(fpath_str)
+    fingerprint = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+    cached = _checksums.get(fpath_str)
+    if cached and cached[0] == fingerprint:
+        return HashedFile(fpath, cached[1])
+
     with open(fpath, "rb") as infile:
-        return HashedFile(fpath, zlib.crc32(infile.read()))
+        file_hash = zlib.crc32(infile.read())
+    if time_ns() - st.st_ctime_ns > _CHECKSUM_SETTLE_NS:
+        _checksums[fpath_str] = (fingerprint, file_hash)
+    return HashedFile(fpath, file_hash)
 
 
 def string_checksum(s: str):
@@ -76,7 +99,55 @@ def string_checksum(s: str):
     return zlib.crc32(s.encode())
 
 
-def file_walk(path: Union[str, Path], ignore_folders: Optional[List[Path]] = None) -> Iterator[Path]:
+def fast_copy(src: Union[str, Path], dst: Union[str, Path], link: bool = False):
+    """
+    Copy a file, with its permissions and times, as cheaply as the filesystem allows.
+
+    The copy is made in the kernel with :func:`os.copy_file_range`, which shares the data blocks on filesystems
+    with reflinks (e.g. Btrfs, XFS), falling back to :func:`shutil.copy2`. Any existing destination is removed
+    first, so we never write through a hard link made by an earlier copy.
+
+    :param src:
+        The file to copy.
+    :param dst:
+        The destination file path.
+    :param link:
+        Make a hard link instead, if possible. Only use this when neither file will be modified in place,
+        because the two paths share their contents.
+
+    """
+    try:
+        os.unlink(dst)
+    except FileNotFoundError:
+        pass
+
+    if link:
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass  # e.g. a different filesystem
+
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if not copied:
+                        break
+                    remaining -= copied
+            if not remaining:
+                shutil.copystat(src, dst)
+                return
+        except OSError:
+            pass  # e.g. not supported by this kernel or filesystem
+
+    shutil.copy2(src, dst)
+
+
+def file_walk(path: Union[str, Path], ignore_folders: Optional[List[Path]] = None,
+              prune: Optional[Callable[[Path], bool]] = None) -> Iterator[Path]:
     """
     Return every file in *path* and its sub-folders.
 
@@ -84,6 +155,8 @@ def file_walk(path: Union[str, Path], ignore_folders: Optional[List[Path]] = Non
         Folder to iterate.
     :param ignore_folders:
         Pass in any folder if you don't want to traverse into. Please see explanation and intended use, below.
+    :param prune:
+        Optional function which is given each sub-folder, returning True if it should not be traversed.
 
     .. note::
 
@@ -99,15 +172,19 @@ def file_walk(path: Union[str, Path], ignore_folders: Optional[List[Path]] = Non
     ignore_folders = ignore_folders or []
 
     # Note: path here *can* be the prebuild folder
-    for i in path.iterdir():
-        if i.is_dir():
-            # Don't recurse into the given folders.
-            if i in ignore_folders:
-                logger.debug(f'file_walk ignoring {i}')
-                continue
-            yield from file_walk(path=i, ignore_folders=ignore_folders)
-        else:
-            yield i
+    # We use scandir because its entries cache the file type from the directory listing,
+    # saving a stat call for every file.
+    with os.scandir(path) as entries:
+        for entry in entries:
+            i = Path(entry.path)
+            if entry.is_dir():
+                # Don't recurse into the given folders.
+                if i in ignore_folders or (prune and prune(i)):
+                    logger.debug(f'file_walk ignoring {i}')
+                    continue
+                yield from file_walk(path=i, ignore_folders=ignore_folders, prune=prune)
+            else:
+                yield i
 
 
 class Timer:
@@ -306,4 +383,26 @@ def common_arg_parser() -> ArgumentParser:
     group.add_argument('--multiprocessing', default=True, help='Turns OFF multiprocessing.')
     group.add_argument('--two-stage', action='store_true',
                        help='Compile .mod files first in a separate pass. Theoretically faster in some projects.')
+    group.add_argument('--cpus', type=parse_cpu_list, default=None,
+                       help='Confine the build to these cores, e.g. 0-15,32.')
+    group.add_argument('--nice', type=int, default=0,
+                       help='Niceness increment for the build processes, e.g. 10 on a shared login node.')
     return arg_parser
+
+
+def parse_cpu_list(cpus: str) -> List[int]:
+    """
+    Parse a list of cores in the format used by taskset and cgroups, e.g. ``0-3,8,10-11``.
+
+    """
+    result: Set[int] = set()
+    for part in cpus.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        try:
+            result.update(range(int(first), int(last or first) + 1))
+        except ValueError:
+            raise ValueError(f"invalid cpu list '{cpus}'") from None
+    return sorted(result)
@@ -4,6 +4,7 @@
 #  which you should have received as part of this distribution
 # ##############################################################################
 import copy
+import pickle
 from pathlib import Path
 
 import pytest
@@ -175,6 +176,11 @@ class TestAnalysedFortran(object):
 
         assert loaded == analysed_fortran
 
+    def test_slots(self, analysed_fortran):
+        # there are many of these, so they have no instance dict, but still pickle for multiprocessing
+        assert not hasattr(analysed_fortran, '__dict__')
+        assert pickle.loads(pickle.dumps(analysed_fortran)) == analysed_fortran
+
     def test_eq(self, analysed_fortran):
         assert analysed_fortran == copy.deepcopy(analysed_fortran)
 
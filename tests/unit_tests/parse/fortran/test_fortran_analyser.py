@@ -61,7 +61,22 @@ class TestAnalyser:
             analysis, artefact = fortran_analyser.run(
                 fpath=Path(Path(__file__).parent / "empty.f90"))
         assert isinstance(analysis, EmptySourceFile)
-        assert artefact is None
+        assert artefact == (fortran_analyser._config.prebuild_folder /
+                            f'empty.{analysis.file_hash}.an')
+
+    def test_empty_file_reloaded(self, fortran_analyser):
+        # make sure an empty file isn't parsed again once it's been analysed
+        fpath = Path(Path(__file__).parent / "empty.f90")
+        fortran_analyser._config.prebuild_folder.mkdir(parents=True)
+        analysis, artefact = fortran_analyser.run(fpath=fpath)
+        assert artefact.exists()
+
+        with mock.patch.object(fortran_analyser, '_parse_file') as parse:
+            reloaded, reloaded_artefact = fortran_analyser.run(fpath=fpath)
+        parse.assert_not_called()
+        assert isinstance(reloaded, EmptySourceFile)
+        assert reloaded == analysis
+        assert reloaded_artefact == artefact
 
     def test_module_file(self, fortran_analyser, module_fpath,
                          module_expected):
@@ -71,6 +86,31 @@ class TestAnalyser:
         assert artefact == (fortran_analyser._config.prebuild_folder /
                             f'test_fortran_analyser.{analysis.file_hash}.an')
 
+    def test_ignore_mod_deps(self, tmp_path, module_fpath):
+        # a list is accepted, and stored as a lower case set
+        fortran_analyser = FortranAnalyser(ignore_mod_deps=['BAR_mod'])
+        assert fortran_analyser.ignore_mod_deps == frozenset(['bar_mod'])
+        fortran_analyser._config = BuildConfig('proj', ToolBox(),
+                                               fab_workspace=tmp_path)
+        with mock.patch('fab.parse.AnalysedFile.save'):
+            analysis, _ = fortran_analyser.run(fpath=module_fpath)
+        assert analysis.module_deps == {'compute_chunk_size_mod'}
+
+    def test_parser_reused(self):
+        # creating a parser is slow, so analysers share it while the standard is unchanged
+        with mock.patch('fab.parse.fortran_common.ParserFactory',
+                        wraps=ParserFactory) as mock_factory:
+            with mock.patch('fab.parse.fortran_common._parser', None):
+                first = FortranAnalyser(std='f2008')
+                second = FortranAnalyser(std='f2008')
+                assert first.f2008_parser is second.f2008_parser
+                assert mock_factory.call_count == 1
+
+                # the parser classes are set up again for each change of standard
+                FortranAnalyser(std='f2003')
+                FortranAnalyser(std='f2008')
+                assert mock_factory.call_count == 3
+
     def test_program_file(self, fortran_analyser, module_fpath,
                           module_expected):
         # same as test_module_file() but replacing MODULE with PROGRAM
@@ -8,6 +8,7 @@ Test contents of parse/__init__.py
 
 """
 import copy
+import json
 from pathlib import Path
 
 import pytest
@@ -151,3 +152,11 @@ class TestAnalysedDependent(object):
 
     def test_hash_different_file_deps(self, analysed_dependent, different_file_deps):
         assert hash(analysed_dependent) != hash(different_file_deps)
+
+    # interning
+    def test_symbols_interned(self, as_dict):
+        # the same symbol name loaded for two files is one string object
+        first = AnalysedDependent.from_dict(json.loads(json.dumps(as_dict)))
+        second = AnalysedDependent.from_dict(json.loads(json.dumps(as_dict)))
+        first_defs = {name: name for name in first.symbol_defs}
+        assert all(first_defs[name] is name for name in second.symbol_defs)
@@ -1,3 +1,4 @@
+import logging
 from pathlib import Path
 from unittest import mock
 
@@ -33,7 +34,7 @@ class Test_gen_symbol_table(object):
         # duplicate a symbol from the first file in the second file
         analysed_files[1].symbol_defs.add('foo_1')
 
-        with pytest.warns(UserWarning):
+        with pytest.warns(UserWarning, match="duplicate symbol 'foo_1' defined in bar.c already found in foo.c"):
             result = _gen_symbol_table(analysed_files=analysed_files)
 
         assert result == {
@@ -65,6 +66,21 @@ class Test_gen_file_deps(object):
 
         assert analysed_files[0].file_deps == {symbols['dep1_mod'], symbols['dep2']}
 
+    def test_not_found(self, caplog):
+        # symbols which aren't in the table are logged and skipped
+        my_file = Path('my_file.f90')
+        symbols = {'dep1_mod': Path('dep1_mod.f90')}
+        analysed_files = [
+            mock.Mock(
+                spec=AnalysedDependent, fpath=my_file, symbol_deps={'dep1_mod', 'netcdf'}, file_deps=set()),
+        ]
+
+        with caplog.at_level(logging.INFO):
+            _gen_file_deps(analysed_files=analysed_files, symbols=symbols)
+
+        assert analysed_files[0].file_deps == {symbols['dep1_mod']}
+        assert '1 deps not found' in caplog.text
+
 
 # todo: this is fortran-ey, move it?
 class Test_add_unreferenced_deps(object):
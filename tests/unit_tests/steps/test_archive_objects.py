@@ -94,3 +94,87 @@ class TestArchiveObjects:
                             output_fpath=config.build_output / 'mylib.a')
         assert ("Unexpected tool 'gcc' of type '<class "
                 "'fab.tools.compiler.Gcc'>' instead of Ar" in str(err.value))
+
+    def test_thin(self):
+        '''Test creating a thin archive.
+        '''
+        config = BuildConfig('proj', ToolBox())
+        config.artefact_store.update_dict(
+            ArtefactSet.OBJECT_FILES, None, {'util1.o', 'util2.o'})
+
+        mock_result = mock.Mock(returncode=0, return_value=123)
+        with mock.patch('fab.tools.tool.subprocess.run',
+                        return_value=mock_result) as mock_run_command, \
+                pytest.warns(UserWarning, match="_metric_send_conn not set, cannot send metrics"):
+            archive_objects(config=config, output_fpath=config.build_output / 'mylib.a',
+                            thin=True)
+
+        mock_run_command.assert_called_once_with([
+            'ar', 'crT', str(config.build_output / 'mylib.a'), 'util1.o', 'util2.o'],
+            capture_output=True, env=None, cwd=None, check=False)
+
+    def test_thin_fallback(self):
+        '''Test that we fall back to a normal archive if the archiver can't
+        create a thin archive, and don't try thin archives again.
+        '''
+        targets = ['prog1', 'prog2']
+
+        config = BuildConfig('proj', ToolBox())
+        for target in targets:
+            config.artefact_store.update_dict(
+                ArtefactSet.OBJECT_FILES, target, {f'{target}.o'})
+
+        results = [mock.Mock(returncode=1, stderr=b'bad flag', stdout=b''),
+                   mock.Mock(returncode=0), mock.Mock(returncode=0)]
+        with mock.patch('fab.tools.tool.subprocess.run',
+                        side_effect=results) as mock_run_command, \
+                pytest.warns(UserWarning, match="_metric_send_conn not set, "
+                                                "cannot send metrics"):
+            archive_objects(config=config, thin=True)
+
+        assert mock_run_command.call_args_list == [
+            call(['ar', 'crT', str(config.build_output / 'prog1.a'), 'prog1.o'],
+                 capture_output=True, env=None, cwd=None, check=False),
+            call(['ar', 'cr', str(config.build_output / 'prog1.a'), 'prog1.o'],
+                 capture_output=True, env=None, cwd=None, check=False),
+            call(['ar', 'cr', str(config.build_output / 'prog2.a'), 'prog2.o'],
+                 capture_output=True, env=None, cwd=None, check=False),
+        ]
+
+    def test_groups(self):
+        '''Test splitting the objects into an archive per group, by the
+        source file each object was compiled from.
+        '''
+        config = BuildConfig('proj', ToolBox())
+        out = config.build_output
+        pre = config.prebuild_folder
+        sources = {
+            pre / 'prog.1a2b.o': out / 'prog.f90',
+            pre / 'u1.3c4d.o': out / 'utils/u1.f90',
+            pre / 'u2.5e6f.o': out / 'utils/u2.f90',
+            pre / 'c.7a8b.o': out / 'src/control/c.f90',
+        }
+        config.artefact_store[ArtefactSet.OBJECT_SOURCES].update(sources)
+        config.artefact_store.update_dict(ArtefactSet.OBJECT_FILES, 'prog', set(sources))
+
+        mock_result = mock.Mock(returncode=0, return_value=123)
+        with mock.patch('fab.tools.tool.subprocess.run',
+                        return_value=mock_result) as mock_run_command, \
+                pytest.warns(UserWarning, match="_metric_send_conn not set, cannot send metrics"):
+            archive_objects(config=config, groups={'utils': '$output/utils/*',
+                                                   'control': '$output/src/control/*',
+                                                   'science': '$output/src/science/*'})
+
+        mock_run_command.assert_has_calls([
+            call(['ar', 'cr', str(out / 'prog.a'), str(pre / 'prog.1a2b.o')],
+                 capture_output=True, env=None, cwd=None, check=False),
+            call(['ar', 'cr', str(out / 'prog_utils.a'), str(pre / 'u1.3c4d.o'), str(pre / 'u2.5e6f.o')],
+                 capture_output=True, env=None, cwd=None, check=False),
+            call(['ar', 'cr', str(out / 'prog_control.a'), str(pre / 'c.7a8b.o')],
+                 capture_output=True, env=None, cwd=None, check=False),
+        ], any_order=True)
+        assert mock_run_command.call_count == 3
+
+        # no archive for an empty group
+        assert config.artefact_store[ArtefactSet.OBJECT_ARCHIVES] == {
+            'prog': {str(out / 'prog.a'), str(out / 'prog_utils.a'), str(out / 'prog_control.a')}}
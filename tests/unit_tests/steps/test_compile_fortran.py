@@ -1,5 +1,4 @@
 from pathlib import Path
-from typing import Dict
 from unittest import mock
 from unittest.mock import call
 
@@ -9,9 +8,9 @@ from fab.artefacts import ArtefactSet, ArtefactStore
 from fab.build_config import BuildConfig, FlagsConfig
 from fab.parse.fortran import AnalysedFortran
 from fab.steps.compile_fortran import (
-    compile_pass, get_compile_next,
-    get_mod_hashes, handle_compiler_args, MpCommonArgs, process_file,
-    store_artefacts)
+    compile_as_ready, compile_fortran, CompileSchedule,
+    get_mod_hashes, handle_compiler_args, longest_first, MpCommonArgs,
+    process_file, store_artefacts)
 from fab.tools import Category, ToolBox
 from fab.util import CompiledFile
 
@@ -58,55 +57,111 @@ def test_compile_cc_wrong_compiler(tool_box):
             in str(err.value))
 
 
-class TestCompilePass:
+def test_two_stage_errors(tool_box):
+    # errors in the second stage of a two-stage compile are raised
+    config = BuildConfig('proj', tool_box, two_stage=True)
+    tool_box[Category.FORTRAN_COMPILER]._syntax_only_flag = '-fsyntax-only'
+    source = mock.Mock(return_value={'root': [AnalysedFortran(fpath=Path('a.f90'), file_hash=0)]})
+    with mock.patch('fab.steps.compile_fortran.compile_as_ready'), \
+            mock.patch('fab.steps.compile_fortran.run_mp', return_value=[(Exception('bad fortran'), None)]):
+        with pytest.raises(RuntimeError) as err:
+            compile_fortran(config, source=source)
+    assert 'bad fortran' in str(err.value)
 
-    def test_vanilla(self, analysed_files, tool_box: ToolBox):
-        # make sure it compiles b only
-        a, b, c = analysed_files
-        uncompiled = {a, b}
-        compiled: Dict[Path, CompiledFile] = {c.fpath: mock.Mock(input_fpath=c.fpath)}
 
-        run_mp_results = [
-            (
-                mock.Mock(spec=CompiledFile, input_fpath=Path('b.f90')),
-                [Path('/prebuild/b.123.o')]
-            )
-        ]
+class TestCompileAsReady:
+
+    @pytest.fixture
+    def args(self, analysed_files, tool_box: ToolBox):
+        config = BuildConfig('proj', tool_box, multiprocessing=False)
+        return dict(config=config, compiled={}, schedule=CompileSchedule(analysed_files),
+                    mod_hashes={}, mp_common_args=MpCommonArgs(config, FlagsConfig(), {}, True))
+
+    def test_vanilla(self, args):
+        # each file is compiled after its dependency, and its modules are hashed before the next starts
+        def process_file(arg):
+            af, _ = arg
+            assert all(dep in args['mod_hashes'] for dep in af.file_deps)
+            return CompiledFile(input_fpath=af.fpath, output_fpath=af.fpath.with_suffix('.o')), []
 
-        # this gets filled in
-        mod_hashes: Dict[str, int] = {}
+        with mock.patch('fab.steps.compile_fortran.process_file', side_effect=process_file) as mock_process, \
+                mock.patch('fab.steps.compile_fortran.get_mod_hashes',
+                           side_effect=lambda afs, _: {af.fpath: 123 for af in afs}):
+            compile_as_ready(**args)
 
-        config = BuildConfig('proj', tool_box)
-        mp_common_args = MpCommonArgs(config, FlagsConfig(), {}, True)
-        with mock.patch('fab.steps.compile_fortran.run_mp', return_value=run_mp_results):
-            with mock.patch('fab.steps.compile_fortran.get_mod_hashes'):
-                uncompiled_result = compile_pass(config=config, compiled=compiled, uncompiled=uncompiled,
-                                                 mod_hashes=mod_hashes, mp_common_args=mp_common_args)
+        assert [c[0][0][0].fpath for c in mock_process.call_args_list] == \
+            [Path('c.f90'), Path('b.f90'), Path('a.f90')]
+        assert set(args['compiled']) == {Path('a.f90'), Path('b.f90'), Path('c.f90')}
 
-        assert Path('a.f90') not in compiled
-        assert Path('b.f90') in compiled
-        assert list(uncompiled_result)[0].fpath == Path('a.f90')
+    def test_error(self, args):
+        # nothing more is started after an error
+        with mock.patch('fab.steps.compile_fortran.process_file',
+                        return_value=(Exception('bad fortran'), None)) as mock_process:
+            with pytest.raises(RuntimeError) as err:
+                compile_as_ready(**args)
 
+        assert 'bad fortran' in str(err.value)
+        mock_process.assert_called_once()
+        assert args['compiled'] == {}
 
-class TestGetCompileNext:
+
+class TestCompileSchedule:
 
     def test_vanilla(self, analysed_files):
+        # each file is ready once its dependency is compiled
         a, b, c = analysed_files
-        uncompiled = {a, b}
-        compiled = {c.fpath: mock.Mock(input_fpath=c.fpath)}
-
-        compile_next = get_compile_next(compiled, uncompiled)
+        schedule = CompileSchedule({a, b, c})
+        assert len(schedule) == 2
+        assert schedule.take_ready() == {c}
+        assert schedule.take_ready() == set()
 
-        assert compile_next == {b}
+        assert schedule.done([c.fpath]) == [b]
+        assert schedule.done([b.fpath]) == [a]
+        assert schedule.done([a.fpath]) == []
+        assert len(schedule) == 0
+        schedule.check_done()
 
     def test_unable_to_compile_anything(self, analysed_files):
-        # like vanilla, except c hasn't been compiled
+        # like vanilla, except c isn't being compiled
         a, b, _ = analysed_files
-        to_compile = {a, b}
-        already_compiled_files = {}
-
+        schedule = CompileSchedule({a, b})
+        assert schedule.take_ready() == set()
+
+        with pytest.raises(ValueError) as err:
+            schedule.check_done()
+        assert 'b.f90\n    c.f90' in str(err.value)
+
+    def test_priority(self, tmp_path):
+        # a file's priority includes the most costly chain of files which depend on it
+        a = AnalysedFortran(fpath=tmp_path / 'a.f90', file_deps={tmp_path / 'b.f90'}, file_hash=0)
+        b = AnalysedFortran(fpath=tmp_path / 'b.f90', file_deps={tmp_path / 'c.f90'}, file_hash=0)
+        c = AnalysedFortran(fpath=tmp_path / 'c.f90', file_hash=0)
+        d = AnalysedFortran(fpath=tmp_path / 'd.f90', file_hash=0)
+        for af, size in [(a, 10), (b, 20), (c, 30), (d, 50)]:
+            af.fpath.write_text('x' * size)
+
+        schedule = CompileSchedule({a, b, c, d})
+        assert schedule.priority == {a.fpath: 10, b.fpath: 30, c.fpath: 60, d.fpath: 50}
+        assert schedule.critical_path() == [c.fpath, b.fpath, a.fpath]
+
+    def test_priority_cycle(self, tmp_path):
+        # files which depend on each other can't be compiled, but mustn't hang the schedule
+        a = AnalysedFortran(fpath=tmp_path / 'a.f90', file_deps={tmp_path / 'b.f90'}, file_hash=0)
+        b = AnalysedFortran(fpath=tmp_path / 'b.f90', file_deps={tmp_path / 'a.f90'}, file_hash=0)
+        schedule = CompileSchedule({a, b})
+        assert set(schedule.priority) == {a.fpath, b.fpath}
         with pytest.raises(ValueError):
-            get_compile_next(already_compiled_files, to_compile)
+            schedule.check_done()
+
+
+def test_longest_first(tmp_path):
+    # bigger files start first, and missing files last
+    small = AnalysedFortran(fpath=tmp_path / 'small.f90', file_hash=0)
+    big = AnalysedFortran(fpath=tmp_path / 'big.f90', file_hash=0)
+    missing = AnalysedFortran(fpath=tmp_path / 'missing.f90', file_hash=0)
+    small.fpath.write_text('x')
+    big.fpath.write_text('x' * 100)
+    assert longest_first({missing, small, big}) == [big, small, missing]
 
 
 class TestStoreArtefacts:
@@ -143,6 +198,10 @@ class TestStoreArtefacts:
                 'root1': {Path('root1.o'), Path('dep1.o')},
                 'root2': {Path('root2.o'), Path('dep2.o')},
             }
+        assert artefact_store[ArtefactSet.OBJECT_SOURCES] == {
+            Path('root1.o'): Path('root1.f90'), Path('dep1.o'): Path('dep1.f90'),
+            Path('root2.o'): Path('root2.f90'), Path('dep2.o'): Path('dep2.f90'),
+        }
 
 
 # This avoids pylint warnings about Redefining names from outer scope
@@ -0,0 +1,190 @@
+# ##############################################################################
+#  (c) Crown copyright Met Office. All rights reserved.
+#  For further details please refer to the file COPYRIGHT
+#  which you should have received as part of this distribution
+# ##############################################################################
+
+'''Tests the find_source_files step.
+'''
+
+import os
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from fab.artefacts import ArtefactSet
+from fab.build_config import BuildConfig
+from fab.steps import _get_thread_pool, close_thread_pools
+from fab.steps.find_source_files import (Exclude, FastExclude, FastInclude, Include,
+                                         _excludes_folder, find_source_files)
+from fab.tools import ToolBox
+
+
+@pytest.fixture(name="config")
+def fixture_config(tmp_path):
+    '''Provides a config with some source files in nested folders.'''
+    config = BuildConfig('proj', ToolBox(), fab_workspace=tmp_path,
+                         multiprocessing=False)
+    for fpath in ['root.f90', 'src/a.F90', 'src/um/b.f90', 'src/um/keep.f90',
+                  'utils/deep/er/c.c']:
+        (config.source_root / fpath).parent.mkdir(parents=True, exist_ok=True)
+        (config.source_root / fpath).touch()
+    return config
+
+
+class TestFindSourceFiles:
+    '''Tests for find_source_files.'''
+
+    @pytest.fixture(autouse=True)
+    def no_thread_pools(self):
+        # don't share thread pools with other tests
+        close_thread_pools()
+        yield
+        close_thread_pools()
+
+    def test_all_files(self, config):
+        '''Test that all files in all folders are found.'''
+        find_source_files(config)
+        assert config.artefact_store[ArtefactSet.INITIAL_SOURCE] == {
+            config.source_root / 'root.f90',
+            config.source_root / 'src/a.F90',
+            config.source_root / 'src/um/b.f90',
+            config.source_root / 'src/um/keep.f90',
+            config.source_root / 'utils/deep/er/c.c',
+        }
+        assert config.artefact_store[ArtefactSet.FORTRAN_BUILD_FILES] == {
+            config.source_root / 'root.f90',
+            config.source_root / 'src/a.F90',
+            config.source_root / 'src/um/b.f90',
+            config.source_root / 'src/um/keep.f90',
+        }
+        assert config.artefact_store[ArtefactSet.C_BUILD_FILES] == {
+            config.source_root / 'utils/deep/er/c.c'}
+        assert config.artefact_store[ArtefactSet.X90_BUILD_FILES] == set()
+
+    def test_threads(self, config):
+        '''Test that the same files are found when the folders are walked
+        by the config's thread pool.'''
+        config.multiprocessing = True
+        config.n_procs = 2
+        with mock.patch('fab.steps.find_source_files._get_thread_pool',
+                        wraps=_get_thread_pool) as get_pool:
+            find_source_files(config, path_filters=[Exclude('deep/er')])
+        get_pool.assert_called_once_with(config)
+        assert config.artefact_store[ArtefactSet.INITIAL_SOURCE] == {
+            config.source_root / 'root.f90',
+            config.source_root / 'src/a.F90',
+            config.source_root / 'src/um/b.f90',
+            config.source_root / 'src/um/keep.f90',
+        }
+
+    def test_threads_error(self, config):
+        '''Test that an error walking a folder in a thread is raised.'''
+        config.multiprocessing = True
+        config.n_procs = 2
+        with mock.patch('fab.steps.find_source_files.file_walk',
+                        side_effect=PermissionError('no entry')):
+            with pytest.raises(PermissionError):
+                find_source_files(config)
+
+    def test_filters(self, config):
+        '''Test that filters are applied in order, with the last matching
+        filter deciding.'''
+        find_source_files(config, path_filters=[
+            Exclude('src/um/'), Include('um/keep'), Exclude('deep/er')])
+        assert config.artefact_store[ArtefactSet.INITIAL_SOURCE] == {
+            config.source_root / 'root.f90',
+            config.source_root / 'src/a.F90',
+            config.source_root / 'src/um/keep.f90',
+        }
+
+    def test_prune(self, config):
+        '''Test that excluded folders aren't walked.'''
+        with mock.patch('fab.util.os.scandir', wraps=os.scandir) as scandir:
+            find_source_files(config, path_filters=[Exclude('src/um/'), Exclude('deep/')])
+        assert config.artefact_store[ArtefactSet.INITIAL_SOURCE] == {
+            config.source_root / 'root.f90',
+            config.source_root / 'src/a.F90',
+        }
+        walked = {Path(c.args[0]) for c in scandir.call_args_list}
+        assert config.source_root / 'src' in walked
+        assert config.source_root / 'src/um' not in walked
+        assert config.source_root / 'utils/deep' not in walked
+
+    def test_nothing_found(self, config):
+        '''Test that an error is raised if everything is filtered out.'''
+        with pytest.raises(RuntimeError) as err:
+            find_source_files(config, path_filters=[Exclude('')])
+        assert "no source files found after filtering" in str(err.value)
+
+
+class TestPathFilter:
+    '''Tests for the Include and Exclude path filters.'''
+
+    def test_containment(self):
+        '''Test that a path matches any filter string it contains.'''
+        path_filter = Exclude('my_folder', 'er/my', 'a.b')
+        assert path_filter.check('/src/my_folder/x.f90') is False
+        assert path_filter.check('/src/folder/my.f90') is False
+        assert path_filter.check('/src/a.b.f90') is False
+        # Filter strings are not regular expressions
+        assert path_filter.check('/src/axb.f90') is None
+        assert Include('folder').check('/src/my_folder/x.f90') is True
+
+    def test_no_filter_strings(self):
+        '''Test that a filter without any strings matches nothing.'''
+        assert Exclude().check('/src/a.f90') is None
+
+
+class TestPathSetFilter:
+    '''Tests for the FastInclude and FastExclude path filters.'''
+
+    def test_files_and_folders(self):
+        '''Test that a path matches a given file, or a file in a given
+        folder.'''
+        path_filter = FastInclude('/src/um/a.F90', Path('/src/um/b'), '/src/um/b-c/')
+        assert path_filter.check('/src/um/a.F90') is True
+        assert path_filter.check(Path('/src/um/b/x/y.F90')) is True
+        assert path_filter.check('/src/um/b-c/z.F90') is True
+        # Whole path components only
+        assert path_filter.check('/src/um/a.F90.bak') is None
+        assert path_filter.check('/src/um/bb/x.F90') is None
+        assert path_filter.check('/src/um/b-d/x.F90') is None
+        assert path_filter.check('/src/um/c.F90') is None
+        assert FastExclude('/src/um').check('/src/um/a.F90') is False
+
+    def test_nested_folders(self):
+        '''Test a path in an outer folder which sorts after a nested
+        folder.'''
+        path_filter = FastInclude('/src/a', '/src/a/b')
+        assert path_filter.check('/src/a/c/x.F90') is True
+        assert path_filter.check('/src/a/b/x.F90') is True
+        assert path_filter.check('/src/ab/x.F90') is None
+
+    def test_same_as_include(self):
+        '''Test that it agrees with Include for whole paths.'''
+        paths = ['/src/um/a', '/src/um/a/b.F90', '/src/um/c', '/src/um/d/e']
+        fast, slow = FastInclude(*paths), Include(*[p + '/' for p in paths] + paths[1:2])
+        for path in ['/src/um/a/x.F90', '/src/um/a/b.F90', '/src/um/c/d/e.F90',
+                     '/src/um/d/e/f.F90', '/src/um/d/f.F90', '/src/um/b.F90']:
+            assert fast.check(path) == slow.check(path), path
+
+
+class TestExcludesFolder:
+    '''Tests for deciding whether a folder needn't be walked.'''
+
+    @pytest.mark.parametrize('path_filters, excluded', [
+        ([], False),
+        ([Exclude('/src/um')], True),
+        ([Exclude('/src/um/x')], False),
+        # a later include might match something in the folder
+        ([Exclude('/src/um'), Include('keep')], False),
+        ([Exclude('/src/um'), FastInclude('/src/um/a/keep.F90')], False),
+        ([Exclude('/src/um'), FastInclude('/src/other')], True),
+        ([Exclude('/src/um'), Include('/src')], False),
+        ([Exclude('/src/um'), Include('/src'), Exclude('um')], True),
+        ([FastExclude('/src'), Exclude('/tmp')], True),
+    ])
+    def test_excludes_folder(self, path_filters, excluded):
+        assert _excludes_folder(path_filters, Path('/src/um/a')) is excluded
@@ -3,10 +3,12 @@
 # For further details please refer to the file COPYRIGHT
 # which you should have received as part of this distribution
 ##############################################################################
+import threading
 from pathlib import Path
 from types import SimpleNamespace
 from unittest import mock
 
+from fab.steps.grab import grab_parallel
 from fab.steps.grab.fcm import fcm_export
 from fab.steps.grab.folder import grab_folder
 from fab.tools import ToolBox
@@ -78,3 +80,23 @@ class TestGrabFcm:
     # todo: test missing repo
     # def test_missing(self):
     #     assert False
+
+
+class TestGrabParallel:
+
+    def test_concurrent(self):
+        # each grab waits for the other, so this only finishes if they run at the same time
+        config = mock.Mock()
+        barrier = threading.Barrier(2, timeout=10)
+        grabs = [mock.Mock(side_effect=lambda config: barrier.wait()) for _ in range(2)]
+        with pytest.warns(UserWarning, match="_metric_send_conn not set, cannot send metrics"):
+            grab_parallel(config, grabs)
+        for grab in grabs:
+            grab.assert_called_once_with(config)
+
+    def test_error(self):
+        # the other grabs still run, then the failure is raised
+        grabs = [mock.Mock(side_effect=RuntimeError('no network')), mock.Mock()]
+        with pytest.raises(RuntimeError, match='no network'):
+            grab_parallel(mock.Mock(), grabs)
+        grabs[1].assert_called_once()
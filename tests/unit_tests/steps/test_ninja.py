@@ -0,0 +1,116 @@
+# ##############################################################################
+#  (c) Crown copyright Met Office. All rights reserved.
+#  For further details please refer to the file COPYRIGHT
+#  which you should have received as part of this distribution
+# ##############################################################################
+
+'''Tests the ninja.py step.
+'''
+
+from pathlib import Path
+
+import pytest
+
+from fab.artefacts import ArtefactSet
+from fab.build_config import AddFlags, BuildConfig
+from fab.parse.c import AnalysedC
+from fab.parse.fortran import AnalysedFortran
+from fab.steps.ninja import emit_ninja
+from fab.tools import Category, Ccache
+
+
+@pytest.fixture(name="config")
+def fixture_config(tmp_path, tool_box):
+    '''Provides a config for the tests.'''
+    return BuildConfig('proj', tool_box, multiprocessing=False,
+                       fab_workspace=tmp_path)
+
+
+def add_build_tree(config):
+    '''Adds a build tree of two Fortran files, one of which uses a module
+    from the other, and one from outside the project.'''
+    prog = AnalysedFortran(fpath=config.build_output / 'prog.f90', file_hash=0,
+                           program_defs=['prog'], symbol_defs=['prog'], module_deps=['mod_a', 'netcdf'],
+                           symbol_deps=['mod_a', 'netcdf'])
+    mod_a = AnalysedFortran(fpath=config.build_output / 'my dir/mod_a.f90', file_hash=0,
+                            module_defs=['mod_a'], symbol_defs=['mod_a'])
+    config._artefact_store[ArtefactSet.BUILD_TREES] = {
+        'prog': {prog.fpath: prog, mod_a.fpath: mod_a}}
+
+
+def test_emit_ninja(config):
+    '''Test the rules and build statements in the ninja file.'''
+    with config:
+        add_build_tree(config)
+        emit_ninja(config, common_flags=['-O2'], link_flags=['-lnetcdff'],
+                   path_flags=[AddFlags(match='$output/prog.f90', flags=['-g'])])
+
+    out = config.build_output
+    lines = (out / 'build.ninja').read_text().splitlines()
+
+    assert '  command = mock_fortran_compiler.exe $flags -c $in -o $out' in lines
+    assert '  restat = 1' in lines
+    assert '  command = mock_linker.exe $in $flags -o $out' in lines
+
+    # the module user depends on the module file, spaces are escaped
+    mod_a_src = Path('my$ dir')
+    assert (f'build {out / mod_a_src / "mod_a.o"} | {out / "mod_a.mod"}: '
+            f'fc {out / mod_a_src / "mod_a.f90"}') in lines
+    assert (f'build {out / "prog.o"}: fc {out / "prog.f90"} | '
+            f'{out / "mod_a.mod"}') in lines
+    assert lines.count('  flags = -O2') == 1
+    assert '  flags = -O2 -g' in lines
+
+    exe = config.project_workspace / 'prog'
+    assert (f'build {exe}: link {out / mod_a_src / "mod_a.o"} '
+            f'{out / "prog.o"}') in lines
+    assert '  flags = -lnetcdff' in lines
+    assert lines[-1] == f'default {exe}'
+
+
+def test_emit_ninja_launcher(config):
+    '''Test that the compiler's launcher, e.g. ccache, is kept.'''
+    compiler = config.tool_box[Category.FORTRAN_COMPILER]
+    compiler.set_launcher(Ccache())
+    try:
+        with config:
+            add_build_tree(config)
+            emit_ninja(config)
+    finally:
+        compiler.set_launcher(None)
+    lines = (config.build_output / 'build.ninja').read_text().splitlines()
+    assert '  command = ccache mock_fortran_compiler.exe $flags -c $in -o $out' in lines
+
+
+def test_emit_ninja_output_fpath(config, tmp_path):
+    '''Test writing the ninja file somewhere else.'''
+    with config:
+        add_build_tree(config)
+        emit_ninja(config, output_fpath=tmp_path / 'elsewhere.ninja')
+    assert (tmp_path / 'elsewhere.ninja').exists()
+    assert not (config.build_output / 'build.ninja').exists()
+
+
+def test_emit_ninja_c_source(config):
+    '''Test that build trees with C files are rejected, rather than
+    leaving the C objects out of the link.'''
+    with config:
+        add_build_tree(config)
+        c_file = AnalysedC(fpath=config.build_output / 'util.c', file_hash=0)
+        config.artefact_store[ArtefactSet.BUILD_TREES]['prog'][c_file.fpath] = c_file
+        with pytest.raises(RuntimeError) as err:
+            emit_ninja(config)
+    assert "files other than the Fortran source" in str(err.value)
+    assert 'util.c' in str(err.value)
+
+
+def test_emit_ninja_duplicate_module(config):
+    '''Test that a module defined in two files is reported.'''
+    with config:
+        add_build_tree(config)
+        dup = AnalysedFortran(fpath=config.build_output / 'dup.f90', file_hash=0,
+                              module_defs=['mod_a'], symbol_defs=['mod_a'])
+        config.artefact_store[ArtefactSet.BUILD_TREES]['prog'][dup.fpath] = dup
+        with pytest.raises(RuntimeError) as err:
+            emit_ninja(config)
+    assert "module 'mod_a' is defined in both" in str(err.value)
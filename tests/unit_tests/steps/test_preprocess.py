@@ -8,9 +8,11 @@ from unittest import mock
 
 import pytest
 
-from fab.build_config import BuildConfig
-from fab.steps.preprocess import preprocess_fortran
-from fab.tools import Category, ToolBox
+from fab.artefacts import ArtefactSet
+from fab.build_config import BuildConfig, FlagsConfig
+from fab.steps.preprocess import (MpCommonArgs, _read_prerequisites, pre_processor, preprocess_fortran,
+                                  process_artefact)
+from fab.tools import Category, CppFortran, PcppFortran, ToolBox
 
 
 class Test_preprocess_fortran:
@@ -26,7 +28,7 @@ class Test_preprocess_fortran:
             return [big_f90, little_f90]
 
         with mock.patch('fab.steps.preprocess.pre_processor') as mock_pp:
-            with mock.patch('shutil.copyfile') as mock_copy:
+            with mock.patch('fab.steps.preprocess.fast_copy') as mock_copy:
                 with config:
                     preprocess_fortran(config=config, source=source_getter)
 
@@ -40,7 +42,7 @@ class Test_preprocess_fortran:
             name='preprocess fortran',
         )
 
-        mock_copy.assert_called_once_with(str(little_f90), mock.ANY)
+        mock_copy.assert_called_once_with(little_f90, mock.ANY)
 
         # Now test that an incorrect preprocessor is detected:
         tool_box = config.tool_box
@@ -55,5 +57,126 @@ class Test_preprocess_fortran:
         with pytest.raises(RuntimeError) as err:
             preprocess_fortran(config=config)
         assert ("Unexpected tool 'cpp' of type '<class "
-                "'fab.tools.preprocessor.Cpp'>' instead of CppFortran"
+                "'fab.tools.preprocessor.Cpp'>' instead of CppFortran "
+                "or PcppFortran"
                 in str(err.value))
+
+
+class Test_pre_processor:
+
+    @pytest.mark.parametrize("preprocessor, use_threads", [
+        (CppFortran(), True),
+        (PcppFortran(), False),
+    ])
+    def test_use_threads(self, tmp_path, preprocessor, use_threads):
+        # external preprocessors run in a thread pool, pcpp runs in a process pool
+        config = BuildConfig('proj', ToolBox(), fab_workspace=tmp_path)
+        with mock.patch('fab.steps.preprocess.run_mp', return_value=[]) as mock_run_mp:
+            with mock.patch.object(preprocessor, 'get_version', return_value='1.0'):
+                with config:
+                    pre_processor(config, preprocessor=preprocessor, files=[],
+                                  output_collection=ArtefactSet.PREPROCESSED_FORTRAN,
+                                  output_suffix='.f90')
+
+        assert mock_run_mp.call_args[1]['use_threads'] == use_threads
+
+
+class Test_process_artefact:
+
+    @pytest.fixture
+    def args(self, tmp_path):
+        config = BuildConfig('proj', ToolBox(), fab_workspace=tmp_path)
+        (config.source_root / 'inc').mkdir(parents=True)
+        (config.source_root / 'inc/consts.inc').write_text('integer :: x\n')
+        (config.source_root / 'prog.F90').write_text(
+            '#include "consts.inc"\nprogram prog\nend program\n')
+        preprocessor = CppFortran()
+        preprocessor._version = 'cpp (GCC) 11.4.0'
+        return MpCommonArgs(config=config, output_suffix='.f90',
+                            preprocessor=preprocessor,
+                            flags=FlagsConfig(common_flags=['-I$source/inc']),
+                            name='preprocess fortran')
+
+    @pytest.fixture
+    def mock_preprocess(self, args):
+        # Stands in for cpp: includes the one include file and lists it in the dependency file.
+        inc_fpath = args.config.source_root / 'inc/consts.inc'
+
+        def preprocess(input_file, output_file, add_flags=None, dependency_file=None):
+            text = input_file.read_text().replace('#include "consts.inc"\n', inc_fpath.read_text())
+            output_file.write_text(text)
+            dependency_file.write_text(f'{output_file}: {input_file} \\\n {inc_fpath}\n')
+
+        with mock.patch.object(CppFortran, 'preprocess', side_effect=preprocess) as mock_preprocess:
+            yield mock_preprocess
+
+    def test_prebuild(self, args, mock_preprocess):
+        # the output is reused from the prebuild folder until an included file changes
+        input_fpath = args.config.source_root / 'prog.F90'
+        output_fpath, prebuilds = process_artefact((input_fpath, args))
+        assert output_fpath == args.config.build_output / 'prog.f90'
+        assert 'integer :: x' in output_fpath.read_text()
+        assert {p.suffix for p in prebuilds} == {'.d', '.f90'}
+        assert all(p.parent == args.config.prebuild_folder for p in prebuilds)
+        assert mock_preprocess.call_count == 1
+
+        output_fpath.unlink()
+        assert process_artefact((input_fpath, args)) == (output_fpath, prebuilds)
+        assert mock_preprocess.call_count == 1
+        assert 'integer :: x' in output_fpath.read_text()
+
+        (args.config.source_root / 'inc/consts.inc').write_text('integer :: y\n')
+        _, new_prebuilds = process_artefact((input_fpath, args))
+        assert new_prebuilds != prebuilds
+        assert mock_preprocess.call_count == 2
+        assert 'integer :: y' in output_fpath.read_text()
+
+    def test_prebuild_new_version(self, args, mock_preprocess):
+        # a different preprocessor version doesn't use the old prebuilds
+        input_fpath = args.config.source_root / 'prog.F90'
+        _, prebuilds = process_artefact((input_fpath, args))
+        args.preprocessor._version = 'cpp (GCC) 12.1.0'
+        _, new_prebuilds = process_artefact((input_fpath, args))
+        assert set(new_prebuilds).isdisjoint(prebuilds)
+        assert mock_preprocess.call_count == 2
+
+    def test_include_not_found(self, args):
+        # an included file which can't be found means no prebuild, but isn't an error
+        def preprocess(input_file, output_file, add_flags=None, dependency_file=None):
+            output_file.write_text('program prog\nend program\n')
+            dependency_file.write_text(f'{output_file}: {input_file} /not/a/real/file.inc\n')
+
+        input_fpath = args.config.source_root / 'prog.F90'
+        with mock.patch.object(CppFortran, 'preprocess', side_effect=preprocess):
+            output_fpath, prebuilds = process_artefact((input_fpath, args))
+        assert output_fpath == args.config.build_output / 'prog.f90'
+        assert prebuilds == []
+
+    def test_no_dependency_file(self, args):
+        # preprocessors which can't list their included files don't use prebuilds
+        args.preprocessor = mock.Mock(supports_dependency_file=False)
+        input_fpath = args.config.source_root / 'prog.F90'
+        output_fpath, prebuilds = process_artefact((input_fpath, args))
+        assert prebuilds == []
+        args.preprocessor.preprocess.assert_called_once_with(
+            input_fpath, output_fpath, [f'-I{args.config.source_root}/inc'])
+
+    def test_error(self, args):
+        # errors are returned rather than raised, so they can all be reported together
+        args.preprocessor = mock.Mock(supports_dependency_file=False)
+        args.preprocessor.preprocess.side_effect = RuntimeError('bad directive')
+        input_fpath = args.config.source_root / 'prog.F90'
+        err, prebuilds = process_artefact((input_fpath, args))
+        assert isinstance(err, Exception)
+        assert 'bad directive' in str(err)
+        assert prebuilds == []
+
+
+def test_read_prerequisites():
+    # make escapes are undone, and continuation lines and phony targets are handled
+    text = ('out/prog.f90: src/prog.F90 /usr/include/stdc-predef.h \\\n'
+            ' in\\ c$$x\\#y/a\\ b.h C:/inc/c.h\n'
+            '\n'
+            'in\\ c$$x\\#y/a\\ b.h:\n')
+    assert _read_prerequisites(text) == [
+        'src/prog.F90', '/usr/include/stdc-predef.h', 'in c$x#y/a b.h', 'C:/inc/c.h']
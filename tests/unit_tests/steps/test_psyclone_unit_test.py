@@ -94,6 +94,13 @@ class TestGenPrebuildHash:
         assert new_hash != old_hash
         assert result == expect_hash - old_hash + new_hash
 
+    def test_tool_hash(self, data):
+        # changing the psyclone version should change the hash
+        mp_payload, x90_file, expect_hash = data
+        mp_payload.tool_hash = 123
+        result = _gen_prebuild_hash(x90_file=x90_file, mp_payload=mp_payload)
+        assert result == expect_hash + 123
+
     def test_cli_args(self, data):
         # changing the cli args should change the hash
         mp_payload, x90_file, expect_hash = data
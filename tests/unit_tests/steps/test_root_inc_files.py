@@ -18,14 +18,15 @@ class TestRootIncFiles:
         config = BuildConfig('proj', ToolBox())
         config.artefact_store[ArtefactSet.INITIAL_SOURCE] = inc_files
 
-        with mock.patch('fab.steps.root_inc_files.shutil') as mock_shutil:
+        with mock.patch('fab.steps.root_inc_files.fast_copy') as mock_copy:
             with mock.patch('fab.steps.root_inc_files.Path.mkdir'), \
                  pytest.warns(UserWarning, match="_metric_send_conn not set, "
                                                  "cannot send metrics"):
                 root_inc_files(config)
 
-        mock_shutil.copy.assert_called_once_with(inc_files[0],
-                                                 config.build_output)
+        mock_copy.assert_called_once_with(inc_files[0],
+                                          config.build_output / 'bar.inc',
+                                          link=True)
 
     def test_skip_output_folder(self):
         # ensure it doesn't try to copy a file in the build output
@@ -34,14 +35,15 @@ class TestRootIncFiles:
                      config.build_output / 'fab.inc']
         config.artefact_store[ArtefactSet.INITIAL_SOURCE] = inc_files
 
-        with mock.patch('fab.steps.root_inc_files.shutil') as mock_shutil:
+        with mock.patch('fab.steps.root_inc_files.fast_copy') as mock_copy:
             with mock.patch('fab.steps.root_inc_files.Path.mkdir'), \
                  pytest.warns(UserWarning, match="_metric_send_conn not set, "
                                                  "cannot send metrics"):
                 root_inc_files(config)
 
-        mock_shutil.copy.assert_called_once_with(inc_files[0],
-                                                 config.build_output)
+        mock_copy.assert_called_once_with(inc_files[0],
+                                          config.build_output / 'bar.inc',
+                                          link=True)
 
     def test_name_clash(self):
         # ensure raises an exception if there is a name clash
@@ -51,7 +53,7 @@ class TestRootIncFiles:
         config.artefact_store[ArtefactSet.INITIAL_SOURCE] = inc_files
 
         with pytest.raises(FileExistsError):
-            with mock.patch('fab.steps.root_inc_files.shutil'):
+            with mock.patch('fab.steps.root_inc_files.fast_copy'):
                 with mock.patch('fab.steps.root_inc_files.Path.mkdir'), \
                      pytest.warns(DeprecationWarning,
                                   match="RootIncFiles is deprecated as .inc "
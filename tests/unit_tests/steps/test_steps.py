@@ -1,6 +1,9 @@
+from multiprocessing.pool import ThreadPool
+from unittest import mock
+
 import pytest
 
-from fab.steps import check_for_errors
+from fab.steps import _imap_chunksize, _init_worker, check_for_errors, close_thread_pools, run_mp, run_mp_dataflow
 
 
 class Test_check_for_errors(object):
@@ -11,3 +14,141 @@ class Test_check_for_errors(object):
     def test_error(self):
         with pytest.raises(RuntimeError):
             check_for_errors(['foo', MemoryError('bar')])
+
+
+class Test_run_mp(object):
+
+    @pytest.fixture(autouse=True)
+    def no_thread_pools(self):
+        # don't share thread pools with other tests
+        close_thread_pools()
+        yield
+        close_thread_pools()
+
+    def test_threads(self):
+        # a lambda can't be pickled, so this only works with threads
+        config = mock.Mock(multiprocessing=True, n_procs=2, cpu_affinity=None, nice=0)
+        with mock.patch('fab.steps.ThreadPool', wraps=ThreadPool) as pool:
+            results = run_mp(config, items=[1, 2, 3], func=lambda i: i * 2, use_threads=True)
+        assert results == [2, 4, 6]
+        pool.assert_called_once_with(2)
+
+    def test_threads_reused(self):
+        # the thread pool is kept for later calls until the build ends
+        config = mock.Mock(multiprocessing=True, n_procs=2, cpu_affinity=None, nice=0)
+        with mock.patch('fab.steps.ThreadPool', wraps=ThreadPool) as pool:
+            run_mp(config, items=[1, 2], func=lambda i: i * 2, use_threads=True)
+            results = run_mp(config, items=[3], func=lambda i: i * 2, use_threads=True)
+            assert results == [6]
+            pool.assert_called_once_with(2)
+
+            close_thread_pools()
+            run_mp(config, items=[1], func=lambda i: i * 2, use_threads=True)
+            assert pool.call_count == 2
+
+    def test_thread_chunksize(self):
+        # threads take one item at a time, to balance uneven work
+        config = mock.Mock(multiprocessing=True, n_procs=2, cpu_affinity=None, nice=0)
+        with mock.patch('fab.steps._get_thread_pool') as get_pool:
+            run_mp(config, items=list(range(100)), func=str, use_threads=True)
+        get_pool.return_value.map.assert_called_once_with(str, list(range(100)), chunksize=1)
+
+    def test_worker_init(self):
+        # the workers are given the config's cpu affinity and niceness
+        config = mock.Mock(multiprocessing=True, n_procs=2, cpu_affinity=[0], nice=5)
+        with mock.patch('fab.steps.ThreadPool', wraps=ThreadPool) as pool, \
+                mock.patch('fab.steps._init_worker') as init_worker:
+            run_mp(config, items=[1, 2], func=lambda i: i * 2, use_threads=True)
+        pool.assert_called_once_with(2, initializer=init_worker, initargs=([0], 5))
+        init_worker.assert_has_calls([mock.call([0], 5), mock.call([0], 5)])
+
+    def test_no_multiprocessing(self):
+        config = mock.Mock(multiprocessing=False)
+        with mock.patch('fab.steps.ThreadPool') as pool:
+            results = run_mp(config, items=[1, 2, 3], func=lambda i: i * 2, use_threads=True)
+        assert results == [2, 4, 6]
+        pool.assert_not_called()
+
+
+class Test_run_mp_dataflow(object):
+
+    @pytest.fixture(autouse=True)
+    def no_thread_pools(self):
+        # don't share thread pools with other tests
+        close_thread_pools()
+        yield
+        close_thread_pools()
+
+    @pytest.mark.parametrize('multiprocessing', [True, False])
+    def test_vanilla(self, multiprocessing):
+        # each result releases the next item, until there are none left
+        config = mock.Mock(multiprocessing=multiprocessing, n_procs=2, cpu_affinity=None, nice=0)
+        results = []
+
+        def handler(result):
+            results.append(result)
+            return [result] if result < 8 else []
+
+        run_mp_dataflow(config, items=[1, 3], func=lambda i: i * 2, result_handler=handler)
+        assert sorted(results) == [2, 4, 6, 8, 12]
+
+    @pytest.mark.parametrize('multiprocessing', [True, False])
+    def test_priority(self, multiprocessing):
+        # when there are more items than workers, the highest priority items start first
+        config = mock.Mock(multiprocessing=multiprocessing, n_procs=1, cpu_affinity=None, nice=0)
+        results = []
+
+        def handler(result):
+            results.append(result)
+            return [5, 1] if result == 2 else []
+
+        run_mp_dataflow(config, items=[2, 3], func=lambda i: i, result_handler=handler, priority=lambda i: -i)
+        assert results == [2, 1, 3, 5]
+
+    def test_error(self):
+        # an exception is handled as a result
+        config = mock.Mock(multiprocessing=True, n_procs=2, cpu_affinity=None, nice=0)
+        handler = mock.Mock(return_value=[])
+
+        def func(i):
+            raise ValueError(i)
+
+        run_mp_dataflow(config, items=[1], func=func, result_handler=handler)
+        result = handler.call_args[0][0]
+        assert isinstance(result, ValueError)
+
+
+class Test_imap_chunksize(object):
+
+    def test_vanilla(self):
+        config = mock.Mock(n_procs=4)
+        assert _imap_chunksize(config, list(range(1000))) == 15
+
+    def test_few_items(self):
+        config = mock.Mock(n_procs=4)
+        assert _imap_chunksize(config, [1, 2, 3]) == 1
+
+    def test_generator(self):
+        config = mock.Mock(n_procs=4)
+        assert _imap_chunksize(config, (i for i in range(1000))) == 1
+
+
+class Test_init_worker(object):
+
+    def test_vanilla(self):
+        with mock.patch('os.sched_setaffinity') as setaffinity, mock.patch('os.nice') as nice:
+            _init_worker([0, 1], 10)
+        setaffinity.assert_called_once_with(0, {0, 1})
+        nice.assert_called_once_with(10)
+
+    def test_nothing(self):
+        with mock.patch('os.sched_setaffinity') as setaffinity, mock.patch('os.nice') as nice:
+            _init_worker(None, 0)
+        setaffinity.assert_not_called()
+        nice.assert_not_called()
+
+    def test_error(self, caplog):
+        # errors are logged rather than killing the worker
+        with mock.patch('os.sched_setaffinity', side_effect=OSError('invalid argument')):
+            _init_worker([999], 0)
+        assert 'could not set worker cpu affinity or niceness' in caplog.text
@@ -20,6 +20,8 @@ def test_artefact_store() -> None:
         if artefact in [ArtefactSet.OBJECT_FILES,
                         ArtefactSet.OBJECT_ARCHIVES]:
             assert isinstance(artefact_store[artefact], dict)
+        elif artefact == ArtefactSet.OBJECT_SOURCES:
+            assert artefact_store[artefact] == {}
         else:
             assert isinstance(artefact_store[artefact], set)
 
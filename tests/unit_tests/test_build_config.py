@@ -4,6 +4,10 @@
 #  which you should have received as part of this distribution
 # ##############################################################################
 
+from unittest import mock
+
+import pytest
+
 from fab.build_config import BuildConfig
 from fab.steps import step
 from fab.steps.cleanup_prebuilds import CLEANUP_COUNT
@@ -30,3 +34,35 @@ class TestBuildConfig:
             assert CLEANUP_COUNT not in config.artefact_store
 
         assert CLEANUP_COUNT in config.artefact_store
+
+    def test_cpu_affinity(self):
+        # the cores are sorted and used as the default number of processes
+        with mock.patch.dict('os.environ', clear=True):
+            config = BuildConfig('proj', ToolBox(), cpu_affinity=[3, 1, 1], nice=10)
+        assert config.cpu_affinity == [1, 3]
+        assert config.n_procs == 2
+        assert config.nice == 10
+
+    @pytest.mark.parametrize('kwargs', [{'cpu_affinity': ['0']}, {'cpu_affinity': [-1]}, {'nice': '10'}])
+    def test_invalid_worker_settings(self, kwargs):
+        with pytest.raises(ValueError):
+            BuildConfig('proj', ToolBox(), **kwargs)
+
+    @pytest.mark.parametrize('env, n_procs', [
+        ({'FAB_JOBS': '3'}, 3),
+        ({'CMAKE_BUILD_PARALLEL_LEVEL': '5'}, 5),
+        ({'FAB_JOBS': '3', 'CMAKE_BUILD_PARALLEL_LEVEL': '5'}, 3),
+    ])
+    def test_env_jobs(self, env, n_procs):
+        with mock.patch.dict('os.environ', env, clear=True):
+            assert BuildConfig('proj', ToolBox()).n_procs == n_procs
+
+    def test_env_jobs_invalid(self):
+        # a bad value is ignored, giving the default
+        with mock.patch.dict('os.environ', {'FAB_JOBS': 'lots'}, clear=True), \
+                mock.patch('os.sched_getaffinity', return_value={0, 1, 2, 3}):
+            assert BuildConfig('proj', ToolBox()).n_procs == 4
+
+    def test_explicit_n_procs(self):
+        with mock.patch.dict('os.environ', {'FAB_JOBS': '3'}):
+            assert BuildConfig('proj', ToolBox(), n_procs=7).n_procs == 7
@@ -1,4 +1,5 @@
 from pathlib import Path
+from unittest import mock
 
 from fab.build_config import AddFlags, BuildConfig
 from fab.constants import SOURCE_ROOT
@@ -27,3 +28,34 @@ class TestAddFlags:
             input_flags=my_flags,
             config=config)
         assert my_flags == ['-foo']
+
+    def test_rendered_once(self):
+        # $source and $output are only filled in again when the folders change
+        add_flags = AddFlags(match="$source/foo/*", flags=['-I$output'])
+        config = BuildConfig('proj', ToolBox(),
+                             fab_workspace=Path("/fab_workspace"))
+
+        fpath = Path(f"/fab_workspace/proj/{SOURCE_ROOT}/foo/bar.c")
+        with mock.patch.object(add_flags, '_render', wraps=add_flags._render) as mock_render:
+            for _ in range(3):
+                my_flags = []
+                add_flags.run(fpath=fpath, input_flags=my_flags, config=config)
+                assert my_flags == [f'-I{config.build_output}']
+            assert mock_render.call_count == 1
+
+            other_config = BuildConfig('other', ToolBox(),
+                                       fab_workspace=Path("/fab_workspace"))
+            my_flags = []
+            add_flags.run(fpath=fpath, input_flags=my_flags, config=other_config)
+            assert my_flags == []
+            assert mock_render.call_count == 2
+
+    def test_relative_match(self):
+        # a match using $relative is filled in for each file
+        add_flags = AddFlags(match="$relative/*.c", flags=['-g'])
+        config = BuildConfig('proj', ToolBox(),
+                             fab_workspace=Path("/fab_workspace"))
+
+        my_flags = []
+        add_flags.run(fpath=Path("/anywhere/bar.c"), input_flags=my_flags, config=config)
+        assert my_flags == ['-g']
@@ -2,7 +2,7 @@ from pathlib import Path
 
 import pytest
 
-from fab.dep_tree import extract_sub_tree, AnalysedDependent
+from fab.dep_tree import extract_sub_tree, validate_dependencies, AnalysedDependent
 
 
 @pytest.fixture
@@ -28,4 +28,31 @@ class Test_extract_sub_tree(object):
         del expect[Path('foo.f90')]
         assert result == expect
 
+    def test_into(self, src_tree):
+        # files already in the destination tree aren't followed again
+        build_tree = {Path('a.f90'): src_tree[Path('a.f90')]}
+        result = extract_sub_tree(source_tree=src_tree, root=Path('b.f90'), into=build_tree)
+        assert result is build_tree
+        assert set(build_tree) == {Path('a.f90'), Path('b.f90'), Path('c.f90')}
+
+    def test_deep(self):
+        # a long chain of deps doesn't hit the recursion limit
+        src_tree = {
+            Path(f'{i}.f90'): AnalysedDependent(fpath=Path(f'{i}.f90'), file_deps={Path(f'{i + 1}.f90')}, file_hash=0)
+            for i in range(5000)}
+        result = extract_sub_tree(source_tree=src_tree, root=Path('0.f90'))
+        assert len(result) == 5000
+
     # todo: check missing deps raise a message
+
+
+class Test_validate_dependencies(object):
+
+    def test_vanilla(self, src_tree, caplog):
+        validate_dependencies(src_tree)
+        assert not caplog.records
+
+    def test_missing(self, src_tree, caplog):
+        del src_tree[Path('c.f90')]
+        validate_dependencies(src_tree)
+        assert 'Unknown dependencies, expecting build to fail: c.f90' in caplog.text
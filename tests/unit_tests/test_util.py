@@ -1,10 +1,12 @@
+import os
 from pathlib import Path
+from time import sleep, time_ns
 from unittest import mock
 
 import pytest
 
 from fab.artefacts import SuffixFilter
-from fab.util import input_to_output_fpath, suffix_filter, file_walk
+from fab.util import input_to_output_fpath, suffix_filter, file_walk, parse_cpu_list, fast_copy, file_checksum
 
 
 @pytest.fixture
@@ -78,3 +80,90 @@ class Test_input_to_output_fpath(object):
         input_path = Path('/other/folder/file.txt')
         result = input_to_output_fpath(config, input_path)
         assert result == Path(config.build_output / 'other/folder/file.txt')
+
+
+class Test_parse_cpu_list(object):
+
+    def test_vanilla(self):
+        assert parse_cpu_list('0-3,8, 10-11') == [0, 1, 2, 3, 8, 10, 11]
+
+    def test_overlap(self):
+        assert parse_cpu_list('2,0-2') == [0, 1, 2]
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            parse_cpu_list('0-x')
+
+
+class Test_fast_copy(object):
+
+    @pytest.fixture
+    def src(self, tmp_path):
+        src = tmp_path / 'src.f90'
+        src.write_text('program foo\nend program\n')
+        return src
+
+    def test_copy(self, src, tmp_path):
+        dst = tmp_path / 'dst.f90'
+        fast_copy(src, dst)
+        assert dst.read_text() == src.read_text()
+        assert dst.stat().st_mtime == src.stat().st_mtime
+        assert not dst.samefile(src)
+
+    def test_fallback(self, src, tmp_path):
+        # e.g. an old kernel
+        dst = tmp_path / 'dst.f90'
+        with mock.patch('os.copy_file_range', side_effect=OSError('not supported'), create=True):
+            fast_copy(src, dst)
+        assert dst.read_text() == src.read_text()
+
+    def test_link(self, src, tmp_path):
+        dst = tmp_path / 'dst.f90'
+        fast_copy(src, dst, link=True)
+        assert dst.samefile(src)
+
+    def test_replace_link(self, src, tmp_path):
+        # copying over an earlier hard link mustn't write through to the linked file
+        dst = tmp_path / 'dst.f90'
+        fast_copy(src, dst, link=True)
+        other = tmp_path / 'other.f90'
+        other.write_text('module bar\nend module\n')
+        fast_copy(other, dst)
+        assert dst.read_text() == other.read_text()
+        assert src.read_text() == 'program foo\nend program\n'
+
+
+class Test_file_checksum(object):
+
+    @pytest.fixture
+    def fpath(self, tmp_path):
+        fpath = tmp_path / 'foo.f90'
+        fpath.write_text('program foo\nend program\n')
+        return fpath
+
+    def test_remembered(self, fpath):
+        # a settled file is only read once
+        first = file_checksum(fpath)
+        with mock.patch('fab.util.time_ns', return_value=time_ns() + 10 ** 10), \
+                mock.patch('builtins.open', wraps=open) as mock_open:
+            assert file_checksum(fpath) == first
+            assert file_checksum(fpath) == first
+        assert mock_open.call_count == 1
+
+    def test_changed(self, fpath):
+        # a change is noticed, even if the size and modification time are put back
+        st = fpath.stat()
+        with mock.patch('fab.util.time_ns', return_value=time_ns() + 10 ** 10):
+            first = file_checksum(fpath)
+        # let the file system's coarse clock move on
+        sleep(0.05)
+        fpath.write_text('program bar\nend program\n')
+        os.utime(fpath, ns=(st.st_atime_ns, st.st_mtime_ns))
+        assert file_checksum(fpath) != first
+
+    def test_recent(self, fpath):
+        # a file which has just changed isn't remembered, it might change again with the same fingerprint
+        file_checksum(fpath)
+        with mock.patch('builtins.open', wraps=open) as mock_open:
+            file_checksum(fpath)
+        assert mock_open.call_count == 1
@@ -49,3 +49,33 @@ def test_ar_create():
     tool_run.assert_called_with(['ar', 'cr', 'out.a', 'a.o', 'b.o'],
                                 capture_output=True, env=None, cwd=None,
                                 check=False)
+
+
+def test_ar_create_thin(tmp_path):
+    '''Test creating a thin archive, replacing an existing archive.'''
+    ar = Ar()
+    out = tmp_path / "out.a"
+    out.write_text("old archive")
+    mock_result = mock.Mock(returncode=0)
+    with mock.patch('fab.tools.tool.subprocess.run',
+                    return_value=mock_result) as tool_run:
+        ar.create(out, [Path("a.o"), "b.o"], thin=True)
+    tool_run.assert_called_with(['ar', 'crT', str(out), 'a.o', 'b.o'],
+                                capture_output=True, env=None, cwd=None,
+                                check=False)
+    assert not out.exists()
+
+
+def test_ar_create_thin_then_normal(tmp_path):
+    '''Test that a normal archive replaces an existing thin archive.'''
+    ar = Ar()
+    out = tmp_path / "out.a"
+    out.write_text("!<thin>\n")
+    mock_result = mock.Mock(returncode=0)
+    with mock.patch('fab.tools.tool.subprocess.run',
+                    return_value=mock_result) as tool_run:
+        ar.create(out, [Path("a.o")])
+    tool_run.assert_called_with(['ar', 'cr', str(out), 'a.o'],
+                                capture_output=True, env=None, cwd=None,
+                                check=False)
+    assert not out.exists()
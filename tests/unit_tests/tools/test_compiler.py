@@ -14,8 +14,8 @@ from unittest import mock
 
 import pytest
 
-from fab.tools import (Category, CCompiler, Compiler, FortranCompiler,
-                       Gcc, Gfortran, Icc, Ifort)
+from fab.tools import (Category, Ccache, CCompiler, Compiler,
+                       FortranCompiler, Gcc, Gfortran, Icc, Ifort)
 
 
 def test_compiler():
@@ -128,6 +128,45 @@ def test_compiler_with_add_args():
                                                      'a.f90', '-o', 'a.o'])
 
 
+def test_compiler_with_launcher():
+    '''Tests that a launcher is called with the compiler and all its
+    parameters.'''
+    fc = FortranCompiler("gfortran", "gfortran", "gnu",
+                         module_folder_flag="-J")
+    fc.flags.append("-g")
+    assert fc.launcher is None
+    ccache = Ccache()
+    fc.set_launcher(ccache)
+    assert fc.launcher is ccache
+
+    fc.run = mock.MagicMock()
+    mock_result = mock.Mock(returncode=0)
+    with mock.patch("fab.tools.tool.subprocess.run",
+                    return_value=mock_result) as tool_run:
+        fc.compile_file(Path("/src/a.f90"), "a.o", add_flags=["-O3"])
+    tool_run.assert_called_with(
+        ["ccache", "gfortran", "-g", "-c", "-O3", "a.f90", "-o", "a.o"],
+        capture_output=True, env=None, cwd=PosixPath("/src"), check=False)
+    fc.run.assert_not_called()
+
+
+def test_compiler_with_launcher_env():
+    '''Tests that the launcher's environment is only used for compiling,
+    and overrides the session's environment.'''
+    cc = CCompiler("gcc", "gcc", "gnu")
+    cc.set_launcher(Ccache(), env={"CCACHE_BASEDIR": "/src"})
+
+    mock_result = mock.Mock(returncode=0)
+    with mock.patch.dict(os.environ, {"CCACHE_BASEDIR": "/stale"}), \
+            mock.patch("fab.tools.tool.subprocess.run",
+                       return_value=mock_result) as tool_run:
+        cc.compile_file(Path("/src/a.c"), "a.o")
+    env = tool_run.call_args[1]["env"]
+    assert env["CCACHE_BASEDIR"] == "/src"
+    assert env["PATH"] == os.environ["PATH"]
+    assert os.environ.get("CCACHE_BASEDIR") != "/src"
+
+
 class TestGetCompilerVersion:
     '''Test `get_version`.'''
 
@@ -98,6 +98,21 @@ def test_linker_c(mock_c_compiler):
     link_run.assert_called_with(['a.o', '-L', '/tmp', '-o', 'a.out'])
 
 
+def test_linker_archive_group(mock_c_compiler):
+    '''Test that several archives are linked as a group, since they may
+    depend on each other.'''
+    linker = Linker(compiler=mock_c_compiler)
+    with mock.patch.object(linker, "run") as link_run:
+        linker.link([Path("b.a"), Path("a.a"), Path("main.o")], Path("a.out"))
+    link_run.assert_called_with(['-Wl,--start-group', 'a.a', 'b.a', 'main.o',
+                                 '-Wl,--end-group', '-o', 'a.out'])
+
+    # A single archive doesn't need a group
+    with mock.patch.object(linker, "run") as link_run:
+        linker.link([Path("a.a")], Path("a.out"))
+    link_run.assert_called_with(['a.a', '-o', 'a.out'])
+
+
 def test_linker_add_compiler_flag(mock_c_compiler):
     '''Test that a flag added to the compiler will be automatically
     added to the link line (even if the flags are modified after
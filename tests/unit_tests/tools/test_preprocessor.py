@@ -13,7 +13,10 @@ from pathlib import Path
 
 from unittest import mock
 
-from fab.tools import (Category, Cpp, CppFortran, Fpp, Preprocessor)
+import pytest
+
+from fab.tools import (Category, Cpp, CppFortran, Fpp, PcppFortran,
+                       Preprocessor)
 
 
 def test_preprocessor_constructor():
@@ -80,3 +83,115 @@ def test_preprocessor_cppfortran():
     mock_run.assert_called_with(
         ["cpp", "-traditional-cpp", "-P", "-DDO_SOMETHING", "a.in", "a.out"],
         capture_output=True, env=None, cwd=None, check=False)
+
+
+def test_preprocessor_dependency_file():
+    '''Test requesting a dependency file.'''
+    cppf = CppFortran()
+    assert cppf.supports_dependency_file
+    mock_run = mock.Mock(return_value=mock.Mock(returncode=0))
+    with mock.patch("subprocess.run", mock_run):
+        cppf.preprocess(Path("a.in"), Path("a.out"), ["-DX"],
+                        dependency_file=Path("a.d"))
+    mock_run.assert_called_with(
+        ["cpp", "-traditional-cpp", "-P", "-DX", "-MD", "-MF", "a.d",
+         "a.in", "a.out"],
+        capture_output=True, env=None, cwd=None, check=False)
+
+    fpp = Fpp()
+    assert not fpp.supports_dependency_file
+    with pytest.raises(RuntimeError) as err:
+        fpp.preprocess(Path("a.in"), Path("a.out"),
+                       dependency_file=Path("a.d"))
+    assert "'fpp' does not support dependency files" in str(err.value)
+
+
+def test_preprocessor_pcpp_not_available():
+    '''Test pcpp if the module can't be imported.'''
+    with mock.patch("fab.tools.preprocessor.pcpp", None):
+        pcpp = PcppFortran()
+        assert pcpp.category == Category.FORTRAN_PREPROCESSOR
+        assert not pcpp.is_available
+        with pytest.raises(RuntimeError) as err:
+            pcpp.preprocess(Path("a.F90"), Path("a.f90"))
+        assert "Tool 'pcpp' is not available" in str(err.value)
+
+
+def test_preprocessor_pcpp(tmp_path):
+    '''Test preprocessing a Fortran file in-process with pcpp.'''
+    pytest.importorskip("pcpp")
+    (tmp_path / "inc").mkdir()
+    (tmp_path / "inc" / "a.inc").write_text("integer :: from_inc\n")
+    input_file = tmp_path / "a.F90"
+    input_file.write_text(
+        "#ifdef MPI_DUMMY\n"
+        "integer :: x = VALUE\n"
+        "#endif\n"
+        "#ifdef GONE\n"
+        "integer :: gone\n"
+        "#endif\n"
+        '#include "a.inc"\n'
+        "character(len=*), parameter :: s = 'a' // \"b\"\n")
+    output_file = tmp_path / "a.f90"
+
+    pcpp = PcppFortran()
+    assert pcpp.is_available
+    pcpp.preprocess(input_file, output_file,
+                    ["-traditional-cpp", "-P", "-DMPI_DUMMY", "-DVALUE=3",
+                     "-DGONE", "-UGONE", "-I", tmp_path / "inc"])
+
+    output = output_file.read_text()
+    assert "integer :: x = 3" in output
+    assert "gone" not in output
+    assert "integer :: from_inc" in output
+    # The Fortran concatenation operator must not be treated as a comment
+    assert "s = 'a' // \"b\"" in output
+
+
+def test_preprocessor_pcpp_blank_lines(tmp_path):
+    '''Test that pcpp removes blank lines with -P, like cpp -P.'''
+    pytest.importorskip("pcpp")
+    input_file = tmp_path / "a.F90"
+    input_file.write_text("program p\n\n#ifdef X\n  a = 1\n#else\n"
+                          "  a = 2\n#endif\n\n  b = 1\nend program\n\n")
+    output_file = tmp_path / "a.f90"
+    pcpp = PcppFortran()
+
+    pcpp.preprocess(input_file, output_file, ["-P"])
+    assert output_file.read_text() == ("program p\n  a = 2\n  b = 1\n"
+                                       "end program\n")
+
+    pcpp.preprocess(input_file, output_file)
+    assert "\n\n" in output_file.read_text()
+
+
+def test_preprocessor_pcpp_errors(tmp_path):
+    '''Test that pcpp reports unsupported flags and preprocessing
+    errors.'''
+    pytest.importorskip("pcpp")
+    input_file = tmp_path / "a.F90"
+    input_file.write_text('#include "missing.inc"\n')
+    pcpp = PcppFortran()
+
+    with pytest.raises(ValueError) as err:
+        pcpp.preprocess(input_file, tmp_path / "a.f90", ["-O2"])
+    assert "Unsupported pcpp flag '-O2'" in str(err.value)
+
+    with pytest.raises(RuntimeError) as err:
+        pcpp.preprocess(input_file, tmp_path / "a.f90")
+    assert "pcpp reported 1 error(s)" in str(err.value)
+
+
+def test_preprocessor_get_version():
+    '''Test the preprocessor version, and that it changes the hash.'''
+    cpp = CppFortran()
+    mock_result = mock.Mock(returncode=0, stdout=b"cpp (GCC) 11.4.0\nCopyright\n")
+    with mock.patch('fab.tools.tool.subprocess.run',
+                    return_value=mock_result) as tool_run:
+        assert cpp.get_version() == "cpp (GCC) 11.4.0"
+        # The version is only asked for once
+        assert cpp.get_version() == "cpp (GCC) 11.4.0"
+    tool_run.assert_called_once()
+    old_hash = cpp.get_hash()
+    cpp._version = "cpp (GCC) 12.1.0"
+    assert cpp.get_hash() != old_hash
@@ -29,6 +29,26 @@ def test_psyclone_constructor():
     assert psyclone._api == "gocean1.0"
 
 
+def test_psyclone_get_version():
+    '''Tests the PSyclone version, and that it changes the hash.'''
+    psyclone = Psyclone()
+    mock_result = mock.Mock(returncode=0, stdout=b"PSyclone version: 2.5.0\n")
+    with mock.patch('fab.tools.tool.subprocess.run',
+                    return_value=mock_result) as tool_run:
+        assert psyclone.get_version() == "PSyclone version: 2.5.0"
+        assert psyclone.get_version() == "PSyclone version: 2.5.0"
+    tool_run.assert_called_once()
+    old_hash = psyclone.get_hash()
+    psyclone._version = "PSyclone version: 3.0"
+    assert psyclone.get_hash() != old_hash
+
+    # An error gives an empty version
+    psyclone = Psyclone()
+    with mock.patch('fab.tools.tool.subprocess.run',
+                    side_effect=FileNotFoundError("not found")):
+        assert psyclone.get_version() == ""
+
+
 def test_psyclone_check_available():
     '''Tests the is_available functionality.'''
     psyclone = Psyclone()
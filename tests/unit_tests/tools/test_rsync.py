@@ -57,3 +57,18 @@ def test_rsync_create():
     tool_run.assert_called_with(
         ['rsync', '--times', '--links', '--stats', '-ru', '/src/', '/dst'],
         capture_output=True, env=None, cwd=None, check=False)
+
+
+def test_rsync_multiple_sources():
+    '''Test executing an rsync with several source folders, which are
+    merged into dst by a single rsync.
+    '''
+    rsync = Rsync()
+    mock_result = mock.Mock(returncode=0)
+    with mock.patch('fab.tools.tool.subprocess.run',
+                    return_value=mock_result) as tool_run:
+        rsync.execute(src=["/src1", "/src2/"], dst="/dst")
+    tool_run.assert_called_with(
+        ['rsync', '--times', '--links', '--stats', '-ru', '/src1/', '/src2/',
+         '/dst'],
+        capture_output=True, env=None, cwd=None, check=False)